@@ -0,0 +1,115 @@
+import numpy as np
+from collections import namedtuple
+from std_atmos import statee
+import unitSolver as us
+
+#Evaluates whole batches of propulsion units at once. A batch is given as arrays of catalog row indices (one
+#array per component type) and an array of battery cell counts. The parameters of every unit are gathered
+#from the catalog column arrays and all units are solved together by the vectorized solvers in
+#unitSolver.py, so there is no per-design Python overhead.
+
+#Results of a batch evaluation. Each field is an array with one entry per unit. Units which cannot meet the
+#requirement (throttle outside [0,1], or current above the ESC or battery limit) have a NaN flight time.
+BatchResult = namedtuple("BatchResult", ["flightTime", "throttle", "current", "weight"])
+
+#Gathers the parameters of a batch of units from the catalog
+def gatherParams(catalog, propInd, motorInd, battInd, numCells, escInd, altitude):
+    props = catalog.props
+    motors = catalog.motors
+    batts = catalog.batteries
+    _,_,_,airDensity = statee(altitude)
+    return us.UnitParams(props.thrustCoefs[propInd], props["thrustfitorder"][propInd],
+                         props.powerCoefs[propInd], props["powerfitorder"][propInd],
+                         props["diameter"][propInd],
+                         motors["kv"][motorInd], motors["gear_ratio"][motorInd], motors["no_load_current"][motorInd],
+                         motors["resistance"][motorInd],
+                         batts["volt"][battInd]*numCells, batts["ri"][battInd]*numCells,
+                         catalog.escs["ri"][escInd], airDensity)
+
+#Returns the weight (lbf) of the electrical components of each unit, as PropulsionUnit.GetWeight
+def unitWeight(catalog, motorInd, battInd, numCells, escInd):
+    return (catalog.batteries["weight"][battInd]*numCells + catalog.motors["weight"][motorInd] + catalog.escs["weight"][escInd])/16
+
+#Returns a mask of the units which can be solved at all (a unit with no resistance draws infinite current)
+def solvable(catalog, motorInd, battInd, escInd):
+    return ~((catalog.batteries["ri"][battInd] == 0) & (catalog.escs["ri"][escInd] == 0) & (catalog.motors["resistance"][motorInd] == 0))
+
+#Returns a mask of the units which pass a cheap feasibility screen: units which can be solved and which may
+#produce the required thrust within their current limits (see unitSolver.mayBeFeasible). Units screened out
+#have no flight time.
+def screenUnits(catalog, propInd, motorInd, battInd, numCells, escInd, v_cruise, altitude, T_req):
+    propInd,motorInd,battInd,numCells,escInd = np.broadcast_arrays(propInd, motorInd, battInd, numCells, escInd)
+    ok = solvable(catalog, motorInd, battInd, escInd)
+    if np.any(ok):
+        params = gatherParams(catalog, propInd[ok], motorInd[ok], battInd[ok], numCells[ok], escInd[ok], altitude)
+        ok[ok] = us.mayBeFeasible(params, np.broadcast_to(v_cruise, propInd.shape)[ok], np.broadcast_to(T_req, propInd.shape)[ok],
+                                  catalog.escs["imax"][escInd[ok]], catalog.batteries["imax"][battInd[ok]])
+    return ok
+
+#Groups units for which the operating point solvers do the same work. The operating point of a unit depends
+#on its battery and ESC only through the supply voltage and the battery and ESC resistances, so units with the
+#same prop and motor whose voltage, resistances, cruise speed and required thrust agree only need to be solved
+#once. If tol is 0 these must agree exactly and grouping changes no result. Otherwise each value is binned by
+#the log of its magnitude in bins a factor 1+tol wide, so every unit of a group is within a factor 1+tol of its
+#representative in each value, while two units this close may still fall into neighbouring bins. Units taking
+#the throttle and current of their representative are then approximate: their throttle, current and flight
+#time differ from their own by about tol, and a unit near its throttle or current limits may be found feasible
+#when it is not, or the other way round. Returns the index of a representative unit of each group and the
+#group of each unit.
+def groupUnits(catalog, propInd, motorInd, battInd, numCells, escInd, v_cruise, T_req, tol=0.0):
+    values = np.stack(np.broadcast_arrays(catalog.batteries["volt"][battInd]*numCells, catalog.batteries["ri"][battInd]*numCells,
+                                          catalog.escs["ri"][escInd], v_cruise, T_req), axis=-1)
+    if tol > 0:
+        with np.errstate(divide="ignore"):
+            values = np.concatenate([np.sign(values), np.round(np.log(np.abs(values))/np.log1p(tol))], axis=-1)
+    keys = np.column_stack([propInd, motorInd, values])
+    _,representatives,groups = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    return representatives, groups.ravel()
+
+#Determines the throttle, current draw and flight time of each unit in a batch at the given cruise speed. The
+#required thrust is either given directly (T_req) or as a thrust to weight ratio (R_tw_req) together with
+#the weight of the airframe (W_frame). method selects the operating point solver (see
+#unitSolver.solveCruiseThrottle). If groupTol is given, only one unit of each group of units (see groupUnits)
+#is solved and the others take its throttle and current; the flight time and current limits are still
+#checked for each unit. Unless screen is False, units which fail the feasibility screen (see screenUnits)
+#are not solved. Follows PropulsionUnit.CalcBattLife.
+def evaluate(catalog, propInd, motorInd, battInd, numCells, escInd, v_cruise, altitude, T_req=None, R_tw_req=None, W_frame=0.0, method="secant", groupTol=None, screen=True):
+    propInd,motorInd,battInd,numCells,escInd = np.broadcast_arrays(propInd, motorInd, battInd, numCells, escInd)
+    weight = unitWeight(catalog, motorInd, battInd, numCells, escInd)
+    if R_tw_req is not None:
+        T_req = (weight+W_frame)*R_tw_req
+
+    point = [np.full(propInd.shape, np.nan) for field in us.OperatingPoint._fields]
+    if screen:
+        ok = screenUnits(catalog, propInd, motorInd, battInd, numCells, escInd, v_cruise, altitude, T_req)
+    else:
+        ok = solvable(catalog, motorInd, battInd, escInd)
+    if np.any(ok):
+        ind = np.flatnonzero(ok)
+        v_ok = np.broadcast_to(v_cruise, propInd.shape)[ok]
+        T_ok = np.broadcast_to(T_req, propInd.shape)[ok]
+        if groupTol is not None:
+            representatives,groups = groupUnits(catalog, propInd[ind], motorInd[ind], battInd[ind], numCells[ind], escInd[ind], v_ok, T_ok, groupTol)
+            ind = ind[representatives]
+            v_ok = v_ok[representatives]
+            T_ok = T_ok[representatives]
+        params = gatherParams(catalog, propInd[ind], motorInd[ind], battInd[ind], numCells[ind], escInd[ind], altitude)
+        solution = us.solveCruiseThrottle(params, v_ok, T_ok, method=method)
+        for field,values in zip(point, solution):
+            field[ok] = values if groupTol is None else values[groups]
+    point = us.OperatingPoint(*point)
+
+    flightTime = us.flightTime(point, catalog.batteries["capacity"][battInd], catalog.escs["imax"][escInd], catalog.batteries["imax"][battInd])
+    return BatchResult(flightTime, point.throttle, point.current, weight)
+
+#Draws a batch of random units. candidates holds the candidate rows of the props, motors, ESCs and batteries
+#(None for an unconstrained component, in which case only canonical components are drawn).
+def randomBatch(catalog, rng, size, candidates=(None, None, None, None)):
+    rows = []
+    for table,cand in zip([catalog.props, catalog.motors, catalog.escs, catalog.batteries], candidates):
+        if cand is None:
+            cand = table.uniqueRows
+        rows.append(np.asarray(cand)[rng.integers(0, len(cand), size)])
+    propInd,motorInd,escInd,battInd = rows
+    numCells = rng.integers(1, 9, size)
+    return propInd, motorInd, battInd, numCells, escInd
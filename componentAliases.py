@@ -0,0 +1,74 @@
+import numpy as np
+import sys
+import componentCatalog as cc
+from componentDatabase import ComponentDatabase
+
+#Finds components which are duplicated in the database. The database is compiled from several sources
+#(see dev/Database), so many motors, batteries and ESCs appear more than once with the same or nearly
+#the same parameters. Components whose parameters all agree to within a relative tolerance are grouped,
+#and every group is represented by its component with the lowest id (the canonical component). The
+#other members are stored as aliases of the canonical component in the Aliases table of the database.
+#Random searches then only draw canonical components.
+
+#Parameters which define the physical behaviour of each type of component
+SIGNATURES = {"Motors":["kv", "resistance", "no_load_current", "weight", "gear_ratio"],
+              "Batteries":["capacity", "ri", "weight", "volt", "imax"],
+              "ESCs":["ri", "imax", "weight"]}
+
+#Default relative tolerance within which parameters are considered equal
+DEFAULT_TOLERANCE = 0.01
+
+#Returns True where a and b agree to within the relative tolerance (NaN agrees with NaN)
+def _close(a, b, relTol):
+    both = np.isnan(a) & np.isnan(b)
+    with np.errstate(invalid="ignore"):
+        return both | (np.abs(a-b) <= relTol*np.maximum(np.abs(a), np.abs(b)))
+
+#Groups the rows of a table by parameter signature. tolerances maps column names to relative tolerances;
+#columns not given use relTol. Returns the row index of the canonical component for each row.
+def groupRows(table, colNames, relTol=DEFAULT_TOLERANCE, tolerances=None):
+    if tolerances is None:
+        tolerances = {}
+    x = np.stack([np.asarray(table[colName], dtype=np.float64) for colName in colNames], axis=1)
+    tol = np.array([tolerances.get(colName, relTol) for colName in colNames])
+    n = len(x)
+
+    #Rows are sorted by the first parameter, so that only a window of rows has to be compared with each
+    #group leader
+    order = np.argsort(x[:,0], kind="stable")
+    first = x[order,0]
+    leader = np.full(n, -1)
+    for pos,i in enumerate(order):
+        if leader[i] >= 0:
+            continue
+        leader[i] = i
+        if np.isnan(x[i,0]):
+            end = n
+        else:
+            end = np.searchsorted(first, x[i,0]+tol[0]*abs(x[i,0]), side="right")
+        others = order[pos+1:end]
+        others = others[leader[others] < 0]
+        same = np.all(_close(x[others], x[i], tol), axis=1)
+        leader[others[same]] = i
+
+    #The member with the lowest row index (and so the lowest id) represents each group
+    canonical = np.arange(n)
+    np.minimum.at(canonical, leader, np.arange(n))
+    return canonical[leader]
+
+#Groups the components of every table and stores the resulting aliases in the database
+def writeAliases(dbFile, relTol=DEFAULT_TOLERANCE, tolerances=None):
+    catalog = cc.ComponentCatalog.fromDatabase(dbFile)
+    with ComponentDatabase(dbFile) as db:
+        for tableName,colNames in SIGNATURES.items():
+            table = catalog.tables[tableName]
+            canonical = groupRows(table, colNames, relTol, tolerances)
+            rows = np.flatnonzero(canonical != np.arange(table.size))
+            ids = table["id"]
+            db.writeAliases(tableName, zip(ids[rows], ids[canonical[rows]]))
+            print(tableName+":", table.size, "components,", table.size-len(rows), "unique")
+
+if __name__ == "__main__":
+    dbFile = sys.argv[1] if len(sys.argv) > 1 else "Database/components.db"
+    relTol = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TOLERANCE
+    writeAliases(dbFile, relTol)
@@ -0,0 +1,397 @@
+import numpy as np
+import hashlib
+import json
+import os
+import sys
+from os import path
+from random import randint
+from multiprocessing import shared_memory
+from componentDatabase import ComponentDatabase
+
+#Version of the binary snapshot format. Snapshots written by a different version are rebuilt.
+SNAPSHOT_VERSION = 2
+
+#Classes in this file hold the component database in memory as typed column arrays. The database is read
+#once and every component is afterwards referenced by its row index within a table. Random selection is
+#done by sampling row indices, so no SQL is executed per component.
+#The catalog can also be compiled into a binary snapshot (one .npy file per column) which is memory mapped
+#when opened. The snapshot is tagged with a hash of the database and rebuilt whenever the database changes.
+#Alternatively, the catalog can be copied once into a shared memory block to which worker processes attach.
+
+#Maps the declared SQL type of a column to the NumPy dtype used to store it
+def _columnDtype(declType):
+    declType = declType.upper()
+    if "INT" in declType:
+        return np.int64
+    if "CHAR" in declType or "TEXT" in declType or declType == "":
+        return str
+    return np.float64
+
+#An index over one column of a table. Rows are kept sorted by value so that nearest neighbour and range
+#queries are answered by binary search. Rows with no value (NaN) are not indexed.
+class SortedIndex:
+
+    def __init__(self, values):
+        rows = np.flatnonzero(~np.isnan(values))
+        order = np.argsort(values[rows], kind="stable")
+        self.rows = rows[order]
+        self.values = np.asarray(values[self.rows])
+
+    #Returns the row indices of the k rows closest to the given value, closest first
+    def nearest(self, value, k=1):
+        if not np.isfinite(value):
+            raise ValueError("Nearest neighbour queries require a finite value.")
+        pos = np.searchsorted(self.values, value)
+        lo = max(pos-k, 0)
+        hi = min(pos+k, len(self.values))
+        order = np.argsort(np.abs(self.values[lo:hi]-value), kind="stable")[:k]
+        return self.rows[lo:hi][order]
+
+    #Returns the row indices of all rows with values in [low, high]
+    def within(self, valueRange):
+        lo = np.searchsorted(self.values, valueRange[0], side="left")
+        hi = np.searchsorted(self.values, valueRange[1], side="right")
+        return self.rows[lo:hi]
+
+#An index over two columns of a table. Rows are sorted by the first column. A nearest neighbour query
+#searches a window around the query point along the first column, doubling the window until the distance
+#along that column alone to the window edges exceeds the k-th best (Euclidean) distance found.
+class PlanarIndex:
+
+    def __init__(self, x, y):
+        rows = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+        order = np.argsort(x[rows], kind="stable")
+        self.rows = rows[order]
+        self.x = np.asarray(x[self.rows])
+        self.y = np.asarray(y[self.rows])
+
+    #Returns the row indices of the k rows closest to the point (x,y), closest first
+    def nearest(self, point, k=1):
+        x,y = point
+        if not (np.isfinite(x) and np.isfinite(y)):
+            raise ValueError("Nearest neighbour queries require a finite point.")
+        n = len(self.rows)
+        pos = int(np.searchsorted(self.x, x))
+        width = k
+        while True:
+            lo = max(pos-width, 0)
+            hi = min(pos+width, n)
+            d = np.hypot(self.x[lo:hi]-x, self.y[lo:hi]-y)
+            order = np.argsort(d, kind="stable")[:k]
+            dk = d[order[-1]]
+
+            #Any row outside the window is at least as far away as the window edges along x
+            lowDone = lo == 0 or x-self.x[lo] > dk
+            highDone = hi == n or self.x[hi-1]-x > dk
+            if len(order) == k and lowDone and highDone or (lo == 0 and hi == n):
+                return self.rows[lo:hi][order]
+            width *= 2
+
+    #Returns the row indices of all rows within the box [xLow, xHigh] x [yLow, yHigh]
+    def within(self, xRange, yRange):
+        lo = np.searchsorted(self.x, xRange[0], side="left")
+        hi = np.searchsorted(self.x, xRange[1], side="right")
+        y = self.y[lo:hi]
+        return self.rows[lo:hi][(y >= yRange[0]) & (y <= yRange[1])]
+
+#A single database table stored as one array per column
+class ComponentTable:
+
+    #Initialize the table from a dict of column arrays
+    def __init__(self, tableName, columns):
+        self.tableName = tableName
+        self.columns = columns
+        self.size = len(columns["id"])
+        self._indexes = {}
+        self._uniqueRows = None
+
+    #Builds the table from the column info and rows returned by a ComponentDatabase
+    @classmethod
+    def fromRows(cls, tableName, columnInfo, rows):
+        columns = {}
+        for i,(colName,declType) in enumerate(columnInfo):
+            dtype = _columnDtype(declType)
+            values = [row[i] for row in rows]
+            if dtype is str:
+                columns[colName.lower()] = np.array(["" if x is None else x for x in values], dtype=str)
+            elif dtype is np.int64:
+                columns[colName.lower()] = np.array([-1 if x is None else x for x in values], dtype=np.int64)
+            else:
+                columns[colName.lower()] = np.array([np.nan if x is None else x for x in values], dtype=np.float64)
+        return cls(tableName, columns)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, colName):
+        return self.columns[colName]
+
+    #Returns the index over the given columns, building it the first time it is requested
+    def index(self, *colNames):
+        if colNames not in self._indexes:
+            if len(colNames) == 1:
+                self._indexes[colNames] = SortedIndex(self.columns[colNames[0]])
+            elif len(colNames) == 2:
+                self._indexes[colNames] = PlanarIndex(self.columns[colNames[0]], self.columns[colNames[1]])
+            else:
+                raise ValueError("Indexes may only be built over one or two columns.")
+        return self._indexes[colNames]
+
+    #Returns the row indices of the k components closest to the target values, e.g. nearest({"kv":1000}, k=5)
+    def nearest(self, targets, k=1):
+        index = self.index(*targets.keys())
+        if len(targets) == 1:
+            return index.nearest(*targets.values(), k=k)
+        return index.nearest(tuple(targets.values()), k=k)
+
+    #Returns the row indices of all components within the given ranges, e.g. within({"kv":(900,1100)})
+    def within(self, ranges):
+        return self.index(*ranges.keys()).within(*ranges.values())
+
+    #Returns the row indices of the canonical components, i.e. one row for each distinct set of physical parameters
+    @property
+    def uniqueRows(self):
+        if self._uniqueRows is None:
+            if "canonical" in self.columns:
+                self._uniqueRows = np.flatnonzero(self.columns["canonical"] == np.arange(self.size))
+            else:
+                self._uniqueRows = np.arange(self.size)
+        return self._uniqueRows
+
+    #Returns the row indices of the components with the given database ids
+    def rowsForIds(self, ids):
+        return np.searchsorted(self.columns["id"], ids)
+
+    #Returns the indices of all rows matching the given constraints (all rows if none are given)
+    def indicesWhere(self, name=None, manufacturer=None, dbid=None):
+        mask = np.ones(self.size, dtype=bool)
+        if name is not None:
+            mask &= self.columns["name"] == name
+        if manufacturer is not None:
+            mask &= self.columns["manufacturer"] == manufacturer
+        if dbid is not None:
+            mask &= self.columns["id"] == int(dbid)
+        return np.flatnonzero(mask)
+
+    #Selects the row index of a component. If a name or id is given, that component is selected. If a
+    #manufacturer is given, a random component from that manufacturer is selected. If a target value is
+    #given for one or two columns, the closest component is selected instead of a random one. If nothing is
+    #given, a random canonical component is selected, so that duplicated components are not favoured.
+    def select(self, name=None, manufacturer=None, dbid=None, nearest=None):
+        if name is not None:
+            if manufacturer is not None or dbid is not None:
+                raise ValueError("Too many "+self.tableName.lower()+" parameters specified.")
+        elif manufacturer is not None and dbid is not None:
+            raise ValueError("Too many "+self.tableName.lower()+" parameters specified.")
+
+        if name is None and manufacturer is None and dbid is None:
+            candidates = None
+        else:
+            candidates = self.indicesWhere(name=name, manufacturer=manufacturer, dbid=dbid)
+            if len(candidates) == 0:
+                raise ValueError("No component in "+self.tableName+" matches the given parameters.")
+
+        if nearest:
+            if candidates is None:
+                rows = self.nearest(nearest)
+            else:
+                if not all(np.isfinite(value) for value in nearest.values()):
+                    raise ValueError("Nearest neighbour queries require finite values.")
+                dist = np.zeros(len(candidates))
+                for colName,value in nearest.items():
+                    dist += (self.columns[colName][candidates]-value)**2
+                rows = candidates[~np.isnan(dist)] # Components missing a target column cannot be compared
+                dist = dist[~np.isnan(dist)]
+                rows = rows[dist == np.min(dist, initial=np.inf)]
+            if len(rows) == 0:
+                raise ValueError("No component in "+self.tableName+" matching the given parameters has values for "+", ".join(nearest)+".")
+            if candidates is None:
+                return int(rows[0])
+            candidates = rows
+
+        if candidates is None:
+            candidates = self.uniqueRows
+        return int(candidates[randint(0, len(candidates)-1)])
+
+#The full set of component tables
+class ComponentCatalog:
+
+    tableNames = ["Batteries", "ESCs", "Motors", "Props"]
+
+    #Initialize the catalog from a dict of tables
+    def __init__(self, tables):
+        self.tables = tables
+        self.batteries = tables["Batteries"]
+        self.escs = tables["ESCs"]
+        self.motors = tables["Motors"]
+        self.props = tables["Props"]
+
+        self._setPropCoefs()
+
+    #Prop fit coefficients are stored in the database as one flat block per prop, thrust coefficients followed
+    #by power coefficients. These are unpacked once into two tensors of shape
+    #(n_props, max thrustFitOrder+1, max fitOfThrustFitOrder+1), zero padded for props with lower fit orders.
+    #Element [i,j,k] is the coefficient of rpm^k in the coefficient of J^j for prop i.
+    def _setPropCoefs(self):
+        props = self.props
+        coefNames = [colName for colName in props.columns if colName.startswith("thrust") or colName.startswith("power")]
+        coefNames = [colName for colName in coefNames if colName[-2:].isdigit()]
+        block = np.stack([props[colName] for colName in coefNames], axis=1)
+
+        thrustOrders = np.stack([props["thrustfitorder"], props["fitofthrustfitorder"]], axis=1)
+        powerOrders = np.stack([props["powerfitorder"], props["fitofpowerfitorder"]], axis=1)
+        props.thrustCoefs = np.zeros((props.size,)+tuple(thrustOrders.max(axis=0)+1))
+        props.powerCoefs = np.zeros((props.size,)+tuple(powerOrders.max(axis=0)+1))
+        orders = np.concatenate([thrustOrders, powerOrders], axis=1)
+        for tOrder,tFitOrder,pOrder,pFitOrder in np.unique(orders, axis=0):
+            rows = np.flatnonzero(np.all(orders == [tOrder,tFitOrder,pOrder,pFitOrder], axis=1))
+            numThrustCoefs = (tOrder+1)*(tFitOrder+1)
+            numPowerCoefs = (pOrder+1)*(pFitOrder+1)
+            props.thrustCoefs[rows,:tOrder+1,:tFitOrder+1] = block[rows,:numThrustCoefs].reshape((-1,tOrder+1,tFitOrder+1))
+            props.powerCoefs[rows,:pOrder+1,:pFitOrder+1] = block[rows,numThrustCoefs:numThrustCoefs+numPowerCoefs].reshape((-1,pOrder+1,pFitOrder+1))
+
+    #Reads the catalog directly from the database file
+    @classmethod
+    def fromDatabase(cls, dbFile):
+        tables = {}
+        with ComponentDatabase(dbFile, migrate=False) as db:
+            for tableName in cls.tableNames:
+                table = ComponentTable.fromRows(tableName, db.columnInfo(tableName), db.fetchAll(tableName))
+
+                #Row index of the canonical component standing in for each component (see componentAliases.py)
+                canonical = np.arange(table.size)
+                aliases = np.array(db.fetchAliases(tableName), dtype=np.int64).reshape((-1,2))
+                canonical[table.rowsForIds(aliases[:,0])] = table.rowsForIds(aliases[:,1])
+                table.columns["canonical"] = canonical
+                tables[tableName] = table
+        return cls(tables)
+
+    #Opens a binary snapshot of the catalog. Column arrays are memory mapped, so processes opening the same
+    #snapshot share its pages through the page cache.
+    @classmethod
+    def fromSnapshot(cls, snapshotDir):
+        with open(path.join(snapshotDir, "manifest.json")) as manifestFile:
+            manifest = json.load(manifestFile)
+        tables = {}
+        for tableName,colNames in manifest["tables"].items():
+            columns = {}
+            for colName in colNames:
+                columns[colName] = np.load(path.join(snapshotDir, tableName+"."+colName+".npy"), mmap_mode="r")
+            tables[tableName] = ComponentTable(tableName, columns)
+        return cls(tables)
+
+    #Attaches to a catalog held in a shared memory block (see SharedCatalog). The column arrays are views
+    #into the block, so no data is copied.
+    @classmethod
+    def fromSharedMemory(cls, descriptor):
+        shm = _attachSharedMemory(descriptor["name"])
+        tables = {}
+        for tableName,layout in descriptor["tables"].items():
+            columns = {}
+            for colName,dtype,shape,offset in layout:
+                columns[colName] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            tables[tableName] = ComponentTable(tableName, columns)
+        catalog = cls(tables)
+        catalog._shm = shm # Keeps the block mapped for as long as the catalog is alive
+        return catalog
+
+#Attaches to an existing shared memory block without taking ownership of it. Only the process which
+#created the block may unlink it.
+def _attachSharedMemory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError: # Python < 3.13. Child processes share the creator's resource tracker, so the block is still only unlinked once.
+        return shared_memory.SharedMemory(name=name)
+
+#Copies all columns of a catalog into a single shared memory block. The descriptor may be passed to other
+#processes (e.g. through a pool initializer), which then attach to the block using
+#ComponentCatalog.fromSharedMemory. The creating process must close the block once all workers are done,
+#which is done automatically when used as a context manager.
+class SharedCatalog:
+
+    def __init__(self, catalog):
+        layout = {}
+        offset = 0
+        for tableName,table in catalog.tables.items():
+            layout[tableName] = []
+            for colName,column in table.columns.items():
+                offset = -(-offset//64)*64 # Align each column to a cache line
+                layout[tableName].append((colName, column.dtype.str, column.shape, offset))
+                offset += column.nbytes
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset,1))
+        for tableName,table in catalog.tables.items():
+            for colName,dtype,shape,offset in layout[tableName]:
+                view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=self._shm.buf, offset=offset)
+                view[...] = table.columns[colName]
+        self.descriptor = {"name":self._shm.name, "tables":layout}
+
+    #Releases and removes the shared memory block
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+#Returns the sha256 hash of the contents of a file
+def fileHash(filename):
+    sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1<<20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+#Returns the default snapshot directory for a database file
+def snapshotDirFor(dbFile):
+    return path.splitext(dbFile)[0]+".snapshot"
+
+#Returns True if the snapshot exists and was built from the current database contents by this version of the code
+def snapshotIsCurrent(dbFile, snapshotDir=None):
+    if snapshotDir is None:
+        snapshotDir = snapshotDirFor(dbFile)
+    try:
+        with open(path.join(snapshotDir, "manifest.json")) as manifestFile:
+            manifest = json.load(manifestFile)
+    except (OSError, ValueError):
+        return False
+    return manifest.get("version") == SNAPSHOT_VERSION and manifest.get("sourceHash") == fileHash(dbFile)
+
+#Compiles the database into a snapshot directory containing one .npy file per column. The manifest is
+#written last, so an interrupted build is never mistaken for a current snapshot.
+def buildSnapshot(dbFile, snapshotDir=None):
+    if snapshotDir is None:
+        snapshotDir = snapshotDirFor(dbFile)
+    os.makedirs(snapshotDir, exist_ok=True)
+    manifestFile = path.join(snapshotDir, "manifest.json")
+    if path.exists(manifestFile):
+        os.remove(manifestFile)
+
+    sourceHash = fileHash(dbFile)
+    catalog = ComponentCatalog.fromDatabase(dbFile)
+    manifest = {"version":SNAPSHOT_VERSION, "sourceHash":sourceHash, "tables":{}}
+    for tableName,table in catalog.tables.items():
+        manifest["tables"][tableName] = list(table.columns.keys())
+        for colName,column in table.columns.items():
+            np.save(path.join(snapshotDir, tableName+"."+colName+".npy"), column)
+
+    with open(manifestFile+".tmp", "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(manifestFile+".tmp", manifestFile)
+    return snapshotDir
+
+#Opens the catalog for a database file through its snapshot, rebuilding the snapshot first if the database
+#has changed since it was built.
+def loadCatalog(dbFile, snapshotDir=None):
+    if snapshotDir is None:
+        snapshotDir = snapshotDirFor(dbFile)
+    if not snapshotIsCurrent(dbFile, snapshotDir):
+        buildSnapshot(dbFile, snapshotDir)
+    return ComponentCatalog.fromSnapshot(snapshotDir)
+
+if __name__ == "__main__":
+    dbFile = sys.argv[1] if len(sys.argv) > 1 else "Database/components.db"
+    print("Snapshot written to", buildSnapshot(dbFile))
@@ -0,0 +1,135 @@
+import sqlite3 as sql
+import sys
+
+#Classes in this file give parameterized access to the component database. Every query is built from a
+#fixed statement template with ? placeholders, so sqlite can reuse its prepared statements and names
+#containing quotes are handled correctly. Table and column names cannot be passed as parameters; they are
+#checked against the database schema before being placed in a statement.
+
+#Version of the schema migrations. Stored in the database as PRAGMA user_version.
+SCHEMA_VERSION = 1
+
+#Secondary indexes added by the migration, as (table, column) pairs
+INDEXED_COLUMNS = [("Motors", "name"), ("Motors", "manufacturer"), ("Motors", "kv"),
+                   ("Batteries", "Name"), ("Batteries", "manufacturer"), ("Batteries", "Capacity"),
+                   ("ESCs", "Name"), ("ESCs", "manufacturer"), ("ESCs", "Imax"),
+                   ("Props", "Name"), ("Props", "manufacturer"), ("Props", "Diameter")]
+
+class ComponentDatabase:
+
+    #Opens the database. The database file is only written to if migrate is True, in which case missing
+    #indexes are added to it (see migrate).
+    def __init__(self, dbFile, migrate=False):
+        self.dbFile = dbFile
+        self.db = sql.connect(dbFile, cached_statements=256)
+        self.tables = {}
+        for (tableName,) in self.db.execute("select name from sqlite_master where type = 'table'"):
+            self.tables[tableName] = [row[1] for row in self.db.execute("pragma table_info("+tableName+")")]
+        if migrate:
+            self.migrate()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    #Brings the database schema up to date
+    def migrate(self):
+        version = self.db.execute("pragma user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with self.db:
+            for tableName,colName in INDEXED_COLUMNS:
+                self._checkColumn(tableName, colName)
+                self.db.execute("create index if not exists idx_"+tableName+"_"+colName+" on "+tableName+" ("+colName+")")
+            self.db.execute("pragma user_version = "+str(SCHEMA_VERSION))
+
+    #Makes sure the table and column exist before their names are placed in a statement
+    def _checkColumn(self, tableName, colName=None):
+        if tableName not in self.tables:
+            raise ValueError("Unknown table: "+str(tableName))
+        if colName is not None and colName not in self.tables[tableName]:
+            raise ValueError("Unknown column: "+str(colName)+" in table "+tableName)
+
+    #Returns the schema of a table as (name, declared type) pairs
+    def columnInfo(self, tableName):
+        self._checkColumn(tableName)
+        return [(row[1], row[2]) for row in self.db.execute("pragma table_info("+tableName+")")]
+
+    #Returns all rows of a table, ordered by id
+    def fetchAll(self, tableName):
+        self._checkColumn(tableName)
+        return self.db.execute("select * from "+tableName+" order by id").fetchall()
+
+    #Returns the row with the given id, or None
+    def fetchById(self, tableName, dbid):
+        self._checkColumn(tableName)
+        return self.db.execute("select * from "+tableName+" where id = ?", (int(dbid),)).fetchone()
+
+    #Returns all rows with the given name
+    def fetchByName(self, tableName, name):
+        colName = self._nameColumn(tableName)
+        return self.db.execute("select * from "+tableName+" where "+colName+" = ? order by id", (name,)).fetchall()
+
+    #Returns all rows from the given manufacturer
+    def fetchByManufacturer(self, tableName, manufacturer):
+        self._checkColumn(tableName, "manufacturer")
+        return self.db.execute("select * from "+tableName+" where manufacturer = ? order by id", (manufacturer,)).fetchall()
+
+    #Returns the ids of all rows matching the given name or manufacturer (all ids if neither is given)
+    def idsWhere(self, tableName, name=None, manufacturer=None):
+        self._checkColumn(tableName)
+        if name is not None:
+            colName = self._nameColumn(tableName)
+            rows = self.db.execute("select id from "+tableName+" where "+colName+" = ? order by id", (name,))
+        elif manufacturer is not None:
+            rows = self.db.execute("select id from "+tableName+" where manufacturer = ? order by id", (manufacturer,))
+        else:
+            rows = self.db.execute("select id from "+tableName+" order by id")
+        return [row[0] for row in rows]
+
+    #Returns the (up to) k rows whose value in the given column is closest to the given value. Uses two
+    #index seeks, one either side of the value.
+    def fetchNearest(self, tableName, colName, value, k=1):
+        self._checkColumn(tableName, colName)
+        above = self.db.execute("select * from "+tableName+" where "+colName+" >= ? order by "+colName+" limit ?", (value, k)).fetchall()
+        below = self.db.execute("select * from "+tableName+" where "+colName+" < ? order by "+colName+" desc limit ?", (value, k)).fetchall()
+        colInd = self.tables[tableName].index(colName)
+        return sorted(above+below, key=lambda row: abs(row[colInd]-value))[:k]
+
+    #Replaces the aliases stored for a table. Each alias is a (id, canonical id) pair mapping a component to
+    #the component with the same physical parameters which stands in for it.
+    def writeAliases(self, tableName, aliases):
+        self._checkColumn(tableName)
+        with self.db:
+            self.db.execute("create table if not exists Aliases (tableName VARCHAR, id INTEGER, canonical_id INTEGER, primary key (tableName, id))")
+            self.db.execute("delete from Aliases where tableName = ?", (tableName,))
+            self.db.executemany("insert into Aliases (tableName, id, canonical_id) values (?, ?, ?)", [(tableName, int(dbid), int(canonId)) for dbid,canonId in aliases])
+        self.tables["Aliases"] = ["tableName", "id", "canonical_id"]
+
+    #Returns the (id, canonical id) pairs stored for a table
+    def fetchAliases(self, tableName):
+        self._checkColumn(tableName)
+        if "Aliases" not in self.tables:
+            return []
+        return self.db.execute("select id, canonical_id from Aliases where tableName = ? order by id", (tableName,)).fetchall()
+
+    #The name column is capitalized differently between tables
+    def _nameColumn(self, tableName):
+        self._checkColumn(tableName)
+        for colName in self.tables[tableName]:
+            if colName.lower() == "name":
+                return colName
+        raise ValueError("Table "+tableName+" has no name column")
+
+#Migrates the schema of the given database to the current version
+if __name__ == "__main__":
+    dbFile = sys.argv[1] if len(sys.argv) > 1 else "Database/components.db"
+    with ComponentDatabase(dbFile) as db:
+        print("Schema of", dbFile, "is at version", db.db.execute("pragma user_version").fetchone()[0])
+        db.migrate()
+        print("Migrated to version", db.db.execute("pragma user_version").fetchone()[0])
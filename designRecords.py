@@ -0,0 +1,50 @@
+import numpy as np
+import supportClasses as s
+
+#Evaluated designs are stored as records of a NumPy structured array rather than as PropulsionUnit objects.
+#A record holds the catalog row index of each component, the number of battery cells and the computed
+#performance of the design. Full component objects are only rebuilt from a record when needed.
+
+designDtype = np.dtype([("prop", np.int32),
+                        ("motor", np.int32),
+                        ("esc", np.int32),
+                        ("battery", np.int32),
+                        ("numCells", np.int8),
+                        ("flightTime", np.float32), # min
+                        ("throttle", np.float32),
+                        ("current", np.float32), # A
+                        ("weight", np.float32)]) # lbf, electrical components only
+
+#Returns the record of a propulsion unit evaluated at an operating point (see unitSolver.OperatingPoint) as a
+#tuple, suitable for filling a design array
+def recordOf(unit, flightTime, point):
+    return (unit.prop.index, unit.motor.index, unit.esc.index, unit.batt.index, unit.batt.n,
+            flightTime, point.throttle, point.current, unit.GetWeight())
+
+#Builds a design array from arrays of row indices and performance values, e.g. from a batch evaluation
+def fromArrays(propInd, motorInd, escInd, battInd, numCells, flightTime, throttle, current, weight):
+    records = np.empty(len(propInd), dtype=designDtype)
+    for field,values in zip(designDtype.names, [propInd, motorInd, escInd, battInd, numCells, flightTime, throttle, current, weight]):
+        records[field] = values
+    return records
+
+#Converts a list of record tuples to a design array
+def toRecords(records):
+    return np.array(records, dtype=designDtype)
+
+#Rebuilds the full propulsion unit described by a record
+def buildUnit(catalog, record, altitude):
+    prop = s.Propeller(catalog, index=int(record["prop"]))
+    motor = s.Motor(catalog, index=int(record["motor"]))
+    esc = s.ESC(catalog, index=int(record["esc"]))
+    batt = s.Battery(catalog, index=int(record["battery"]), numCells=int(record["numCells"]))
+    return s.PropulsionUnit(prop, motor, batt, esc, altitude)
+
+#Returns the values of a component column for each record, e.g. column(catalog, records, "prop", "diameter")
+def column(catalog, records, component, colName):
+    table = {"prop":catalog.props, "motor":catalog.motors, "esc":catalog.escs, "battery":catalog.batteries}[component]
+    return np.asarray(table[colName])[records[component]]
+
+#Returns the battery voltage of each record
+def batteryVoltage(catalog, records):
+    return column(catalog, records, "battery", "volt")*records["numCells"]
@@ -0,0 +1,150 @@
+import numpy as np
+import sqlite3 as sql
+import sys
+import time
+from collections import OrderedDict
+import batchEvaluator as be
+
+#Memoization of design evaluations. A design evaluated at a flight condition is keyed by the database ids of
+#its components, its number of battery cells, the altitude, airspeed and required thrust, and the solver
+#method. Results are held in memory in least recently used order and can also be stored in an SQLite file,
+#so that designs evaluated in an earlier run are not solved again. The file is tagged with the hash of the
+#component database and cleared when the database changes, since the ids then no longer describe the same
+#components.
+
+#Version of the cached results. Cache files written by a different version are cleared.
+CACHE_VERSION = 1
+
+#Columns of the key and of the cached values in the cache file
+KEY_COLUMNS = ["prop", "motor", "battery", "numCells", "esc", "altitude", "airspeed", "thrust", "method"]
+VALUE_COLUMNS = list(be.BatchResult._fields)
+
+class EvaluationCache:
+
+    #Creates a cache holding up to maxSize evaluations in memory. If cacheFile is given, evaluations are also
+    #stored in that file. tag identifies the component data the results belong to (see
+    #componentCatalog.fileHash).
+    def __init__(self, maxSize=100000, cacheFile=None, tag=""):
+        self.maxSize = maxSize
+        self.memo = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if cacheFile is not None:
+            self.db = sql.connect(cacheFile, timeout=60)
+            self.db.execute("pragma journal_mode = wal") # Worker processes read while others write
+            self._open(str(CACHE_VERSION)+":"+tag)
+
+    #Creates the tables of the cache file, clearing it if it was written for other components or by another
+    #version of the code
+    def _open(self, tag):
+        with self.db:
+            self.db.execute("create table if not exists Meta (key text primary key, value text)")
+            self.db.execute("create table if not exists Evaluations ("+", ".join(KEY_COLUMNS+VALUE_COLUMNS)+", primary key ("+", ".join(KEY_COLUMNS)+")) without rowid")
+            row = self.db.execute("select value from Meta where key = 'tag'").fetchone()
+            if row is None or row[0] != tag:
+                self.db.execute("delete from Evaluations")
+                self.db.execute("insert or replace into Meta values ('tag', ?)", (tag,))
+        self._select = "select "+", ".join(VALUE_COLUMNS)+" from Evaluations where "+" and ".join(col+" = ?" for col in KEY_COLUMNS)
+        self._insert = "insert or replace into Evaluations values ("+", ".join("?"*(len(KEY_COLUMNS)+len(VALUE_COLUMNS)))+")"
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.memo)
+
+    #Returns the cached values for a key, or None if the key has not been evaluated
+    def get(self, key):
+        values = self.memo.get(key)
+        if values is not None:
+            self.memo.move_to_end(key)
+            return values
+        if self.db is not None:
+            row = self.db.execute(self._select, key).fetchone()
+            if row is not None:
+                values = tuple(np.nan if value is None else value for value in row) # SQLite stores NaN as NULL
+                self._remember(key, values)
+        return values
+
+    #Stores the values of a number of keys
+    def put(self, keys, values):
+        for key,value in zip(keys, values):
+            self._remember(key, value)
+        if self.db is not None:
+            with self.db:
+                self.db.executemany(self._insert, [key+value for key,value in zip(keys, values)])
+
+    #Adds values to the memory, dropping the least recently used ones beyond maxSize
+    def _remember(self, key, values):
+        self.memo[key] = values
+        self.memo.move_to_end(key)
+        while len(self.memo) > self.maxSize:
+            self.memo.popitem(last=False)
+
+    #Returns the cache keys of a batch of units, given as in batchEvaluator.evaluate with the required thrust
+    #of each unit
+    def keys(self, catalog, propInd, motorInd, battInd, numCells, escInd, v_cruise, altitude, T_req, method):
+        columns = [catalog.props["id"][propInd], catalog.motors["id"][motorInd], catalog.batteries["id"][battInd],
+                   numCells, catalog.escs["id"][escInd]]
+        columns = [column.astype(np.int64).tolist() for column in columns]
+        columns += [np.broadcast_to(np.asarray(value, dtype=np.float64), propInd.shape).tolist() for value in [altitude, v_cruise, T_req]]
+        return list(zip(*columns, [method]*propInd.size))
+
+    #Evaluates a batch of units as batchEvaluator.evaluate, solving only the units which are not cached. Results
+    #of grouped evaluations are only approximate, so they are cached apart from exact ones.
+    def evaluate(self, catalog, propInd, motorInd, battInd, numCells, escInd, v_cruise, altitude, T_req=None, R_tw_req=None, W_frame=0.0, method="secant", groupTol=None, screen=True):
+        propInd,motorInd,battInd,numCells,escInd = [np.ravel(ind) for ind in np.broadcast_arrays(propInd, motorInd, battInd, numCells, escInd)]
+        if R_tw_req is not None:
+            T_req = (be.unitWeight(catalog, motorInd, battInd, numCells, escInd)+W_frame)*R_tw_req
+        T_req = np.broadcast_to(T_req, propInd.shape)
+        v_cruise = np.broadcast_to(v_cruise, propInd.shape)
+
+        keyMethod = method if not groupTol else method+"~"+str(groupTol)
+        keys = self.keys(catalog, propInd, motorInd, battInd, numCells, escInd, v_cruise, altitude, T_req, keyMethod)
+        values = [self.get(key) for key in keys]
+        miss = np.array([value is None for value in values], dtype=bool)
+        self.hits += miss.size-np.count_nonzero(miss)
+        self.misses += np.count_nonzero(miss)
+
+        if np.any(miss):
+            result = be.evaluate(catalog, propInd[miss], motorInd[miss], battInd[miss], numCells[miss], escInd[miss],
+                                 v_cruise[miss], altitude, T_req=T_req[miss], method=method, groupTol=groupTol, screen=screen)
+            missKeys = [key for key,m in zip(keys, miss) if m]
+            missValues = list(zip(*[field.tolist() for field in result]))
+            self.put(missKeys, missValues)
+            for i,value in zip(np.flatnonzero(miss), missValues):
+                values[i] = value
+
+        return be.BatchResult(*[np.array(field, dtype=np.float64) for field in zip(*values)]) if values else \
+               be.BatchResult(*[np.empty(0) for field in VALUE_COLUMNS])
+
+#Times repeated evaluation of random designs with and without the cache
+if __name__ == "__main__":
+    import componentCatalog as cc
+
+    dbFile = sys.argv[1] if len(sys.argv) > 1 else "Database/components.db"
+    numUnits = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    catalog = cc.loadCatalog(dbFile)
+    batch = be.randomBatch(catalog, np.random.default_rng(0), numUnits)
+    be.evaluate(catalog, *[ind[:1] for ind in batch], 10, 0, T_req=1, screen=False) # Compile the solvers before timing them
+    start = time.time()
+    expected = be.evaluate(catalog, *batch, 10, 0, T_req=1)
+    print("Uncached:", round(time.time()-start, 4), "s")
+
+    with EvaluationCache() as cache:
+        for name in ["First pass", "Second pass"]:
+            start = time.time()
+            result = cache.evaluate(catalog, *batch, 10, 0, T_req=1)
+            print(name+":", round(time.time()-start, 4), "s,", cache.hits, "hits,", cache.misses, "misses")
+    for name,a,b in zip(VALUE_COLUMNS, expected, result):
+        print(name, "matches:", np.array_equal(a, b, equal_nan=True))
@@ -0,0 +1,268 @@
+import numpy as np
+import sys
+import time
+from collections import namedtuple
+from std_atmos import statee
+import batchEvaluator as be
+import designRecords as dr
+import unitSolver as us
+
+#Exhaustive search of the design space by branch and bound. The designs form a tree: prop and motor pairs at
+#the top, then batteries with their number of cells, which fix the supply voltage, then ESCs. Every branch is
+#given an upper bound on the flight time of the designs within it (see unitSolver.currentBounds), computed
+#with optimistic choices of the components not yet fixed: the highest voltage and capacity, the lightest
+#components, no battery or ESC resistance and the highest current limits. Branches whose bound does not
+#exceed the best flight time found so far are pruned, and the designs left are solved by the batched solver.
+#Once the search ends, no design in the space can fly longer than the best one found, up to the tolerance of
+#the solver.
+
+#Numbers of battery cells searched, as drawn by batchEvaluator.randomBatch
+CELL_COUNTS = np.arange(1, 9)
+
+#Flight condition and thrust requirement of a search. The required thrust (lbf) is either given directly
+#(T_req) or as a thrust to weight ratio (R_tw_req) with the weight of the airframe (W_frame, lbf).
+Goal = namedtuple("Goal", ["v_cruise", "altitude", "T_req", "R_tw_req", "W_frame"])
+
+#Rows of the props, motors, ESCs and batteries searched
+Space = namedtuple("Space", ["props", "motors", "escs", "batteries"])
+
+#Summary of a search: the numbers of prop and motor pairs, of pairs which may be feasible at all, of pairs
+#bounded with each bin of batteries and of pairs expanded, the numbers of battery branches and of designs bounded, the number of designs solved, the best
+#flight time found (min) and the highest bound of any branch left unexplored
+SearchReport = namedtuple("SearchReport", ["pairs", "feasiblePairs", "binnedPairs", "expandedPairs", "batteryBranches",
+                                           "boundedDesigns", "solvedDesigns", "best", "remainingBound"])
+
+#Returns the required thrust (lbf) of units of the given weight (lbf)
+def requiredThrust(goal, weight):
+    if goal.R_tw_req is not None:
+        return (weight+goal.W_frame)*goal.R_tw_req
+    return np.full(np.shape(weight), float(goal.T_req))
+
+#Returns the space searched: the candidate rows given for each table (in the order of Space, None for an
+#unconstrained table), or all of its rows. If canonical is True, unconstrained tables only give their canonical
+#rows (see componentAliases.py), as drawn by the random searches; aliases are then left out, so the exhaustive
+#search is only exact up to the tolerance within which aliases agree with their canonical components.
+def searchSpace(catalog, candidates=(None, None, None, None), canonical=False):
+    tables = [catalog.props, catalog.motors, catalog.escs, catalog.batteries]
+    return Space(*[np.asarray(cand if cand is not None else table.uniqueRows if canonical else np.arange(len(table)))
+                   for table,cand in zip(tables, candidates)])
+
+#Returns the flight time bounds of units with batteries of the given capacity (mAh) and current limits (A)
+#(see unitSolver.flightTimeBound), NaN where the units cannot be feasible
+def timeBound(params, goal, T_req, capacity, escIMax, battIMax):
+    I_min,I_max = us.currentBounds(params, goal.v_cruise, T_req)
+    return np.where(us.currentMayFit(I_min, I_max, escIMax, battIMax), us.flightTimeBound(capacity, I_min), np.nan)
+
+#Gathers the parameters of units from their props and motors and the given supply voltage and battery and ESC
+#resistances
+def _params(catalog, propInd, motorInd, V0, R_batt, R_esc, altitude):
+    props = catalog.props
+    motors = catalog.motors
+    _,_,_,airDensity = statee(altitude)
+    return us.UnitParams(props.thrustCoefs[propInd], props["thrustfitorder"][propInd],
+                         props.powerCoefs[propInd], props["powerfitorder"][propInd],
+                         props["diameter"][propInd],
+                         motors["kv"][motorInd], motors["gear_ratio"][motorInd], motors["no_load_current"][motorInd],
+                         motors["resistance"][motorInd], V0, R_batt, R_esc, airDensity)
+
+#Returns the flight time bounds of the pairs of the given props with every motor of the space, as an array
+#with a row per prop. NaN where a pair cannot be feasible with any battery and ESC.
+def pairBounds(catalog, space, goal, propInd):
+    batts = catalog.batteries
+    escs = catalog.escs
+    propInd,motorInd = [ind.ravel() for ind in np.meshgrid(propInd, space.motors, indexing="ij")]
+    V0 = np.max(batts["volt"][space.batteries])*CELL_COUNTS[-1]
+    weight = (catalog.motors["weight"][motorInd] + np.min(batts["weight"][space.batteries])*CELL_COUNTS[0] + np.min(escs["weight"][space.escs]))/16
+    params = _params(catalog, propInd, motorInd, V0, 0.0, 0.0, goal.altitude)
+    bound = timeBound(params, goal, requiredThrust(goal, weight), np.max(batts["capacity"][space.batteries]),
+                      np.max(escs["imax"][space.escs]), np.max(batts["imax"][space.batteries]))
+    return bound.reshape(-1, len(space.motors))
+
+#Battery branches of a space (every battery with every number of cells) in bins of their weight (oz), given by
+#their edges. Each bin holds the battery rows and cell counts of its branches in order of their voltage, the
+#voltages, the largest capacity (mAh) of the branches of at least each voltage (0 past the last), the highest
+#voltage and the highest current limit (A).
+BatteryBins = namedtuple("BatteryBins", ["edges", "branches", "V0", "capAbove", "V0Max", "iMax"])
+
+#Returns the battery branches of a space in numBins bins of about equal size
+def batteryBins(catalog, space, numBins=16):
+    batts = catalog.batteries
+    battInd,numCells = [ind.ravel() for ind in np.meshgrid(space.batteries, CELL_COUNTS, indexing="ij")]
+    weight = batts["weight"][battInd]*numCells
+    edges = np.unique(np.quantile(weight, np.linspace(0, 1, numBins+1), method="inverted_cdf"))
+    if len(edges) == 1:
+        edges = np.append(edges, edges)
+    inBin = np.clip(np.searchsorted(edges, weight, side="right")-1, 0, len(edges)-2)
+
+    branches,V0,capAbove = [],[],[]
+    for j in range(len(edges)-1):
+        rows = np.flatnonzero(inBin == j)
+        rows = rows[np.argsort(batts["volt"][battInd[rows]]*numCells[rows], kind="stable")]
+        branches.append((battInd[rows], numCells[rows]))
+        V0.append(batts["volt"][battInd[rows]]*numCells[rows])
+        capAbove.append(np.append(np.maximum.accumulate(batts["capacity"][battInd[rows]][::-1])[::-1], 0))
+    return BatteryBins(edges, branches, V0, capAbove, np.array([v[-1] for v in V0]),
+                       np.array([np.max(batts["imax"][b]) for b,_ in branches]))
+
+#Returns the flight time bounds of prop and motor pairs with the batteries of each bin, as an array with a row
+#per pair and a column per bin, and the least supply voltage (V) each pair needs with each bin (see
+#unitSolver.supplyBounds). The thrust required with a bin is bounded by the weights at its edges, and only the
+#batteries of high enough voltage count towards its capacity. NaN where no design of a bin can be feasible.
+def binBounds(catalog, space, goal, bins, propInd, motorInd):
+    escs = catalog.escs
+    motorWeight = catalog.motors["weight"][motorInd][:,np.newaxis]
+    escWeight = np.min(escs["weight"][space.escs])
+    T_lo = requiredThrust(goal, (motorWeight + bins.edges[:-1] + escWeight)/16)
+    T_hi = requiredThrust(goal, (motorWeight + bins.edges[1:] + escWeight)/16)
+    params = _params(catalog, propInd[:,np.newaxis], motorInd[:,np.newaxis], bins.V0Max, 0.0, 0.0, goal.altitude)
+    I_min,I_max,V_min = us.supplyBounds(params, goal.v_cruise, T_lo, T_hi)
+
+    capacity = np.stack([capAbove[np.searchsorted(V0, V_min[:,j])] for j,(V0,capAbove) in enumerate(zip(bins.V0, bins.capAbove))], axis=-1)
+    feasible = us.currentMayFit(I_min, I_max, np.max(escs["imax"][space.escs]), bins.iMax) & (capacity > 0)
+    bound = us.flightTimeBound(capacity, I_min)
+    return np.where(feasible, bound, np.nan), V_min
+
+#Expands prop and motor pairs, skipping the branches whose bound does not exceed the best flight time, which
+#starts at best and rises with the designs found. The pairs are bounded again with each bin of batteries (see
+#binBounds), with the numbers of bins in binLevels in turn, and taken in order of those bounds. Battery
+#branches are taken in order of their bounds, a few at a time, so that the best flight time rises early.
+#Returns the feasible designs solved, at most keep of them with the longest flight times, the counts of pairs
+#bounded by bin and expanded, battery branches and designs bounded and designs solved, and the best flight
+#time.
+def expandPairs(catalog, space, goal, propInd, motorInd, best, method="secant", keep=10000, binLevels=(16, 64), branchesPerStep=8):
+    batts = catalog.batteries
+    escs = catalog.escs
+    escIMax = np.max(escs["imax"][space.escs])
+    escWeight = np.min(escs["weight"][space.escs])
+
+    #Bound the pairs with bins of batteries, then with finer bins the pairs which may still beat the best
+    counts = np.zeros(5, dtype=np.int64)
+    counts[0] = len(propInd)
+    for numBins in binLevels:
+        bins = batteryBins(catalog, space, numBins)
+        bounds,V_min = binBounds(catalog, space, goal, bins, propInd, motorInd)
+        pairBound = np.max(np.where(np.isnan(bounds), 0, bounds), axis=-1, initial=0)
+        left = pairBound > best
+        propInd,motorInd,bounds,V_min,pairBound = propInd[left],motorInd[left],bounds[left],V_min[left],pairBound[left]
+    order = np.argsort(-pairBound, kind="stable")
+
+    found = []
+    for i in order:
+        if not pairBound[i] > best:
+            break
+        p,m = propInd[i],motorInd[i]
+        counts[1] += 1
+
+        #Battery branches of the bins left, of high enough voltage
+        branches = [(bins.branches[j][0][k:], bins.branches[j][1][k:]) for j in np.flatnonzero(bounds[i] > best)
+                    for k in [np.searchsorted(bins.V0[j], V_min[i,j])]]
+        b = np.concatenate([b for b,_ in branches])
+        c = np.concatenate([c for _,c in branches])
+        weight = (catalog.motors["weight"][m] + batts["weight"][b]*c + escWeight)/16
+        params = _params(catalog, p, m, batts["volt"][b]*c, batts["ri"][b]*c, 0.0, goal.altitude)
+        battBound = timeBound(params, goal, requiredThrust(goal, weight), batts["capacity"][b], escIMax, batts["imax"][b])
+        counts[2] += len(b)
+        keepBatt = np.flatnonzero(battBound > best)
+        keepBatt = keepBatt[np.argsort(-battBound[keepBatt], kind="stable")]
+
+        for start in range(0, len(keepBatt), branchesPerStep):
+            step = keepBatt[start:start+branchesPerStep]
+            if not battBound[step[0]] > best:
+                break
+
+            #Designs of the branches, with every ESC
+            b_ = np.repeat(b[step], len(space.escs))
+            c_ = np.repeat(c[step], len(space.escs))
+            e = np.tile(space.escs, len(step))
+            ok = be.solvable(catalog, m, b_, e)
+            b_,c_,e = b_[ok],c_[ok],e[ok]
+            T_req = requiredThrust(goal, be.unitWeight(catalog, m, b_, c_, e))
+            params = _params(catalog, p, m, batts["volt"][b_]*c_, batts["ri"][b_]*c_, escs["ri"][e], goal.altitude)
+            leafBound = timeBound(params, goal, T_req, batts["capacity"][b_], escs["imax"][e], batts["imax"][b_])
+            counts[3] += len(b_)
+            solve = leafBound > best
+            if not np.any(solve):
+                continue
+
+            b_,c_,e,T_req = b_[solve],c_[solve],e[solve],T_req[solve]
+            p_,m_ = np.full(len(b_), p),np.full(len(b_), m)
+            result = be.evaluate(catalog, p_, m_, b_, c_, e, goal.v_cruise, goal.altitude, T_req=T_req, method=method, screen=False)
+            counts[4] += len(b_)
+            feasible = np.flatnonzero(~np.isnan(result.flightTime))
+            if len(feasible) > 0:
+                best = max(best, np.max(result.flightTime[feasible]))
+                found.append(dr.fromArrays(p_[feasible], m_[feasible], e[feasible], b_[feasible], c_[feasible], result.flightTime[feasible],
+                                           result.throttle[feasible], result.current[feasible], result.weight[feasible]))
+                if sum(len(records) for records in found) > 2*keep:
+                    found = [_best(np.concatenate(found), keep)]
+
+    records = _best(np.concatenate(found), keep) if found else np.empty(0, dtype=dr.designDtype)
+    return records, counts, best
+
+#Returns the count designs with the longest flight times, longest first
+def _best(records, count):
+    return records[np.argsort(-records["flightTime"], kind="stable")[:count]]
+
+#Runs a search step, given by the name of one of the functions above, on the given catalog for each set of
+#arguments. Replaced by a pool's map to run the steps in parallel (see searchWorker.exhaustiveStep).
+def serialMap(catalog):
+    return lambda name, argsList: [globals()[name](catalog, *args) for args in argsList]
+
+#Searches the space exhaustively for the design with the longest flight time. Steps are run by mapStep (see
+#serialMap), in rounds of tasks of pairs with the highest bounds left, and the best flight time found is
+#passed on to the next round. Rounds start with tasks of a few pairs, so that a good design is found early,
+#and grow up to pairsPerTask pairs. Returns the count feasible designs found with the longest flight times,
+#the optimum first, and a SearchReport.
+def search(catalog, space, goal, method="secant", count=1000, mapStep=None, tasks=1, pairsPerTask=1024, propsPerTask=16):
+    mapStep = serialMap(catalog) if mapStep is None else mapStep
+
+    #Bound every prop and motor pair and order the pairs which may be feasible by their bound
+    chunks = [space.props[i:i+propsPerTask] for i in range(0, len(space.props), propsPerTask)]
+    bounds = np.concatenate(mapStep("pairBounds", [(space, goal, chunk) for chunk in chunks])).ravel()
+    pairs = np.flatnonzero(~np.isnan(bounds))
+    pairs = pairs[np.argsort(-bounds[pairs], kind="stable")]
+    propInd = space.props[pairs//len(space.motors)]
+    motorInd = space.motors[pairs%len(space.motors)]
+    bounds = bounds[pairs]
+
+    best = 0.0
+    found = []
+    counts = np.zeros(5, dtype=np.int64)
+    start = 0
+    size = 1
+    while start < len(pairs) and bounds[start] > best:
+        stop = min(start+tasks*size, len(pairs))
+        args = [(space, goal, propInd[i:stop:tasks], motorInd[i:stop:tasks], best, method, count)
+                for i in range(start, min(start+tasks, stop))] # Tasks take turns in the order of the pairs
+        for records,taskCounts,taskBest in mapStep("expandPairs", args):
+            found.append(records)
+            counts += taskCounts
+            best = max(best, taskBest)
+        start = stop
+        size = min(2*size, pairsPerTask)
+
+    remaining = bounds[start] if start < len(pairs) else 0.0
+    records = _best(np.concatenate(found), count) if found else np.empty(0, dtype=dr.designDtype)
+    return records, SearchReport(len(space.props)*len(space.motors), len(pairs), *counts.tolist(), float(best), float(remaining))
+
+#Runs an exhaustive search and checks its optimum against a random search of the same space
+if __name__ == "__main__":
+    import componentCatalog as cc
+
+    dbFile = sys.argv[1] if len(sys.argv) > 1 else "Database/components.db"
+    numUnits = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+    catalog = cc.loadCatalog(dbFile)
+    goal = Goal(10, 0, None, 0.3, 1)
+    space = searchSpace(catalog)
+    be.evaluate(catalog, space.props[:1], space.motors[:1], space.batteries[:1], 1, space.escs[:1], 10, 0, T_req=1, screen=False) # Compile the solvers before timing them
+
+    start = time.time()
+    records,report = search(catalog, space, goal)
+    print("Exhaustive search:", round(time.time()-start, 1), "s")
+    print(report)
+    print("Optimum:", records[:1])
+
+    batch = be.randomBatch(catalog, np.random.default_rng(0), numUnits)
+    result = be.evaluate(catalog, *batch, goal.v_cruise, goal.altitude, R_tw_req=goal.R_tw_req, W_frame=goal.W_frame)
+    print("Best of", numUnits, "random designs:", np.nanmax(result.flightTime), "min")
@@ -0,0 +1,265 @@
+import numpy as np
+import sys
+import time
+from collections import namedtuple
+import batchEvaluator as be
+import designRecords as dr
+import exhaustiveSearch as es
+
+#Evolutionary search of the design space. A design is a genome of five genes: its prop, motor, battery, number
+#of battery cells and ESC, each given by its position among the rows of the space searched (see
+#exhaustiveSearch.Space). A population of designs is evolved by tournament selection, crossover, which swaps
+#whole components between two parents, and mutation, which moves a component to one of its nearest
+#neighbours in parameter space (e.g. a motor of about the same Kv, resistance and weight) or the cell count
+#up or down by one. The fitness of a design is its flight time. Designs which fail the feasibility screen (see
+#batchEvaluator.screenUnits) or cannot meet the requirement are the least fit. Every design is solved at
+#most once; designs bred again take their earlier result.
+
+#Catalog columns spanning the parameter space of each component, in the order of the genes (the cell count
+#has no columns)
+NEIGHBOUR_COLUMNS = [("props", ["diameter", "pitch"]),
+                     ("motors", ["kv", "resistance", "no_load_current", "weight"]),
+                     ("batteries", ["volt", "capacity", "ri", "weight", "imax"]),
+                     None,
+                     ("escs", ["imax", "ri", "weight"])]
+
+#Fitness of designs which are not feasible
+INFEASIBLE = -1.0
+
+#Summary of one generation: the number of designs solved so far, the longest flight time found so far (min),
+#the mean flight time of the feasible designs of the population (min) and the share of them which are feasible
+Generation = namedtuple("Generation", ["generation", "solverCalls", "best", "mean", "feasible"])
+
+#Summary of a search: the number of generations, of designs solved and of distinct designs bred, the longest
+#flight time found (min) and the Generation of each generation
+SearchReport = namedtuple("SearchReport", ["generations", "solverCalls", "evaluatedDesigns", "best", "history"])
+
+#Returns, for each row of a set of components given by their parameters (one column per parameter), the
+#positions of its k nearest neighbours. Each parameter is replaced by its rank among the rows, so that steps
+#are even across the range of a parameter whatever its scale, e.g. a step to the next Kv up or down.
+def neighbourTable(values, k=8, chunk=256):
+    n = len(values)
+    k = min(k, n-1)
+    if k == 0:
+        return np.zeros((n, 1), dtype=np.int64)
+    ranks = np.stack([np.searchsorted(np.sort(col), col)/max(n-1, 1) for col in np.asarray(values, dtype=np.float64).T], axis=-1)
+    table = np.empty((n, k), dtype=np.int64)
+    for start in range(0, n, chunk):
+        d = np.sum((ranks[start:start+chunk,np.newaxis,:]-ranks[np.newaxis,:,:])**2, axis=-1)
+        d[np.arange(len(d)), np.arange(start, start+len(d))] = np.inf # A component is not its own neighbour
+        table[start:start+chunk] = np.argpartition(d, k-1, axis=-1)[:,:k]
+    return table
+
+#Returns the neighbour table of each gene of a space (None for the cell count)
+def neighbourTables(catalog, space, k=8):
+    rows = {"props":space.props, "motors":space.motors, "batteries":space.batteries, "escs":space.escs}
+    tables = []
+    for gene in NEIGHBOUR_COLUMNS:
+        if gene is None:
+            tables.append(None)
+            continue
+        tableName,colNames = gene
+        table = getattr(catalog, tableName)
+        tables.append(neighbourTable(np.column_stack([table[col][rows[tableName]] for col in colNames]), k))
+    return tables
+
+#Returns the sizes of the genes of a space
+def geneSizes(space):
+    return (len(space.props), len(space.motors), len(space.batteries), len(es.CELL_COUNTS), len(space.escs))
+
+#Returns the catalog rows and cell counts (in the order of batchEvaluator.evaluate) of an array of genomes
+def genomeRows(space, genomes):
+    return (space.props[genomes[:,0]], space.motors[genomes[:,1]], space.batteries[genomes[:,2]],
+            es.CELL_COUNTS[genomes[:,3]], space.escs[genomes[:,4]])
+
+#Returns a mask of the genomes which pass the feasibility screen
+def screenGenomes(catalog, space, goal, genomes):
+    propInd,motorInd,battInd,numCells,escInd = genomeRows(space, genomes)
+    T_req = es.requiredThrust(goal, be.unitWeight(catalog, motorInd, battInd, numCells, escInd))
+    return be.screenUnits(catalog, propInd, motorInd, battInd, numCells, escInd, goal.v_cruise, goal.altitude, T_req)
+
+#Evaluates an array of genomes. Only the genomes which pass the feasibility screen are solved. Returns a
+#BatchResult (see batchEvaluator.evaluate) with NaN for the others and the number of genomes solved.
+def evaluateGenomes(catalog, space, goal, genomes, method="secant"):
+    propInd,motorInd,battInd,numCells,escInd = genomeRows(space, genomes)
+    weight = be.unitWeight(catalog, motorInd, battInd, numCells, escInd)
+    T_req = es.requiredThrust(goal, weight)
+    ok = be.screenUnits(catalog, propInd, motorInd, battInd, numCells, escInd, goal.v_cruise, goal.altitude, T_req)
+    result = be.evaluate(catalog, propInd[ok], motorInd[ok], battInd[ok], numCells[ok], escInd[ok], goal.v_cruise, goal.altitude,
+                         T_req=T_req[ok], method=method, screen=False)
+    fields = [np.full(len(genomes), np.nan) for field in be.BatchResult._fields]
+    for field,values in zip(fields, result):
+        field[ok] = values
+    fields[-1] = weight
+    return be.BatchResult(*fields), int(np.count_nonzero(ok))
+
+#Runs a search step, given by the name of one of the functions above, on the given catalog for each set of
+#arguments. Replaced by a pool's map to run the steps in parallel (see searchWorker.geneticStep).
+def serialMap(catalog):
+    return lambda name, argsList: [globals()[name](catalog, *args) for args in argsList]
+
+#Draws size random genomes which pass the feasibility screen. Gives up after maxDraws batches, filling the
+#population with genomes which do not pass.
+def randomPopulation(catalog, space, goal, rng, size, maxDraws=1000):
+    sizes = geneSizes(space)
+    population = []
+    numFound = 0
+    for draw in range(maxDraws):
+        genomes = np.column_stack([rng.integers(0, n, size) for n in sizes])
+        passed = genomes[screenGenomes(catalog, space, goal, genomes)]
+        population.append(passed[:size-numFound])
+        numFound += len(population[-1])
+        if numFound == size:
+            break
+    population.append(genomes[:size-numFound])
+    return np.concatenate(population)
+
+#Returns the positions of the winners of size tournaments between tournamentSize random members of a population
+def tournament(rng, fitness, size, tournamentSize=3):
+    entrants = rng.integers(0, len(fitness), (size, tournamentSize))
+    return entrants[np.arange(size), np.argmax(fitness[entrants], axis=-1)]
+
+#Breeds size children from pairs of parents. Each component of a child (the battery with its cell count) comes
+#from either parent. Each gene then moves to a random nearest neighbour with probability mutationRate (the
+#cell count by one cell), or to a random value with probability randomRate.
+def breed(rng, space, neighbours, parents, others, mutationRate=0.2, randomRate=0.02):
+    size = len(parents)
+    fromOther = rng.random((size, 4)) < 0.5
+    fromOther = np.insert(fromOther, 3, fromOther[:,2], axis=1) # The cell count goes with its battery
+    children = np.where(fromOther, others, parents)
+
+    for g,(n,table) in enumerate(zip(geneSizes(space), neighbours)):
+        mutate = np.flatnonzero(rng.random(size) < mutationRate)
+        if table is None:
+            children[mutate,g] = np.clip(children[mutate,g]+rng.choice([-1, 1], len(mutate)), 0, n-1)
+        else:
+            children[mutate,g] = table[children[mutate,g], rng.integers(0, table.shape[1], len(mutate))]
+        redraw = np.flatnonzero(rng.random(size) < randomRate)
+        children[redraw,g] = rng.integers(0, n, len(redraw))
+    return children
+
+#Designs bred so far, keyed by a single integer per genome and kept in order of the keys
+class Archive:
+
+    def __init__(self, space):
+        self.sizes = geneSizes(space)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.genomes = np.empty((0, 5), dtype=np.int64)
+        self.results = be.BatchResult(*[np.empty(0) for field in be.BatchResult._fields])
+
+    def __len__(self):
+        return len(self.keys)
+
+    #Returns the keys of genomes
+    def keysOf(self, genomes):
+        return np.ravel_multi_index(genomes.T, self.sizes).astype(np.int64)
+
+    #Returns a mask of the genomes which are in the archive and the positions in the archive of those genomes
+    def find(self, genomes):
+        keys = self.keysOf(genomes)
+        pos = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys)-1, 0))
+        found = (self.keys[pos] == keys) if len(self.keys) > 0 else np.zeros(len(keys), dtype=bool)
+        return found, pos
+
+    #Adds genomes with their results. Genomes already in the archive keep their earlier result and a genome
+    #given more than once is added with its first result.
+    def add(self, genomes, results):
+        keys,first = np.unique(self.keysOf(genomes), return_index=True)
+        first = first[~np.isin(keys, self.keys)]
+        genomes = genomes[first]
+        results = [field[first] for field in results]
+        keys = np.concatenate([self.keys, self.keysOf(genomes)])
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.genomes = np.concatenate([self.genomes, genomes])[order]
+        self.results = be.BatchResult(*[np.concatenate([old, new])[order] for old,new in zip(self.results, results)])
+
+    #Returns the feasible designs with the longest flight times, longest first
+    def best(self, count):
+        feasible = np.flatnonzero(~np.isnan(self.results.flightTime))
+        feasible = feasible[np.argsort(-self.results.flightTime[feasible], kind="stable")[:count]]
+        return feasible
+
+#Prints the summary of a generation
+def printGeneration(gen):
+    print("Generation {0}: {1} designs solved, longest flight time {2:.4f} min, population mean {3:.4f} min ({4:.1f}% feasible)".format(
+          gen.generation, gen.solverCalls, gen.best, gen.mean, 100*gen.feasible))
+
+#Searches the space by evolving a population of populationSize designs for up to generations generations, or
+#until maxSolverCalls designs have been solved. The fittest eliteFraction of each generation is kept as is
+#and the rest of it is bred from parents chosen by tournament. Designs are evaluated by mapStep (see
+#serialMap) in tasks of about equal size. log is called with the Generation of each generation. Returns the
+#count feasible designs found with the longest flight times, the optimum first, and a SearchReport.
+def search(catalog, space, goal, method="secant", count=1000, mapStep=None, tasks=1, populationSize=1000, generations=50,
+           maxSolverCalls=None, eliteFraction=0.1, tournamentSize=3, mutationRate=0.2, randomRate=0.02, neighbours=8, rng=None,
+           log=printGeneration):
+    mapStep = serialMap(catalog) if mapStep is None else mapStep
+    rng = np.random.default_rng() if rng is None else rng
+    tables = neighbourTables(catalog, space, neighbours)
+    archive = Archive(space)
+    numElite = int(eliteFraction*populationSize)
+
+    population = randomPopulation(catalog, space, goal, rng, populationSize)
+    solverCalls = 0
+    history = []
+    for generation in range(generations+1):
+        if generation > 0:
+            elite = np.argsort(-fitness, kind="stable")[:numElite]
+            size = populationSize-numElite
+            parents = population[tournament(rng, fitness, size, tournamentSize)]
+            others = population[tournament(rng, fitness, size, tournamentSize)]
+            population = np.concatenate([population[elite], breed(rng, space, tables, parents, others, mutationRate, randomRate)])
+
+        #Evaluate the designs not bred before
+        found,_ = archive.find(population)
+        new = np.unique(population[~found], axis=0)
+        if len(new) > 0:
+            argsList = [(space, goal, genomes, method) for genomes in np.array_split(new, min(tasks, len(new)))]
+            results = mapStep("evaluateGenomes", argsList)
+            archive.add(new, be.BatchResult(*[np.concatenate(field) for field in zip(*[result for result,_ in results])]))
+            solverCalls += sum(calls for _,calls in results)
+
+        _,pos = archive.find(population)
+        flightTime = archive.results.flightTime[pos]
+        fitness = np.where(np.isnan(flightTime), INFEASIBLE, flightTime)
+        feasible = ~np.isnan(flightTime)
+        bestFound = archive.results.flightTime[archive.best(1)]
+        history.append(Generation(generation, solverCalls, float(bestFound[0]) if len(bestFound) > 0 else 0.0,
+                                  float(np.mean(flightTime[feasible])) if np.any(feasible) else 0.0, float(np.mean(feasible))))
+        log(history[-1])
+        if maxSolverCalls is not None and solverCalls >= maxSolverCalls:
+            break
+
+    best = archive.best(count)
+    propInd,motorInd,battInd,numCells,escInd = genomeRows(space, archive.genomes[best])
+    result = be.BatchResult(*[field[best] for field in archive.results])
+    records = dr.fromArrays(propInd, motorInd, escInd, battInd, numCells, result.flightTime, result.throttle, result.current, result.weight)
+    return records, SearchReport(len(history)-1, solverCalls, len(archive), history[-1].best, history)
+
+#Runs an evolutionary search and compares it with a random search solving the same number of designs
+if __name__ == "__main__":
+    import componentCatalog as cc
+
+    dbFile = sys.argv[1] if len(sys.argv) > 1 else "Database/components.db"
+    generations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    catalog = cc.loadCatalog(dbFile)
+    goal = es.Goal(10, 0, None, 0.3, 1)
+    space = es.searchSpace(catalog, canonical=True)
+    be.evaluate(catalog, space.props[:1], space.motors[:1], space.batteries[:1], 1, space.escs[:1], 10, 0, T_req=1, screen=False) # Compile the solvers before timing them
+
+    start = time.time()
+    records,report = search(catalog, space, goal, generations=generations, rng=np.random.default_rng(0))
+    print("Evolutionary search:", round(time.time()-start, 1), "s,", report.solverCalls, "designs solved")
+    print("Optimum:", records[:1])
+
+    #Random designs passing the screen, until as many have been solved
+    rng = np.random.default_rng(1)
+    best = 0.0
+    solved = 0
+    while solved < report.solverCalls:
+        genomes = randomPopulation(catalog, space, goal, rng, min(10000, report.solverCalls-solved))
+        result,calls = evaluateGenomes(catalog, space, goal, genomes)
+        best = max(best, np.nanmax(result.flightTime, initial=0))
+        solved += calls
+    print("Random search:", solved, "designs solved, longest flight time", best, "min")
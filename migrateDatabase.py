@@ -0,0 +1,20 @@
+import sys
+import componentAliases as ca
+from componentDatabase import ComponentDatabase
+
+#Brings a component database up to date in place: migrates its schema (see componentDatabase.migrate) and
+#groups duplicate components into aliases (see componentAliases.writeAliases). The database shipped with the
+#package is not migrated; run this script on a copy, or on the database itself after changing it. Opening a
+#database never changes it, so a database which has not been migrated is still used as is, without secondary
+#indexes and with every component taken as canonical.
+
+#Migrates the database file, grouping components which agree to within the relative tolerance relTol
+def migrateDatabase(dbFile, relTol=ca.DEFAULT_TOLERANCE):
+    with ComponentDatabase(dbFile) as db:
+        db.migrate()
+    ca.writeAliases(dbFile, relTol)
+
+if __name__ == "__main__":
+    dbFile = sys.argv[1] if len(sys.argv) > 1 else "Database/components.db"
+    relTol = float(sys.argv[2]) if len(sys.argv) > 2 else ca.DEFAULT_TOLERANCE
+    migrateDatabase(dbFile, relTol)
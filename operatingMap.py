@@ -0,0 +1,126 @@
+import numpy as np
+import unitSolver as us
+
+#Operating maps of propulsion units. A map holds the thrust, prop speed and motor current of one unit
+#solved on a grid of cruise speeds and throttle settings. Operating points between the grid points are
+#found by bicubic interpolation, so once a map is built, querying it costs a table lookup instead of a
+#solve. The grid is refined until the interpolation error, measured against the solver at the centre of
+#every grid cell, is within a given bound. Elsewhere in a cell the error is not measured and may exceed the
+#bound by a small factor.
+
+#Fields of the map, in the order returned by OperatingMap.query
+FIELDS = ("thrust", "rpm", "current")
+
+#Returns the weights of the four grid points around each point for cubic convolution (Catmull-Rom)
+#interpolation, given the position s of the point within its grid cell
+def _cubicWeights(s):
+    s2 = s*s
+    s3 = s2*s
+    return np.stack([(-s3 + 2*s2 - s)/2, (3*s3 - 5*s2 + 2)/2, (-3*s3 + 4*s2 + s)/2, (s3 - s2)/2], axis=-1)
+
+#Pads a grid by one point on every side by linear extrapolation, so that every cell has the four points
+#in each direction needed by cubic interpolation. A direction with a single point is padded with copies of it.
+def _pad(grid):
+    for axis in range(2):
+        first = np.take(grid, [0], axis=axis)
+        last = np.take(grid, [-1], axis=axis)
+        if grid.shape[axis] > 1:
+            first = 2*first-np.take(grid, [1], axis=axis)
+            last = 2*last-np.take(grid, [-2], axis=axis)
+        grid = np.concatenate([first, grid, last], axis=axis)
+    return grid
+
+#A map of the operating points of a single unit over cruise speeds from 0 to v_max and throttle settings
+#from 0 to 1. If v_max is 0, the map holds a single speed and is interpolated in throttle only.
+class OperatingMap:
+
+    #Builds the map of the unit with the given parameters (see unitSolver.UnitParams). The grid starts at
+    #numPoints points in each direction and is doubled until the interpolation error of every field is at
+    #most errMax relative to the largest magnitude of that field at the centre of every cell, or until it
+    #would exceed maxPoints. Cells which are still above the bound then (e.g. around the kink where the prop
+    #starts to windmill) are solved directly when queried. The bound only holds at the cell centres; it is an
+    #estimate of the error elsewhere, which may be a few times larger. method selects the solver (see
+    #unitSolver.solveCruiseThrust).
+    def __init__(self, params, v_max, errMax=1e-3, numPoints=9, maxPoints=129, method="secant"):
+        if not (np.isfinite(v_max) and v_max >= 0):
+            raise ValueError("The speed range of an operating map must be finite and non-negative.")
+        self.params = params
+        self.v_max = float(v_max)
+        self.errMax = errMax
+        self.method = method
+
+        while True:
+            self._build(numPoints)
+            self.cellError = self._estimateError()
+            if np.all(self.cellError <= errMax) or 2*numPoints-1 > maxPoints:
+                break
+            numPoints = 2*numPoints-1
+
+    #Solves the grid of operating points
+    def _build(self, numPoints):
+        self.v = np.linspace(0, self.v_max, numPoints if self.v_max > 0 else 1)
+        self.throttle = np.linspace(0, 1, numPoints)
+        solution = us.solveCruiseThrust(self.params, self.v[:,np.newaxis], self.throttle[np.newaxis,:], method=self.method)
+        self.grids = dict(zip(FIELDS, solution))
+        self._padded = [_pad(grid) for grid in solution]
+        self.cellError = None
+
+    #Returns the interpolation error at the centre of each grid cell, as the largest error over the fields
+    #relative to the magnitude of each field. Cells where only one of the solver and the interpolation
+    #finds an operating point get an infinite error. A map of a single speed has one row of cells, between
+    #its throttle settings.
+    def _estimateError(self):
+        v = (self.v[1:]+self.v[:-1])/2 if len(self.v) > 1 else self.v
+        throttle = (self.throttle[1:]+self.throttle[:-1])/2
+        exact = us.solveCruiseThrust(self.params, v[:,np.newaxis], throttle[np.newaxis,:], method=self.method)
+        approx = self.query(v[:,np.newaxis], throttle[np.newaxis,:])
+
+        error = np.zeros((len(v), len(throttle)))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for name,a,b in zip(FIELDS, exact, approx):
+                scale = np.nanmax(np.abs(self.grids[name]), initial=0)
+                diff = np.where(np.isnan(a) & np.isnan(b), 0, np.abs(a-b)/scale)
+                error = np.fmax(error, np.where(np.isnan(diff), np.inf, diff))
+        return error
+
+    #Returns the largest estimated interpolation error over the cells which are interpolated
+    @property
+    def error(self):
+        return np.max(self.cellError, where=self.cellError <= self.errMax, initial=0)
+
+    #Returns True if the map covers the given cruise speeds
+    def covers(self, v_cruise):
+        return np.all((np.asarray(v_cruise) >= 0) & (np.asarray(v_cruise) <= self.v_max))
+
+    #Returns the thrust (lbf), prop speed (rpm) and motor current (A) at arrays of cruise speeds and throttle
+    #settings within the map, as unitSolver.solveCruiseThrust, by interpolating between the grid points
+    def query(self, v_cruise, throttle):
+        v,t = np.broadcast_arrays(np.asarray(v_cruise, dtype=np.float64), np.asarray(throttle, dtype=np.float64))
+        if not self.covers(v) or np.any((t < 0) | (t > 1)):
+            raise ValueError("Operating point outside of the map.")
+
+        #Grid cell of each point and its position within the cell
+        y = t/(self.throttle[1]-self.throttle[0])
+        j = np.clip(np.floor(y).astype(np.intp), 0, len(self.throttle)-2)
+        w_t = _cubicWeights(y-j)
+        cols = j[...,np.newaxis]+np.arange(4)
+        if len(self.v) == 1:
+            #A single speed is interpolated between the four throttle settings around each point
+            i = np.zeros_like(j)
+            result = [np.asarray(np.einsum("...b,...b->...", grid[1][cols], w_t)) for grid in self._padded]
+        else:
+            x = v/(self.v[1]-self.v[0])
+            i = np.clip(np.floor(x).astype(np.intp), 0, len(self.v)-2)
+            w_v = _cubicWeights(x-i)
+
+            #Indices of the 4x4 points around each point in the padded grids
+            rows = (i[...,np.newaxis]+np.arange(4))[...,:,np.newaxis]
+            result = [np.asarray(np.einsum("...a,...ab,...b->...", w_v, grid[rows,cols[...,np.newaxis,:]], w_t)) for grid in self._padded]
+
+        #Solve the points in cells where the interpolation is not accurate enough
+        if self.cellError is not None:
+            solve = self.cellError[i,j] > self.errMax
+            if np.any(solve):
+                for field,values in zip(result, us.solveCruiseThrust(self.params, v[solve], t[solve], method=self.method)):
+                    field[solve] = values
+        return tuple(field[()] for field in result) # Scalars for a single point
@@ -0,0 +1,263 @@
+import numpy as np
+import csv
+import sys
+import time
+from collections import namedtuple
+import batchEvaluator as be
+import designRecords as dr
+import exhaustiveSearch as es
+import geneticSearch as gs
+import unitSolver as us
+
+#Multi-objective search of the design space. Random designs are evaluated in batches and only the designs
+#which no other design found beats in every objective (the Pareto front) are kept, so memory is bounded by the
+#size of the front rather than by the number of designs evaluated. The objectives are the flight time, the
+#total weight of the aircraft, the static thrust at full throttle and the margin of the cruise current to
+#the current limits of the ESC and battery. After every round the changes to the front are appended to a file,
+#so that the front found so far is kept if the search is stopped and the file is never rewritten.
+
+#Records of designs on the front: design records (see designRecords.designDtype) with the total weight (lbf),
+#the static thrust at full throttle (lbf) and the unused share of the lower of the ESC and battery current
+#limits at cruise
+frontDtype = np.dtype(dr.designDtype.descr+[("totalWeight", np.float32),
+                                            ("staticThrust", np.float32),
+                                            ("currentMargin", np.float32)])
+
+#Objectives of the search, given as the record field of each and whether it is maximized
+OBJECTIVES = [("flightTime", True), ("totalWeight", False), ("staticThrust", True), ("currentMargin", True)]
+
+#Summary of one round: the numbers of designs solved and found feasible so far and the size of the front
+Round = namedtuple("Round", ["round", "solverCalls", "feasible", "frontSize"])
+
+#Summary of a search: the number of rounds, of designs solved and of feasible designs found, and the size of
+#the front
+SearchReport = namedtuple("SearchReport", ["rounds", "solverCalls", "feasible", "frontSize"])
+
+#Returns the objectives of front records as an array with a column per objective, signed so that every
+#objective is maximized. Objectives which could not be solved are taken as the worst possible.
+def objectivesOf(records):
+    objectives = np.column_stack([records[name].astype(np.float64)*(1 if maximize else -1) for name,maximize in OBJECTIVES])
+    return np.where(np.isnan(objectives), -np.inf, objectives)
+
+#Returns a mask of the rows of an array of objectives (all maximized) which no other row dominates, i.e. is at
+#least as good in every objective and better in one. Follows Kung's algorithm: the rows are sorted in
+#decreasing lexicographic order, so that no row is dominated by a row after it, and repeated rows are set
+#aside, so that a row is dominated by an earlier one exactly if that row is at least as good in the other
+#objectives. The front of the first half is then found recursively, and the front of the second half is found
+#and cut down to the rows not dominated by the front of the first half (see _covered). For N rows and M
+#objectives this takes O(N log N) time for two objectives and O(N log(N)^(M-1)) otherwise, however many rows are
+#on the front.
+def nonDominated(objectives):
+    objectives = np.asarray(objectives, dtype=np.float64)
+    order = np.lexsort(-objectives.T[::-1])
+    objectives = objectives[order]
+    first = np.ones(len(objectives), dtype=bool)
+    first[1:] = np.any(objectives[1:] != objectives[:-1], axis=-1)
+    onFront = np.zeros(np.count_nonzero(first), dtype=bool)
+    onFront[_front(objectives[first])] = True
+    mask = np.empty(len(order), dtype=bool)
+    mask[order] = onFront[np.cumsum(first)-1] # Repeated rows share the status of their first occurrence
+    return mask
+
+#Returns the positions of the non-dominated rows of an array of distinct objectives sorted as in nonDominated
+def _front(objectives, leafSize=64):
+    n = len(objectives)
+    if n <= leafSize:
+        rest = objectives[:,1:]
+        covered = np.all(rest[np.newaxis,:,:] >= rest[:,np.newaxis,:], axis=-1)
+        return np.flatnonzero(~np.any(np.tril(covered, -1), axis=-1)) # Only earlier rows can dominate a row
+    half = n//2
+    top = _front(objectives[:half], leafSize)
+    bottom = half+_front(objectives[half:], leafSize)
+    bottom = bottom[~_covered(objectives[bottom,1:], objectives[top,1:])]
+    return np.concatenate([top, bottom])
+
+#Returns a mask of the rows of a which are covered by a row of b, i.e. which some row of b is at least as good
+#as in every objective. With one objective this takes the best row of b, and with two a sweep over the rows of
+#b in decreasing order of the first objective, keeping the best of the second. With more, the rows are split
+#at a median value of the first objective: rows of a above it can only be covered by rows of b above it, and
+#rows of a below it either by rows of b below it or, ignoring the first objective, by any row of b above it.
+#Small problems are compared directly.
+def _covered(a, b, leafSize=4096):
+    m = a.shape[1]
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros(len(a), dtype=bool)
+    if m == 0:
+        return np.ones(len(a), dtype=bool)
+    if m == 1:
+        return a[:,0] <= np.max(b[:,0])
+    if m == 2:
+        order = np.argsort(-b[:,0], kind="stable")
+        best = np.maximum.accumulate(b[order,1])
+        count = np.searchsorted(-b[order,0], -a[:,0], side="right") # Rows of b at least as good in the first
+        return (count > 0) & (a[:,1] <= best[np.maximum(count-1, 0)])
+    if len(a)*len(b) <= leafSize:
+        return _dominatedBy(a, b, strict=False)
+    values = np.unique(np.concatenate([a[:,0], b[:,0]]))
+    if len(values) == 1:
+        return _covered(a[:,1:], b[:,1:])
+    median = values[len(values)//2]
+    aAbove = a[:,0] >= median
+    bAbove = b[:,0] >= median
+    covered = np.empty(len(a), dtype=bool)
+    covered[aAbove] = _covered(a[aAbove], b[bAbove])
+    covered[~aAbove] = _covered(a[~aAbove], b[~bAbove]) | _covered(a[~aAbove,1:], b[bAbove,1:])
+    return covered
+
+#Returns a mask of the rows of a which are dominated by any row of b, comparing blocks of rows of a and b of
+#about blockSize pairs at a time. If strict is False, rows of b which are only as good as a row of a also count.
+def _dominatedBy(a, b, strict=True, blockSize=2**20):
+    dominated = np.zeros(len(a), dtype=bool)
+    rows = max(blockSize//max(len(b), 1), 1)
+    cols = max(blockSize//rows, 1)
+    for i in range(0, len(a), rows):
+        block = a[i:i+rows,np.newaxis,:]
+        for j in range(0, len(b), cols):
+            other = b[np.newaxis,j:j+cols,:]
+            atLeast = np.all(other >= block, axis=-1)
+            dominated[i:i+rows] |= np.any(atLeast & np.any(other > block, axis=-1) if strict else atLeast, axis=-1)
+    return dominated
+
+#The non-dominated designs found so far. Designs added are merged with the front and only the designs left
+#non-dominated are kept. A design found again is only kept once.
+class ParetoArchive:
+
+    def __init__(self):
+        self.records = np.empty(0, dtype=frontDtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    #Merges front records into the archive
+    def add(self, records):
+        records = np.concatenate([self.records, records])
+        _,first = np.unique(np.column_stack([records[name] for name in ["prop", "motor", "esc", "battery", "numCells"]]), axis=0, return_index=True)
+        records = records[np.sort(first)]
+        self.records = records[nonDominated(objectivesOf(records))]
+
+#Returns the front records of evaluated designs, given by their catalog rows and the result of their
+#evaluation (see batchEvaluator.evaluate). The static thrust is solved by the given method (the secant solver
+#if it only finds throttle settings).
+def frontRecords(catalog, goal, propInd, motorInd, battInd, numCells, escInd, result, method="secant"):
+    params = be.gatherParams(catalog, propInd, motorInd, battInd, numCells, escInd, goal.altitude)
+    staticThrust,_,_ = us.solveCruiseThrust(params, 0.0, 1.0, method=method if method in ["roots", "bracket"] else "secant")
+    limit = np.minimum(catalog.escs["imax"][escInd], catalog.batteries["imax"][battInd])
+    records = np.empty(len(propInd), dtype=frontDtype)
+    for field,values in zip(dr.designDtype.names, [propInd, motorInd, escInd, battInd, numCells, result.flightTime, result.throttle,
+                                                   result.current, result.weight]):
+        records[field] = values
+    records["totalWeight"] = result.weight+goal.W_frame
+    records["staticThrust"] = staticThrust
+    records["currentMargin"] = 1-result.current/limit
+    return records
+
+#Evaluates size random designs passing the feasibility screen, drawn with the given seed. Returns the
+#non-dominated feasible designs and the numbers of designs solved and found feasible.
+def paretoBatch(catalog, space, goal, size, method, seed):
+    rng = np.random.default_rng(seed)
+    genomes = gs.randomPopulation(catalog, space, goal, rng, size)
+    result,solved = gs.evaluateGenomes(catalog, space, goal, genomes, method)
+    feasible = np.flatnonzero(~np.isnan(result.flightTime))
+    propInd,motorInd,battInd,numCells,escInd = [ind[feasible] for ind in gs.genomeRows(space, genomes)]
+    records = frontRecords(catalog, goal, propInd, motorInd, battInd, numCells, escInd,
+                           be.BatchResult(*[field[feasible] for field in result]), method)
+    return records[nonDominated(objectivesOf(records))], solved, len(feasible)
+
+#Columns of a front file (see appendFront): the round, whether the design was added to or removed from the
+#front, the database ids and names of its components and its front record fields
+def frontColumns():
+    components = ["prop", "motor", "esc", "battery"]
+    return ["round", "change"]+[component+"Id" for component in components]+[component+"Name" for component in components]+list(frontDtype.names[4:])
+
+#Starts a front file, writing its header
+def startFront(filename):
+    with open(filename, "w", newline="") as f:
+        csv.writer(f).writerow(frontColumns())
+
+#Appends front records to a CSV file started by startFront, one row each, as added to or removed from the
+#front (change is "added" or "removed") in round r. The front after any round is made of the designs added
+#up to that round and not removed since.
+def appendFront(catalog, records, filename, r, change):
+    tables = {"prop":catalog.props, "motor":catalog.motors, "esc":catalog.escs, "battery":catalog.batteries}
+    with open(filename, "a", newline="") as f:
+        writer = csv.writer(f)
+        for record in records:
+            ids = [int(table["id"][record[component]]) for component,table in tables.items()]
+            names = [table["name"][record[component]] for component,table in tables.items()]
+            writer.writerow([r, change]+ids+names+[record[name].item() for name in frontDtype.names[4:]])
+
+#Returns masks of the designs of front records a which are not in front records b, and of those of b which are
+#not in a
+def frontChanges(a, b):
+    keys = [[tuple(key) for key in np.column_stack([records[name] for name in ["prop", "motor", "esc", "battery", "numCells"]]).tolist()]
+            for records in (a, b)]
+    inA = set(keys[0])
+    inB = set(keys[1])
+    return np.array([key not in inB for key in keys[0]], dtype=bool), np.array([key not in inA for key in keys[1]], dtype=bool)
+
+#Runs a search step, given by the name of one of the functions above, on the given catalog for each set of
+#arguments. Replaced by a pool's map to run the steps in parallel (see searchWorker.paretoStep).
+def serialMap(catalog):
+    return lambda name, argsList: [globals()[name](catalog, *args) for args in argsList]
+
+#Prints the summary of a round
+def printRound(r):
+    print("Round {0}: {1} designs solved, {2} feasible, {3} on the front".format(r.round, r.solverCalls, r.feasible, r.frontSize))
+
+#Searches the space for the Pareto front of the objectives, evaluating random designs passing the screen in
+#rounds of tasks of batchSize designs each, run by mapStep (see serialMap), until count feasible designs have
+#been found. If frontFile is given, it is started and the changes to the front are appended to it after each
+#round (see appendFront). log is
+#called with the Round of each round. Returns the front records, longest flight time first, and a
+#SearchReport.
+def search(catalog, space, goal, method="secant", count=1000, mapStep=None, tasks=1, batchSize=1000, frontFile=None, rng=None,
+           log=printRound):
+    mapStep = serialMap(catalog) if mapStep is None else mapStep
+    rng = np.random.default_rng() if rng is None else rng
+    archive = ParetoArchive()
+    written = archive.records
+    if frontFile is not None:
+        startFront(frontFile)
+    solverCalls = 0
+    numFeasible = 0
+    r = 0
+    while numFeasible < count:
+        r += 1
+        for records,solved,feasible in mapStep("paretoBatch", [(space, goal, batchSize, method, seed) for seed in rng.integers(0, 2**63, tasks)]):
+            archive.add(records)
+            solverCalls += solved
+            numFeasible += feasible
+        if frontFile is not None:
+            removed,added = frontChanges(written, archive.records)
+            appendFront(catalog, written[removed], frontFile, r, "removed")
+            appendFront(catalog, archive.records[added], frontFile, r, "added")
+            written = archive.records
+        log(Round(r, solverCalls, numFeasible, len(archive)))
+
+    records = archive.records[np.argsort(-archive.records["flightTime"], kind="stable")]
+    return records, SearchReport(r, solverCalls, numFeasible, len(records))
+
+#Checks the non-dominated sort against a direct comparison of every pair of designs and times it, then runs
+#a Pareto search
+if __name__ == "__main__":
+    import componentCatalog as cc
+
+    dbFile = sys.argv[1] if len(sys.argv) > 1 else "Database/components.db"
+    numUnits = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    rng = np.random.default_rng(0)
+    for n,m in [(2000, 2), (2000, 4), (200000, 4)]:
+        objectives = np.round(rng.random((n, m)), 2) # Rounded, so that there are ties
+        start = time.time()
+        mask = nonDominated(objectives)
+        print(n, "points,", m, "objectives:", np.count_nonzero(mask), "on the front,", round(time.time()-start, 3), "s", end="")
+        if n <= 2000:
+            print(", matches direct comparison:", np.array_equal(mask, ~_dominatedBy(objectives, objectives)), end="")
+        print()
+
+    catalog = cc.loadCatalog(dbFile)
+    goal = es.Goal(10, 0, None, 0.3, 1)
+    start = time.time()
+    records,report = search(catalog, es.searchSpace(catalog, canonical=True), goal, count=numUnits, rng=rng)
+    print("Pareto search:", round(time.time()-start, 1), "s,", report)
+    print("Longest flight time on the front:", records[:1])
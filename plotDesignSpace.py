@@ -14,7 +14,21 @@
 #     "computation":{
 #         "units":1000, //Number of propulsion units to find in the design space.//
 #         "processes":8, //Maximum number of processes to be used in parallel computation.//
-#         "outlierStdDevs":5 //Number of standard deviations of the half-normal distribution within which designs are considered feasible.//
+#         "outlierStdDevs":5, //Number of standard deviations of the half-normal distribution within which designs are considered feasible.//
+#         "sharedMemory":false, //Optional. If true, the component catalog is loaded once into shared memory and attached to by all processes.//
+#         "startMethod":"spawn", //Optional. Multiprocessing start method ("fork", "spawn" or "forkserver"). Defaults to the platform default.//
+#         "batchSize":1000, //Optional. Number of random designs evaluated together by each process.//
+#         "cacheSize":10000, //Optional. Number of evaluated designs remembered by each process, so that designs drawn again are not solved again. Worthwhile when the components are constrained. Defaults to 0 (no cache).//
+#         "cacheFile":"", //Optional. SQLite file in which evaluated designs are stored, so that they are not solved again in later runs.//
+#         "groupTolerance":0.01, //Optional. Units sharing a prop and motor whose battery voltage, battery and ESC resistance and required thrust agree to within this relative tolerance are solved once (0 for exact agreement). Worthwhile when the prop and motor are constrained. Defaults to no grouping.//
+#         "search":"random", //Optional. "random" draws random designs until the given number of units is found. "exhaustive" searches every design by branch and bound for the one with the longest flight time, and keeps the given number of units with the longest flight times found on the way. "genetic" evolves a population of designs and "surrogate" solves the designs ranked best by a model fitted to the designs solved so far; both keep the given number of units with the longest flight times found. "pareto" evaluates random designs until the given number of units is found and keeps only those on the Pareto front of flight time, total weight, static thrust and margin to the current limits. Defaults to "random".//
+#         "populationSize":1000, //Optional. Number of designs in each generation of the "genetic" search.//
+#         "generations":50, //Optional. Number of generations of the "genetic" search.//
+#         "rounds":20, //Optional. Number of rounds of the "surrogate" search.//
+#         "designsPerRound":500, //Optional. Number of designs solved in each round of the "surrogate" search.//
+#         "frontFile":"front.csv", //Optional. CSV file to which the "pareto" search appends the changes to the front after each round.//
+#         "surrogateModel":"auto", //Optional. Model used by the "surrogate" search, "boosting" (gradient boosted trees, requires scikit-learn), "ridge" (quadratic ridge regression) or "auto" (boosting if scikit-learn is installed).//
+#         "solver":"secant" //Optional. Operating point solver, "secant" (iterative), "roots" (torque balance from polynomial roots), "bracket" (bracketed, always converging) or "direct" (throttle inverted directly from the required thrust). Defaults to "secant".//
 #     },
 #     "condition":{
 #         "altitude":0, //Flight altitude.//
@@ -70,216 +84,281 @@
 #
 ####################################################################
 
-import matplotlib.pyplot as plt
-import sqlite3 as sql
-import supportClasses as s
+import componentCatalog as cc
+import designRecords as dr
+import searchWorker as sw
 import numpy as np
-from random import randint,seed
 import multiprocessing as mp
-import math
 import sys
-import warnings
-import datetime
 import json
-import os
 
 dbFile = "Database/components.db"
 
-#Defines what happens when the user picks a plotted point in the design space. Highlights that point and 
-#plots that unit's thrust curves.
-def on_pick(event):
-    artist = event.artist
-    fig = plt.figure(plt.get_fignums()[0])
-    ax = fig.axes
-    ind = int(event.ind[0])
-    selUnit = units[ind]
-    fig.suptitle("SELECTED Prop: "+str(selUnit.prop.name)+"  Motor: "+str(selUnit.motor.name)+"  Battery: "+str(selUnit.batt.name)+"  ESC: "+str(selUnit.esc.name))
-    ax[0].plot(selUnit.prop.diameter,t_flight[ind],'o')
-    ax[1].plot(selUnit.prop.pitch,t_flight[ind],'o')
-    ax[2].plot(selUnit.motor.Kv,t_flight[ind],'o')
-    ax[3].plot(selUnit.batt.V0,t_flight[ind],'o')
-    ax[4].plot(selUnit.batt.cellCap,t_flight[ind],'o')
-    ax[5].plot(selUnit.GetWeight()+W_frame,t_flight[ind],'o')
-    ax[6].plot(throttles[ind],t_flight[ind],'o')
-    selUnit.printInfo()
-    print("Flight Time:",t_flight[ind],"min")
+#The search modules and the database and cache modules are imported where they are used, so that processes
+#started by spawn, which import this script again, only import what the random search needs.
+
+#Reads the goal from the settings. Returns whether a thrust to weight ratio is required (rather than a
+#thrust) and the value of the required ratio or thrust.
+def getGoal(settings):
+    if settings["goal"]["thrust"] == 0:
+        if settings["goal"]["thrustToWeightRatio"] == 0:
+            raise RuntimeError("No goal specified!")
+        return True, settings["goal"]["thrustToWeightRatio"]
+    return False, settings["goal"]["thrust"]
+
+#Searches the design space as defined by the settings. Returns the catalog and the records of the designs found.
+def runSearch(settings):
+
+    N_proc_max = settings["computation"]["processes"]
+    useSharedMemory = settings["computation"].get("sharedMemory", False)
+    context = mp.get_context(settings["computation"].get("startMethod", None))
+    batchSize = settings["computation"].get("batchSize", 1000)
+    method = settings["computation"].get("solver", "secant")
+    cacheSize = settings["computation"].get("cacheSize", 0)
+    cacheFile = settings["computation"].get("cacheFile", "") or None
+    groupTol = settings["computation"].get("groupTolerance", None)
+    searchMode = settings["computation"].get("search", "random")
+    populationSize = settings["computation"].get("populationSize", 1000)
+    generations = settings["computation"].get("generations", 50)
+    rounds = settings["computation"].get("rounds", 20)
+    designsPerRound = settings["computation"].get("designsPerRound", 500)
+    surrogateModel = settings["computation"].get("surrogateModel", "auto")
+    frontFile = settings["computation"].get("frontFile", "") or None
+    N_units = settings["computation"]["units"]
+    v_req = settings["condition"]["airspeed"]
+    h = settings["condition"]["altitude"]
+    W_frame = settings["aircraft"]["emptyWeight"]
+    optimizeForRatio,thrustParam = getGoal(settings)
+
+    print("Flight conditions: airspeed",v_req,"ft/s, altitude",h,"ft, airframe weight",W_frame,"lbs")
     if optimizeForRatio:
-        print("    at {:4.2f}% throttle".format(selUnit.CalcCruiseThrottle(v_req,(selUnit.GetWeight()+W_frame)*R_tw_req)*100))
+        print("Optimizing for a thrust to weight ratio of",thrustParam)
     else:
-        print("    at {:4.2f}% throttle".format(selUnit.CalcCruiseThrottle(v_req,T_req)*100))
-    selUnit.PlotThrustCurves(0,v_req*2+10,11,51)
-    selUnit.prop.PlotCoefs()
-
-#Defines a global database cursor giving all processes a connection to the database.
-def setGlobalCursor():
-    global dbcur
-    dbcur = sql.connect(dbFile).cursor()
-    seed(datetime.time.microsecond)
-
-#Selects a propultion unit and calculates its flight time.
-def getCombination(args):
-
-    v_req = args[0]
-    T = args[1]
-    h = args[2]
-    optimizeForRatio = args[3]
-    W_frame = args[4]
-    names = args[5]
-    manufacturers = args[6]
-
-    if optimizeForRatio:
-        R_tw_req = T
-    else:
-        T_req = T
-
-    t_flight_curr = None
-    while t_flight_curr is None or math.isnan(t_flight_curr):
-
-        #Fetch prop data
-        prop = s.Propeller(dbcur,name=names[0],manufacturer=manufacturers[0])
-
-        #Fetch motor data
-        motor = s.Motor(dbcur,name=names[1],manufacturer=manufacturers[1])
-
-        #Fetch ESC data
-        esc = s.ESC(dbcur,name=names[2],manufacturer=manufacturers[2])
-
-        #Fetch battery data
-        batt = s.Battery(dbcur,name=names[3],manufacturer=manufacturers[3])
-
-        if batt.R == 0 and esc.R == 0 and motor.R == 0:
-            continue
-
-        currUnit = s.PropulsionUnit(prop,motor,batt,esc,h)
-        if optimizeForRatio:
-            T_req = (currUnit.GetWeight()+W_frame)*R_tw_req
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            t_flight_curr = currUnit.CalcBattLife(v_req,T_req)
-            thr_curr = currUnit.CalcCruiseThrottle(v_req,T_req)
-    return t_flight_curr, thr_curr, currUnit
-
-#----------------------BEGINNING OF COMPUTATION------------------------------------
-
-if len(sys.argv) is not 2:
-    raise RuntimeError("plotDesignSpace takes only one argument (the .json configuration filename)!")
-configFile = sys.argv[1]
-with open(configFile) as filename:
-    settings = json.load(filename)
-
-N_proc_max = settings["computation"]["processes"]
-N_units = settings["computation"]["units"]
-v_req = settings["condition"]["airspeed"]
-h = settings["condition"]["airspeed"]
-W_frame = settings["aircraft"]["emptyWeight"]
-
-if settings["goal"]["thrust"] is 0:
-    if settings["goal"]["thrustToWeightRatio"] is 0:
-        raise RuntimeError("No goal specified!")
-    optimizeForRatio = True
-    thrustParam = settings["goal"]["thrustToWeightRatio"]
-    R_tw_req = thrustParam
-else:
-    optimizeForRatio = False
-    thrustParam = settings["goal"]["thrust"]
-    T_req = thrustParam
-
-print("Flight conditions: airspeed",v_req,"ft/s, altitude",h,"ft, airframe weight",W_frame,"lbs")
-if optimizeForRatio:
-    print("Optimizing for a thrust to weight ratio of",thrustParam)
-else:
-    print("Optimizing for a required thrust of",thrustParam)
-
-names = []
-manufacturers = []
-print("Optimization constrained as follows:")
-for component in settings["aircraft"]["components"]:
-    name = settings["aircraft"]["components"][component]["name"]
-    if len(name) is 0:
-        name = None
-    names.append(name)
-
-    manufacturer = settings["aircraft"]["components"][component]["manufacturer"]
-    if len(manufacturer) is 0:
-        manufacturer = None
-    manufacturers.append(manufacturer)
-
-    if name is not None and manufacturer is not None:
-        raise RuntimeError("Component: "+component+" is overconstrained!")
-
-    print(component.title())
-    if name is not None:
-        print("Name:",name)
-    elif manufacturer is not None:
-        print("Manufacturer:",manufacturer)
-    else:
-        print("Not constrained.")
-
-# Distribute work
-with mp.Pool(processes=N_proc_max,initializer=setGlobalCursor,initargs=()) as pool:
-    args = [(v_req,thrustParam,h,optimizeForRatio,W_frame,names,manufacturers) for i in range(N_units)]
-    data = pool.map(getCombination,args)
-sql.connect(dbFile).close()
-
-t_flight,throttles,units = map(list,zip(*data))
-t_flight = np.asarray(t_flight)
-throttles = np.asarray(throttles)
-units = np.asarray(units)
-
-# Determine optimum
-t_max = max(t_flight)
-bestUnit = np.asscalar(units[np.where(t_flight==t_max)])
-throttle_at_max = np.asscalar(throttles[np.where(t_flight==t_max)])
-if optimizeForRatio:
-    T_req = thrustParam*(bestUnit.GetWeight()+W_frame)
-else:
-    T_req = thrustParam
-
-print("Maximum flight time found:",t_max,"min")
-bestUnit.printInfo()
-print("Throttle setting for max flight:",bestUnit.CalcCruiseThrottle(v_req,T_req))
-print("Current draw:",bestUnit.I_motor,"A")
-
-# Plot design space
-plt.ion()
-fig,((ax1,ax2,ax3,ax4),(ax5,ax6,ax7,ax8)) = plt.subplots(nrows=2,ncols=4)
-fig.suptitle("OPTIMUM Prop: "+str(bestUnit.prop.name)+"  Motor: "+str(bestUnit.motor.name)+"  Battery: "+str(bestUnit.batt.name)+"  ESC: "+str(bestUnit.esc.name))
-
-ax1.plot([units[i].prop.diameter for i in range(N_units)],t_flight,'b*',picker=3)
-ax1.plot(bestUnit.prop.diameter,t_max,'r*')
-ax1.set_xlabel("Prop Diameter [in]")
-ax1.set_ylabel("Flight Time [min]")
-
-ax2.plot([units[i].prop.pitch for i in range(N_units)],t_flight,'b*',picker=3)
-ax2.plot(bestUnit.prop.pitch,t_max,'r*')
-ax2.set_xlabel("Prop Pitch [in]")
-ax2.set_ylabel("Flight Time [min]")
-
-ax3.plot([units[i].motor.Kv for i in range(N_units)],t_flight,'b*',picker=3)
-ax3.plot(bestUnit.motor.Kv,t_max,'r*')
-ax3.set_xlabel("Motor Kv [rpm/V]")
-ax3.set_ylabel("Flight Time [min]")
-
-ax4.plot([units[i].batt.V0 for i in range(N_units)],t_flight,'b*',picker=3)
-ax4.plot(bestUnit.batt.V0,t_max,'r*')
-ax4.set_xlabel("Battery Voltage [V]")
-ax4.set_ylabel("Flight Time [min]")
-
-ax5.plot([units[i].batt.cellCap for i in range(N_units)],t_flight,'b*',picker=3)
-ax5.plot(bestUnit.batt.cellCap,t_max,'r*')
-ax5.set_xlabel("Cell Capacity [mAh]")
-ax5.set_ylabel("Flight Time [min]")
-
-ax6.plot([units[i].GetWeight()+W_frame for i in range(N_units)],t_flight,'b*',picker=3)
-ax6.plot(bestUnit.GetWeight()+W_frame,t_max,'r*')
-ax6.set_xlabel("Total Unit Weight [lb]")
-ax6.set_ylabel("Flight Time [min]")
-
-ax7.plot(throttles,t_flight,'b*',picker=3)
-ax7.plot(throttle_at_max,t_max,'r*')
-ax7.set_xlabel("Throttle Setting at Max Flight Time")
-ax7.set_ylabel("Flight Time [min]")
-
-fig.canvas.mpl_connect('pick_event',on_pick)
-plt.show(block=True)
-plt.ioff()
+        print("Optimizing for a required thrust of",thrustParam)
+
+    names = []
+    manufacturers = []
+    print("Optimization constrained as follows:")
+    for component in settings["aircraft"]["components"]:
+        name = settings["aircraft"]["components"][component]["name"]
+        if len(name) == 0:
+            name = None
+        names.append(name)
+
+        manufacturer = settings["aircraft"]["components"][component]["manufacturer"]
+        if len(manufacturer) == 0:
+            manufacturer = None
+        manufacturers.append(manufacturer)
+
+        if name is not None and manufacturer is not None:
+            raise RuntimeError("Component: "+component+" is overconstrained!")
+
+        print(component.title())
+        if name is not None:
+            print("Name:",name)
+        elif manufacturer is not None:
+            print("Manufacturer:",manufacturer)
+        else:
+            print("Not constrained.")
+
+    # Resolve the component constraints to database ids using the database indexes
+    tableNames = {"propeller":"Props", "motor":"Motors", "esc":"ESCs", "battery":"Batteries"}
+    import componentDatabase as cdb
+    candidateIds = []
+    with cdb.ComponentDatabase(dbFile) as db:
+        for component,name,manufacturer in zip(settings["aircraft"]["components"],names,manufacturers):
+            if name is None and manufacturer is None:
+                candidateIds.append(None)
+                continue
+            ids = db.idsWhere(tableNames[component],name=name,manufacturer=manufacturer)
+            if len(ids) == 0:
+                raise RuntimeError("No "+component+" in the database matches the given constraint!")
+            candidateIds.append(ids)
+
+    # Make sure the database snapshot is current and distribute work
+    catalog = cc.loadCatalog(dbFile)
+    candidates = []
+    for component,ids in zip(settings["aircraft"]["components"],candidateIds):
+        candidates.append(None if ids is None else catalog.tables[tableNames[component]].rowsForIds(ids))
+
+    # Results cached in a file are only valid for the database they were computed from. The file is prepared
+    # here, before the processes open it.
+    cacheTag = ""
+    if cacheFile is not None:
+        import evaluationCache as ec
+        cacheTag = cc.fileHash(dbFile)
+        ec.EvaluationCache(0, cacheFile, cacheTag).close()
+
+    sharedCatalog = cc.SharedCatalog(catalog) if useSharedMemory else None
+    try:
+        sharedDescriptor = sharedCatalog.descriptor if useSharedMemory else None
+        initargs = (cc.snapshotDirFor(dbFile),sharedDescriptor,cacheSize,cacheFile,cacheTag)
+        with context.Pool(processes=N_proc_max,initializer=sw.setGlobalCatalog,initargs=initargs) as pool:
+            if searchMode in ["exhaustive","genetic","surrogate","pareto"]:
+                import exhaustiveSearch as es
+                goal = es.Goal(v_req,h,None if optimizeForRatio else thrustParam,thrustParam if optimizeForRatio else None,W_frame)
+            if searchMode == "exhaustive":
+                mapStep = lambda name,argsList: pool.map(sw.exhaustiveStep,[(name,args) for args in argsList])
+                records,report = es.search(catalog,es.searchSpace(catalog,candidates),goal,method,N_units,mapStep,tasks=4*N_proc_max)
+            elif searchMode == "genetic":
+                import geneticSearch as gs
+                mapStep = lambda name,argsList: pool.map(sw.geneticStep,[(name,args) for args in argsList])
+                records,report = gs.search(catalog,es.searchSpace(catalog,candidates,canonical=True),goal,method,N_units,mapStep,tasks=4*N_proc_max,
+                                           populationSize=populationSize,generations=generations)
+            elif searchMode == "surrogate":
+                import surrogateSearch as ss
+                mapStep = lambda name,argsList: pool.map(sw.surrogateStep,[(name,args) for args in argsList])
+                records,report = ss.search(catalog,es.searchSpace(catalog,candidates,canonical=True),goal,method,N_units,mapStep,tasks=4*N_proc_max,
+                                           rounds=rounds,designsPerRound=designsPerRound,model=surrogateModel)
+            elif searchMode == "pareto":
+                import paretoSearch as ps
+                mapStep = lambda name,argsList: pool.map(sw.paretoStep,[(name,args) for args in argsList])
+                records,report = ps.search(catalog,es.searchSpace(catalog,candidates,canonical=True),goal,method,N_units,mapStep,tasks=4*N_proc_max,
+                                           batchSize=batchSize,frontFile=frontFile)
+            else:
+                chunk = -(-N_units//(4*N_proc_max)) # Several tasks per process to balance the load
+                counts = [min(chunk,N_units-i) for i in range(0,N_units,chunk)]
+                args = [(v_req,thrustParam,h,optimizeForRatio,W_frame,candidates,count,batchSize,method,groupTol) for count in counts]
+                data = pool.map(sw.getCombinations,args)
+    finally:
+        if sharedCatalog is not None:
+            sharedCatalog.close()
+
+    if searchMode == "genetic":
+        print("Generations:",report.generations)
+        print("Designs bred:",report.evaluatedDesigns,"solved:",report.solverCalls)
+        print("Longest flight time: {0:.4f} min".format(report.best))
+        return catalog, records
+    if searchMode == "pareto":
+        print("Designs solved:",report.solverCalls,"feasible:",report.feasible)
+        print("Designs on the Pareto front:",report.frontSize)
+        return catalog, records
+    if searchMode == "surrogate":
+        print("Rounds:",report.rounds,"("+report.model+" model)")
+        print("Designs solved:",report.solverCalls)
+        print("Longest flight time: {0:.4f} min".format(report.best))
+        return catalog, records
+    if searchMode == "exhaustive":
+        print("Prop and motor pairs:",report.pairs,"({0} may be feasible, {1} expanded)".format(report.feasiblePairs,report.expandedPairs))
+        print("Battery branches bounded:",report.batteryBranches)
+        print("Designs bounded:",report.boundedDesigns,"solved:",report.solvedDesigns)
+        print("Longest flight time: {0:.4f} min; no unexplored branch can exceed {1:.4f} min".format(report.best,report.remainingBound))
+        return catalog, records
+
+    drawn,passed,feasible = np.sum([counts for _,counts in data], axis=0)
+    print("Designs drawn:",drawn)
+    print("Passed the feasibility screen: {0} ({1:.2f}%)".format(passed, 100*passed/drawn))
+    print("Feasible: {0} ({1:.2f}% of drawn, {2:.2f}% of screened)".format(feasible, 100*feasible/drawn, 100*feasible/max(passed,1)))
+
+    return catalog, np.concatenate([records for records,_ in data])
+
+#Prints the optimum design and plots the design space. The user can pick plotted points to see the details
+#of that design. Nothing is plotted if no feasible design was found.
+def plotResults(catalog, records, settings):
+    if len(records) == 0:
+        print("No feasible design found")
+        return
+    import matplotlib.pyplot as plt
+
+    v_req = settings["condition"]["airspeed"]
+    h = settings["condition"]["altitude"]
+    W_frame = settings["aircraft"]["emptyWeight"]
+    optimizeForRatio,thrustParam = getGoal(settings)
+
+    t_flight = records["flightTime"]
+    throttles = records["throttle"]
+
+    # Determine optimum
+    i_max = np.argmax(t_flight)
+    t_max = t_flight[i_max]
+    bestUnit = dr.buildUnit(catalog,records[i_max],h)
+    throttle_at_max = throttles[i_max]
+
+    print("Maximum flight time found:",t_max,"min")
+    bestUnit.printInfo()
+    print("Throttle setting for max flight:",throttle_at_max)
+    print("Current draw:",records["current"][i_max],"A")
+
+    #Defines what happens when the user picks a plotted point in the design space. Highlights that point and 
+    #plots that unit's thrust curves.
+    #Picked units are kept, so that picking a unit again reuses its operating map
+    pickedUnits = {}
+    def on_pick(event):
+        artist = event.artist
+        fig = plt.figure(plt.get_fignums()[0])
+        ax = fig.axes
+        ind = int(event.ind[0])
+        if ind not in pickedUnits:
+            pickedUnits[ind] = dr.buildUnit(catalog,records[ind],h)
+        selUnit = pickedUnits[ind]
+        fig.suptitle("SELECTED Prop: "+str(selUnit.prop.name)+"  Motor: "+str(selUnit.motor.name)+"  Battery: "+str(selUnit.batt.name)+"  ESC: "+str(selUnit.esc.name))
+        ax[0].plot(selUnit.prop.diameter,t_flight[ind],'o')
+        ax[1].plot(selUnit.prop.pitch,t_flight[ind],'o')
+        ax[2].plot(selUnit.motor.Kv,t_flight[ind],'o')
+        ax[3].plot(selUnit.batt.V0,t_flight[ind],'o')
+        ax[4].plot(selUnit.batt.cellCap,t_flight[ind],'o')
+        ax[5].plot(selUnit.GetWeight()+W_frame,t_flight[ind],'o')
+        ax[6].plot(throttles[ind],t_flight[ind],'o')
+        selUnit.printInfo()
+        print("Flight Time:",t_flight[ind],"min")
+        print("    at {:4.2f}% throttle".format(throttles[ind]*100))
+        selUnit.PlotThrustCurves(0,v_req*2+10,11,51)
+        selUnit.prop.PlotCoefs()
+
+    # Plot design space
+    plt.ion()
+    fig,((ax1,ax2,ax3,ax4),(ax5,ax6,ax7,ax8)) = plt.subplots(nrows=2,ncols=4)
+    fig.suptitle("OPTIMUM Prop: "+str(bestUnit.prop.name)+"  Motor: "+str(bestUnit.motor.name)+"  Battery: "+str(bestUnit.batt.name)+"  ESC: "+str(bestUnit.esc.name))
+
+    ax1.plot(dr.column(catalog,records,"prop","diameter"),t_flight,'b*',picker=3)
+    ax1.plot(bestUnit.prop.diameter,t_max,'r*')
+    ax1.set_xlabel("Prop Diameter [in]")
+    ax1.set_ylabel("Flight Time [min]")
+
+    ax2.plot(dr.column(catalog,records,"prop","pitch"),t_flight,'b*',picker=3)
+    ax2.plot(bestUnit.prop.pitch,t_max,'r*')
+    ax2.set_xlabel("Prop Pitch [in]")
+    ax2.set_ylabel("Flight Time [min]")
+
+    ax3.plot(dr.column(catalog,records,"motor","kv"),t_flight,'b*',picker=3)
+    ax3.plot(bestUnit.motor.Kv,t_max,'r*')
+    ax3.set_xlabel("Motor Kv [rpm/V]")
+    ax3.set_ylabel("Flight Time [min]")
+
+    ax4.plot(dr.batteryVoltage(catalog,records),t_flight,'b*',picker=3)
+    ax4.plot(bestUnit.batt.V0,t_max,'r*')
+    ax4.set_xlabel("Battery Voltage [V]")
+    ax4.set_ylabel("Flight Time [min]")
+
+    ax5.plot(dr.column(catalog,records,"battery","capacity"),t_flight,'b*',picker=3)
+    ax5.plot(bestUnit.batt.cellCap,t_max,'r*')
+    ax5.set_xlabel("Cell Capacity [mAh]")
+    ax5.set_ylabel("Flight Time [min]")
+
+    ax6.plot(records["weight"]+W_frame,t_flight,'b*',picker=3)
+    ax6.plot(bestUnit.GetWeight()+W_frame,t_max,'r*')
+    ax6.set_xlabel("Total Unit Weight [lb]")
+    ax6.set_ylabel("Flight Time [min]")
+
+    ax7.plot(throttles,t_flight,'b*',picker=3)
+    ax7.plot(throttle_at_max,t_max,'r*')
+    ax7.set_xlabel("Throttle Setting at Max Flight Time")
+    ax7.set_ylabel("Flight Time [min]")
+
+    fig.canvas.mpl_connect('pick_event',on_pick)
+    plt.show(block=True)
+    plt.ioff()
+
+#Runs the search defined by the .json configuration file given as the only argument and plots the results.
+def main(argv):
+    if len(argv) != 2:
+        raise RuntimeError("plotDesignSpace takes only one argument (the .json configuration filename)!")
+    configFile = argv[1]
+    with open(configFile) as filename:
+        settings = json.load(filename)
+
+    catalog,records = runSearch(settings)
+    plotResults(catalog, records, settings)
+
+if __name__ == "__main__":
+    main(sys.argv)
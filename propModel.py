@@ -0,0 +1,52 @@
+import numpy as np
+
+#Vectorized evaluation of the prop thrust and torque coefficient fits held in the catalog. Each coefficient
+#is a polynomial in the advance ratio J whose coefficients are polynomials in rpm. The functions in this
+#file evaluate both polynomials by Horner's rule for whole arrays of (prop index, rpm, J) at once, matching
+#Propeller.CalcThrustCoef and Propeller.CalcTorqueCoef.
+
+#Computes the advance ratio from the freestream velocity (ft/s), prop speed (rpm) and diameter (in)
+def advanceRatio(v_inf, rpm, diameter):
+    rps = np.asarray(rpm)/60
+    with np.errstate(divide="ignore", invalid="ignore"):
+        J = v_inf/(rps*diameter/12)
+    return np.where(np.abs(rps) < 1e-10, 10000, J) # Since angular velocity is 0, actual value w_ill also be 0.
+
+#Evaluates coefficient fits for arrays of rpm and J. coefs has shape (..., nJ, nRpm), holding the gathered
+#coefficients of each prop, and jOrder is the order of each prop's polynomial in J.
+def evalFit(coefs, jOrder, rpm, J):
+    rpm = np.asarray(rpm, dtype=np.float64)
+    J = np.asarray(J, dtype=np.float64)
+    shape = np.broadcast_shapes(coefs.shape[:-2], np.shape(jOrder), rpm.shape, J.shape)
+
+    #Coefficients of the polynomial in J
+    a = coefs[...,-1]
+    for k in range(coefs.shape[-1]-2, -1, -1):
+        a = a*rpm[...,np.newaxis] + coefs[...,k]
+    if coefs.shape[-1] == 1 or a.shape[:-1] != shape: # a must be a new array of the full shape
+        a = np.array(np.broadcast_to(a, shape+a.shape[-1:]))
+
+    #Quadratic coefficient should always be non-positive
+    jOrder = np.asarray(jOrder)
+    if np.all(jOrder == a.shape[-1]-1):
+        np.minimum(a[...,-1], 0, out=a[...,-1])
+    else:
+        last = np.broadcast_to(jOrder, shape)[...,np.newaxis]
+        np.put_along_axis(a, last, np.minimum(np.take_along_axis(a, last, axis=-1), 0), axis=-1)
+
+    f = a[...,-1]
+    for k in range(a.shape[-1]-2, -1, -1):
+        f = f*J + a[...,k]
+    return f
+
+#Returns the thrust coefficient of each prop at the given rpm and advance ratio
+def thrustCoef(props, propInd, rpm, J):
+    return evalFit(props.thrustCoefs[propInd], props["thrustfitorder"][propInd], rpm, J)
+
+#Returns the torque coefficient of each prop at the given rpm and advance ratio
+def torqueCoef(props, propInd, rpm, J):
+    return evalFit(props.powerCoefs[propInd], props["powerfitorder"][propInd], rpm, J)/2*np.pi
+
+#Returns the thrust and torque coefficients of each prop at the given rpm and advance ratio
+def coefs(props, propInd, rpm, J):
+    return thrustCoef(props, propInd, rpm, J), torqueCoef(props, propInd, rpm, J)
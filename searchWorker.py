@@ -0,0 +1,89 @@
+import componentCatalog as cc
+import designRecords as dr
+import batchEvaluator as be
+import evaluationCache as ec
+import numpy as np
+from random import seed
+
+#Functions run by the worker processes of a design space search. This module is kept free of plotting and
+#argument parsing so that it is cheap to import under every multiprocessing start method. The search modules
+#are only imported by the steps which run them.
+
+#Defines a global component catalog giving all processes access to the database contents.
+#Each process either memory maps the same snapshot or attaches to the same shared memory block, so the
+#catalog is never duplicated between processes. Each process also keeps a cache of the designs it has
+#evaluated (see evaluationCache.py), holding up to cacheSize designs and stored in cacheFile if given.
+def setGlobalCatalog(snapshotDir, sharedDescriptor=None, cacheSize=0, cacheFile=None, cacheTag=""):
+    global catalog
+    if sharedDescriptor is not None:
+        catalog = cc.ComponentCatalog.fromSharedMemory(sharedDescriptor)
+    else:
+        catalog = cc.ComponentCatalog.fromSnapshot(snapshotDir)
+    global cache
+    cache = None
+    if cacheSize > 0 or cacheFile is not None:
+        cache = ec.EvaluationCache(cacheSize, cacheFile, cacheTag)
+    global rng
+    seed() # Seeds each process from system randomness
+    rng = np.random.default_rng()
+
+#Finds a number of feasible propulsion units, evaluating random units in batches. Takes the cruise speed, the
+#required thrust (or thrust to weight ratio), the altitude, whether a ratio is required, the airframe weight,
+#the candidate rows of each component (see batchEvaluator.randomBatch), the number of units to find, the batch
+#size, the operating point solver method and the tolerance for grouping units (see batchEvaluator.evaluate).
+#Only the units of a batch which pass the feasibility screen (see batchEvaluator.screenUnits) are solved.
+#Returns a design array and the numbers of units drawn, passing the screen and found feasible.
+def getCombinations(args):
+
+    v_req,T,h,optimizeForRatio,W_frame,candidates,count,batchSize,method,groupTol = args
+    evaluate = be.evaluate if cache is None else cache.evaluate
+
+    found = []
+    numFound = 0
+    counts = np.zeros(3, dtype=np.int64)
+    while numFound < count:
+        propInd,motorInd,battInd,numCells,escInd = be.randomBatch(catalog, rng, batchSize, candidates)
+        if optimizeForRatio:
+            T_req = (be.unitWeight(catalog, motorInd, battInd, numCells, escInd)+W_frame)*T
+        else:
+            T_req = np.full(batchSize, float(T))
+
+        passed = np.flatnonzero(be.screenUnits(catalog, propInd, motorInd, battInd, numCells, escInd, v_req, h, T_req))
+        propInd,motorInd,battInd,numCells,escInd,T_req = [x[passed] for x in (propInd, motorInd, battInd, numCells, escInd, T_req)]
+        result = evaluate(catalog, propInd, motorInd, battInd, numCells, escInd, v_req, h, T_req=T_req, method=method, groupTol=groupTol, screen=False)
+
+        feasible = np.flatnonzero(~np.isnan(result.flightTime))
+        counts += [batchSize, len(passed), len(feasible)]
+        ok = feasible[:count-numFound]
+        found.append(dr.fromArrays(propInd[ok], motorInd[ok], escInd[ok], battInd[ok], numCells[ok],
+                                   result.flightTime[ok], result.throttle[ok], result.current[ok], result.weight[ok]))
+        numFound += len(ok)
+    return np.concatenate(found), counts
+
+#Runs a step of an exhaustive search (see exhaustiveSearch.search) on the global catalog. Takes the name of
+#the step and its arguments.
+def exhaustiveStep(args):
+    import exhaustiveSearch as es
+    name,stepArgs = args
+    return es.serialMap(catalog)(name, [stepArgs])[0]
+
+#Runs a step of an evolutionary search (see geneticSearch.search) on the global catalog. Takes the name of
+#the step and its arguments.
+def geneticStep(args):
+    import geneticSearch as gs
+    name,stepArgs = args
+    return gs.serialMap(catalog)(name, [stepArgs])[0]
+
+#Runs a step of a surrogate assisted search (see surrogateSearch.search) on the global catalog. Takes the name
+#of the step and its arguments.
+def surrogateStep(args):
+    import surrogateSearch as ss
+    name,stepArgs = args
+    return ss.serialMap(catalog)(name, [stepArgs])[0]
+
+#Runs a step of a Pareto search (see paretoSearch.search) on the global catalog. Takes the name of the step
+#and its arguments.
+def paretoStep(args):
+    import paretoSearch as ps
+    name,stepArgs = args
+    return ps.serialMap(catalog)(name, [stepArgs])[0]
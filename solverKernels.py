@@ -0,0 +1,205 @@
+import numpy as np
+import importlib.util
+import sys
+import time
+
+#Compiled kernels for the secant solvers in unitSolver.py. When numba is installed, the kernels below are
+#compiled to machine code and solve each point in a tight scalar loop, which removes the NumPy overhead
+#of iterating on small arrays of unconverged points. Without numba the kernels are plain Python and
+#unitSolver falls back to its NumPy implementation. The kernels follow the NumPy solvers operation for
+#operation, so both backends give the same results. Run 'python solverKernels.py' to check this.
+#numba is only imported when the kernels are first compiled (see compileKernels), so importing this file
+#is cheap whether or not numba is installed.
+
+#True if numba is installed, so that the kernels can be compiled
+available = importlib.util.find_spec("numba") is not None
+
+#True once the kernels below have been compiled
+compiled = False
+
+#Names of the kernels, compiled in place by compileKernels
+_kernels = []
+
+#Marks a function as a kernel, to be compiled by compileKernels
+def _kernel(func):
+    _kernels.append(func.__name__)
+    return func
+
+#Imports numba and replaces every kernel in this file by its compiled version. Kernels calling each other
+#are resolved to the compiled versions when they are first called. Compiled kernels release the GIL.
+def compileKernels():
+    global compiled
+    if compiled:
+        return
+    if not available:
+        raise RuntimeError("Compiling the solver kernels requires numba.")
+    import numba
+    for name in _kernels:
+        globals()[name] = numba.njit(cache=True, nogil=True, error_model="numpy")(globals()[name])
+    compiled = True
+
+#Evaluates a coefficient fit of one prop (see propModel.evalFit)
+@_kernel
+def _evalFit(coefs, order, rpm, J):
+    nJ = coefs.shape[0]
+    nR = coefs.shape[1]
+    f = 0.0
+    for j in range(nJ-1, -1, -1):
+        a = coefs[j,nR-1]
+        for k in range(nR-2, -1, -1):
+            a = a*rpm + coefs[j,k]
+        if j == order and a > 0: #Quadratic coefficient should always be non-positive
+            a = 0.0
+        if j == nJ-1:
+            f = a
+        else:
+            f = f*J + a
+    return f
+
+#Computes the advance ratio (see propModel.advanceRatio)
+@_kernel
+def _advanceRatio(v_inf, rpm, diameter):
+    rps = rpm/60
+    if abs(rps) < 1e-10:
+        return 10000.0 # Since angular velocity is 0, actual value w_ill also be 0.
+    return v_inf/(rps*diameter/12)
+
+#Computes the current drawn by the motor (see unitSolver.motorCurrent)
+@_kernel
+def _motorCurrent(throttle, revs, Kv, Gr, R_motor, V0, R_batt, R_esc):
+    etaS = 1 - 0.078*(1 - throttle)
+    return (etaS*throttle*V0 - (Gr/Kv)*revs)/(etaS*throttle*R_batt + R_esc + R_motor)
+
+#Computes motor torque minus prop torque (ft*lbf) of one unit at a prop speed w (rad/s)
+@_kernel
+def _torqueBalance(i, v_inf, throttle, w, powerCoefs, powerOrder, diameter, Kv, Gr, I0, R_motor, V0, R_batt, R_esc, airDensity):
+    revs = w*30/np.pi
+    current = _motorCurrent(throttle, revs, Kv[i], Gr[i], R_motor[i], V0[i], R_batt[i], R_esc[i])
+    T_motor = 7.0432*Gr[i]/Kv[i] * (current - I0[i])
+    Cl = _evalFit(powerCoefs[i], powerOrder[i], revs, _advanceRatio(v_inf, revs, diameter[i]))/2*np.pi
+    return T_motor - Cl*airDensity[i]*(w/(2*np.pi))**2*(diameter[i]/12)**5
+
+#Finds the operating point of one unit by the secant method of unitSolver.solveCruiseThrust. Returns the
+#thrust (lbf), prop speed (rpm) and motor current (A).
+@_kernel
+def _cruiseThrust(i, v_inf, throttle, thrustCoefs, thrustOrder, powerCoefs, powerOrder, diameter, Kv, Gr, I0, R_motor, V0, R_batt, R_esc, airDensity, maxIterations, errMax):
+    if v_inf == 0 and throttle == 0:
+        w = 0.0 #Don't even bother
+    else:
+        w_0 = 950.0 #An initial guess of the prop's angular velocity
+        f_0 = _torqueBalance(i, v_inf, throttle, w_0, powerCoefs, powerOrder, diameter, Kv, Gr, I0, R_motor, V0, R_batt, R_esc, airDensity)
+        w_1 = w_0*1.1
+        iterations = 0
+        err_aprx = 1 + errMax
+        while err_aprx >= errMax and iterations < maxIterations:
+            iterations += 1
+            f_1 = _torqueBalance(i, v_inf, throttle, w_1, powerCoefs, powerOrder, diameter, Kv, Gr, I0, R_motor, V0, R_batt, R_esc, airDensity)
+            w_2 = w_1 - (f_1*(w_0 - w_1))/(f_0 - f_1)
+            if w_2 < 0: # Prop angular velocity will never be negative even if windmilling
+                w_2 = 0.00001
+            err_aprx = abs((w_2 - w_1)/w_2)
+            if np.isnan(err_aprx):
+                err_aprx = 0.0
+            w_0 = w_1
+            f_0 = f_1
+            w_1 = w_2
+        w = w_1
+
+    revs = w*30/np.pi
+    Ct = _evalFit(thrustCoefs[i], thrustOrder[i], revs, _advanceRatio(v_inf, revs, diameter[i]))
+    thrust = Ct*airDensity[i]*(w/(2*np.pi))**2*(diameter[i]/12)**4
+    current = _motorCurrent(throttle, revs, Kv[i], Gr[i], R_motor[i], V0[i], R_batt[i], R_esc[i])
+    return thrust, revs, current
+
+#Computes the thrust (lbf), prop speed (rpm) and motor current (A) of flattened units as
+#unitSolver.solveCruiseThrust does with the secant method
+@_kernel
+def cruiseThrust(thrustCoefs, thrustOrder, powerCoefs, powerOrder, diameter, Kv, Gr, I0, R_motor, V0, R_batt, R_esc, airDensity, v_cruise, throttle, maxIterations, errMax):
+    n = v_cruise.size
+    thrust = np.empty(n)
+    rpm = np.empty(n)
+    current = np.empty(n)
+    for i in range(n):
+        thrust[i],rpm[i],current[i] = _cruiseThrust(i, v_cruise[i], throttle[i], thrustCoefs, thrustOrder, powerCoefs, powerOrder, diameter, Kv, Gr, I0, R_motor, V0, R_batt, R_esc, airDensity, maxIterations, errMax)
+    return thrust, rpm, current
+
+#Computes the throttle settings, thrust (lbf), prop speed (rpm) and motor current (A) of flattened units
+#as unitSolver.solveCruiseThrottle does with the secant method
+@_kernel
+def cruiseThrottle(thrustCoefs, thrustOrder, powerCoefs, powerOrder, diameter, Kv, Gr, I0, R_motor, V0, R_batt, R_esc, airDensity, v_cruise, T_req, maxIterations, errMax):
+    n = v_cruise.size
+    throttle = np.empty(n)
+    thrust = np.empty(n)
+    rpm = np.empty(n)
+    current = np.empty(n)
+    for i in range(n):
+        v = v_cruise[i]
+        t_0 = 0.5
+        T_0 = _cruiseThrust(i, v, t_0, thrustCoefs, thrustOrder, powerCoefs, powerOrder, diameter, Kv, Gr, I0, R_motor, V0, R_batt, R_esc, airDensity, maxIterations, errMax)[0] # As in CalcCruiseThrottle, the first guess is not offset by T_req
+        t_1 = t_0*1.1
+        iterations = 0
+        err_aprx = 1 + errMax
+        while err_aprx >= errMax and iterations < maxIterations:
+            iterations += 1
+            T_1 = _cruiseThrust(i, v, t_1, thrustCoefs, thrustOrder, powerCoefs, powerOrder, diameter, Kv, Gr, I0, R_motor, V0, R_batt, R_esc, airDensity, maxIterations, errMax)[0] - T_req[i]
+            t_2 = t_1 - (T_1*(t_0 - t_1))/(T_0 - T_1)
+            err_aprx = abs((t_2 - t_1)/t_2)
+            if np.isnan(err_aprx):
+                err_aprx = 0.0
+            if t_2 > 10:
+                t_2 = 1.1
+            elif t_2 < -10:
+                t_2 = -0.1
+            t_0 = t_1
+            T_0 = T_1
+            t_1 = t_2
+
+        if t_1 > 1 or t_1 < 0 or np.isnan(t_1):
+            throttle[i] = np.nan
+            thrust[i] = np.nan
+            rpm[i] = np.nan
+            current[i] = np.nan
+        else:
+            throttle[i] = t_1
+            thrust[i],rpm[i],current[i] = _cruiseThrust(i, v, t_1, thrustCoefs, thrustOrder, powerCoefs, powerOrder, diameter, Kv, Gr, I0, R_motor, V0, R_batt, R_esc, airDensity, maxIterations, errMax)
+    return throttle, thrust, rpm, current
+
+#Checks that the kernels give the same results as the NumPy solvers on random designs, failing on any
+#difference in any field, and compares their speed. Only the secant solvers are compared, as the other
+#solver methods do not use the kernels.
+if __name__ == "__main__":
+    import componentCatalog as cc
+    import batchEvaluator as be
+    import unitSolver as us
+
+    dbFile = sys.argv[1] if len(sys.argv) > 1 else "Database/components.db"
+    numUnits = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    if not available:
+        print("numba is not installed; the NumPy solvers are used.")
+        sys.exit()
+
+    catalog = cc.loadCatalog(dbFile)
+    rng = np.random.default_rng(0)
+    propInd,motorInd,battInd,numCells,escInd = be.randomBatch(catalog, rng, numUnits)
+    ok = be.solvable(catalog, motorInd, battInd, escInd)
+    params = be.gatherParams(catalog, propInd[ok], motorInd[ok], battInd[ok], numCells[ok], escInd[ok], 0)
+    v = rng.uniform(0, 60, np.count_nonzero(ok))
+    throttle = rng.uniform(0, 1, v.size)
+    T_req = rng.uniform(0, 3, v.size)
+
+    us.setBackend("numba")
+    first = us._take(us._flatten(params, v)[1], np.arange(1))
+    us.solveCruiseThrust(first, v[:1], throttle[:1]) # Compile the kernels before timing them
+    us.solveCruiseThrottle(first, v[:1], T_req[:1])
+    results = {}
+    for backend in ["numpy", "numba"]:
+        us.setBackend(backend)
+        start = time.time()
+        results[backend] = [us.solveCruiseThrust(params, v, throttle), us.solveCruiseThrottle(params, v, T_req)]
+        print(backend, "backend:", v.size, "units in", round(time.time()-start, 3), "s")
+
+    for solver,a,b in zip(["thrust", "throttle"], results["numpy"], results["numba"]):
+        names = ["thrust", "rpm", "current"] if solver == "thrust" else ["throttle", "thrust", "rpm", "current"]
+        for name,x,y in zip(names, a, b):
+            np.testing.assert_allclose(y, x, rtol=1e-6, atol=1e-9, err_msg=solver+" solver, "+name)
+        print(solver, "solver: backends agree on", np.count_nonzero(~np.isnan(a[0])), "of", v.size, "units")
@@ -0,0 +1,71 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from mpl_toolkits.mplot3d import Axes3D
+import polyFit as fit
+
+#Plotting functions for the classes in supportClasses.py. These are kept separate so that the physics core
+#does not need to import matplotlib.
+
+#Plots the thrust and torque coefficient fits of a prop
+def plotCoefs(prop):
+    #Plot thrust and torque coefficients
+    rpms = np.linspace(0,35000,10)
+    Js = np.linspace(0,1.4,10)
+    fig = plt.figure(figsize=plt.figaspect(1.))
+    fig.suptitle(prop.name)
+    ax = fig.add_subplot(1,2,1, projection='3d')
+
+    for rpm in rpms:
+        a = fit.poly_func(prop.thrustCoefs.T, rpm)
+        if(a[-1]>0):#Quadratic coefficient should always be non-positive
+            a[-1] = 0
+        thrust = fit.poly_func(a, Js)
+        rpmForPlot = np.full(len(thrust),rpm)
+        ax.plot(Js,rpmForPlot,thrust, 'r-')
+
+    ax.set_title("Predicted Thrust")
+    ax.set_xlabel("Advance Ratio")
+    ax.set_ylabel("RPM")
+    ax.set_zlabel("Thrust Coefficient")
+
+    ax = fig.add_subplot(1,2,2, projection='3d')
+
+    for rpm in rpms:
+        a = fit.poly_func(prop.powerCoefs.T, rpm)
+        if(a[-1]>0):#Quadratic coefficient should always be non-positive
+            a[-1] = 0
+        power = fit.poly_func(a, Js)
+        rpmForPlot = np.full(len(power),rpm)
+        ax.plot(Js,rpmForPlot,power, 'r-')
+
+    ax.set_title("Predicted Power")
+    ax.set_xlabel("Advance Ratio")
+    ax.set_ylabel("RPM")
+    ax.set_zlabel("Power Coefficient")
+    plt.show()
+
+#Plots thrust curves for propulsion unit up to a specified airspeed
+def plotThrustCurves(unit, v_min, v_max, numVels, numThrSets):
+    
+    vel = np.linspace(v_min, v_max, numVels)
+    thr = np.linspace(0, 1, numThrSets)
+    thrust,rpm,_ = unit.InterpCruiseThrusts(vel[:,np.newaxis], thr[np.newaxis,:])
+
+    fig = plt.figure()
+    fig.suptitle("Components: " + str(unit.prop.name) + ", " + str(unit.motor.name) + ", and " + str(unit.batt.name))
+
+    ax0 = fig.add_subplot(1,2,1)
+    for i in range(numVels):
+        ax0.plot(thr, thrust[i])
+    ax0.set_title("Thrust")
+    ax0.set_ylabel("Thrust [lbf]")
+    ax0.set_xlabel("Throttle Setting")
+    ax0.legend(list(vel), title="Airspeed [ft/s]")
+
+    ax1 = fig.add_subplot(1,2,2)
+    for i in range(numVels):
+        ax1.plot(thr, rpm[i])
+    ax1.set_title("Prop Speed")
+    ax1.set_ylabel("Speed [rpms]")
+    ax1.set_xlabel("Throttle Setting")
+    plt.show()
@@ -0,0 +1,215 @@
+import numpy as np
+import importlib.util
+import sys
+import time
+from collections import namedtuple
+import batchEvaluator as be
+import designRecords as dr
+import exhaustiveSearch as es
+import geneticSearch as gs
+
+#Surrogate assisted search of the design space. A cheap model of the flight time, fitted to the designs solved
+#so far, ranks millions of random designs, and only the best ranked of them which pass the feasibility screen
+#(see batchEvaluator.screenUnits) are solved. The model is refitted after each round of solving. Designs are
+#genomes as in geneticSearch.py. If scikit-learn is installed the model is a gradient boosted tree ensemble;
+#otherwise it is a ridge regression on the quadratic terms of the (log) design parameters. scikit-learn is only
+#imported when a gradient boosted model is made.
+
+#True if gradient boosted models are available
+available = importlib.util.find_spec("sklearn") is not None
+
+#Parameters of a design the model is fitted on: prop diameter and pitch (in), motor Kv (rpm/V), resistance
+#(Ohm) and no load current (A), battery voltage (V) and cell capacity (mAh) and weight of the electrical
+#components (lbf). Strictly positive parameters are taken as logarithms.
+FEATURES = ["diameter", "pitch", "kv", "resistance", "no_load_current", "V0", "capacity", "weight"]
+
+#Summary of one round: the number of designs solved so far, the longest flight time found so far (min), the
+#longest flight time among the designs solved in the round (min) and the RMS error of the model's prediction
+#of their (log) flight times
+Round = namedtuple("Round", ["round", "solverCalls", "best", "roundBest", "predictionError"])
+
+#Summary of a search: the number of rounds and of designs solved, the longest flight time found (min), the
+#kind of model used and the Round of each round
+SearchReport = namedtuple("SearchReport", ["rounds", "solverCalls", "best", "model", "history"])
+
+#Designs are solved as in the evolutionary search
+evaluateGenomes = gs.evaluateGenomes
+
+#Returns the parameters of an array of genomes, one row per genome (see FEATURES)
+def designFeatures(catalog, space, genomes):
+    propInd,motorInd,battInd,numCells,escInd = gs.genomeRows(space, genomes)
+    props = catalog.props
+    motors = catalog.motors
+    batts = catalog.batteries
+    return np.column_stack([np.log(props["diameter"][propInd]), np.log(props["pitch"][propInd]),
+                            np.log(motors["kv"][motorInd]/motors["gear_ratio"][motorInd]), np.log(motors["resistance"][motorInd]+1e-3),
+                            motors["no_load_current"][motorInd], np.log(batts["volt"][battInd]*numCells),
+                            np.log(batts["capacity"][battInd]), np.log(be.unitWeight(catalog, motorInd, battInd, numCells, escInd)+1e-3)])
+
+#Ridge regression on the parameters, their squares and their products, used when scikit-learn is not
+#installed. The parameters are standardized before fitting.
+class RidgeModel:
+
+    def __init__(self, alpha=1e-3):
+        self.alpha = alpha
+
+    #Returns the terms of the model for an array of parameters
+    def _terms(self, X):
+        Z = (X-self.mean)/self.scale
+        i,j = np.triu_indices(Z.shape[1])
+        return np.column_stack([np.ones(len(Z)), Z, Z[:,i]*Z[:,j]])
+
+    def fit(self, X, y):
+        self.mean = np.mean(X, axis=0)
+        self.scale = np.where(np.std(X, axis=0) > 0, np.std(X, axis=0), 1.0)
+        A = self._terms(X)
+        penalty = self.alpha*len(y)*np.eye(A.shape[1])
+        penalty[0,0] = 0.0 # The intercept is not penalized
+        self.coefs = np.linalg.solve(A.T@A+penalty, A.T@y)
+        return self
+
+    def predict(self, X):
+        return self._terms(X)@self.coefs
+
+#Returns an unfitted model of the given kind: "boosting", "ridge" or "auto" (boosting if available)
+def makeModel(kind="auto"):
+    if kind == "auto":
+        kind = "boosting" if available else "ridge"
+    if kind == "boosting":
+        if not available:
+            raise RuntimeError("Gradient boosted models require scikit-learn.")
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        return HistGradientBoostingRegressor(max_iter=200, learning_rate=0.1)
+    if kind == "ridge":
+        return RidgeModel()
+    raise ValueError("Unknown surrogate model: "+kind)
+
+#Draws size random genomes and returns the keep of them with the highest predicted (log) flight times, with
+#their predictions, highest first. Only genomes whose parameters are within the range [low, high] of the
+#designs the model was fitted on are ranked, since the model cannot be trusted away from them, and only those
+#whose current implied by the predicted flight time (see unitSolver.flightTime) is within their ESC and
+#battery limits. Genomes are drawn and ranked in chunks of chunk genomes.
+def rankCandidates(catalog, space, goal, model, low, high, size, keep, seed, chunk=100000):
+    rng = np.random.default_rng(seed)
+    sizes = gs.geneSizes(space)
+    genomes = np.empty((0, len(sizes)), dtype=np.int64)
+    predicted = np.empty(0)
+    for start in range(0, size, chunk):
+        drawn = np.column_stack([rng.integers(0, n, min(chunk, size-start)) for n in sizes])
+        features = designFeatures(catalog, space, drawn)
+        drawn = drawn[np.all((features >= low) & (features <= high), axis=-1)]
+        if len(drawn) == 0:
+            continue
+        flightTime = np.exp(model.predict(designFeatures(catalog, space, drawn)))
+        _,_,battInd,_,escInd = gs.genomeRows(space, drawn)
+        current = catalog.batteries["capacity"][battInd]/1000/flightTime*60
+        fits = current <= np.minimum(catalog.escs["imax"][escInd], catalog.batteries["imax"][battInd])
+        genomes = np.concatenate([genomes, drawn[fits]])
+        predicted = np.concatenate([predicted, np.log(flightTime[fits])])
+        top = np.argsort(-predicted, kind="stable")[:keep]
+        genomes,predicted = genomes[top],predicted[top]
+    return genomes, predicted
+
+#Runs a search step, given by the name of one of the functions above, on the given catalog for each set of
+#arguments. Replaced by a pool's map to run the steps in parallel (see searchWorker.surrogateStep).
+def serialMap(catalog):
+    return lambda name, argsList: [globals()[name](catalog, *args) for args in argsList]
+
+#Prints the summary of a round
+def printRound(r):
+    print("Round {0}: {1} designs solved, longest flight time {2:.4f} min, best of round {3:.4f} min, prediction error {4:.3f}".format(
+          r.round, r.solverCalls, r.best, r.roundBest, r.predictionError))
+
+#Evaluates genomes by mapStep in tasks of about equal size and adds them to the archive. Returns the results
+#and the number of designs solved.
+def _evaluate(mapStep, tasks, archive, space, goal, genomes, method):
+    results = mapStep("evaluateGenomes", [(space, goal, part, method) for part in np.array_split(genomes, min(tasks, len(genomes)))])
+    result = be.BatchResult(*[np.concatenate(field) for field in zip(*[result for result,_ in results])])
+    archive.add(genomes, result)
+    return result, sum(calls for _,calls in results)
+
+#Searches the space with a surrogate model. initialDesigns random designs passing the screen are solved
+#first. Each of up to rounds rounds then fits a model of the given kind (see makeModel) to the feasible
+#designs solved, ranks candidatesPerRound random designs by mapStep (see serialMap), screens the screened best
+#ranked designs not solved before and solves designsPerRound designs: the best ranked ones which pass the
+#screen and, as a share explore of them, random designs passing the screen, which keep the model honest away
+#from the designs it favours. log is called with the Round of each round. Returns the count feasible designs
+#found with the longest flight times, the optimum first, and a SearchReport.
+def search(catalog, space, goal, method="secant", count=1000, mapStep=None, tasks=1, initialDesigns=2000, rounds=20,
+           designsPerRound=500, candidatesPerRound=1000000, screened=20000, explore=0.1, model="auto", rng=None, log=printRound):
+    mapStep = serialMap(catalog) if mapStep is None else mapStep
+    rng = np.random.default_rng() if rng is None else rng
+    kind = model if model != "auto" else ("boosting" if available else "ridge")
+    archive = gs.Archive(space)
+
+    genomes = np.unique(gs.randomPopulation(catalog, space, goal, rng, initialDesigns), axis=0)
+    _,solverCalls = _evaluate(mapStep, tasks, archive, space, goal, genomes, method)
+    history = []
+    for r in range(1, rounds+1):
+        feasible = np.flatnonzero(~np.isnan(archive.results.flightTime))
+        if len(feasible) == 0:
+            break
+        features = designFeatures(catalog, space, archive.genomes[feasible])
+        surrogate = makeModel(kind).fit(features, np.log(archive.results.flightTime[feasible]))
+
+        #Rank random designs, drop the ones solved or screened out before and screen the best ranked of the rest.
+        #Designs which fail the screen are archived as infeasible.
+        numExplore = int(explore*designsPerRound)
+        seeds = rng.integers(0, 2**63, tasks)
+        ranked = mapStep("rankCandidates", [(space, goal, surrogate, np.min(features, axis=0), np.max(features, axis=0),
+                                             -(-candidatesPerRound//tasks), screened, seed) for seed in seeds])
+        candidates = np.concatenate([genomes for genomes,_ in ranked])
+        candidates = candidates[np.argsort(-np.concatenate([predicted for _,predicted in ranked]), kind="stable")]
+        _,first = np.unique(candidates, axis=0, return_index=True)
+        candidates = candidates[np.sort(first)]
+        candidates = candidates[~archive.find(candidates)[0]][:screened]
+        passed = gs.screenGenomes(catalog, space, goal, candidates)
+        archive.add(candidates[~passed], be.BatchResult(*[np.full(np.count_nonzero(~passed), np.nan) for field in be.BatchResult._fields]))
+        genomes = candidates[passed][:designsPerRound-numExplore]
+
+        explored = gs.randomPopulation(catalog, space, goal, rng, designsPerRound-len(genomes))
+        genomes = np.unique(np.concatenate([genomes, explored[~archive.find(explored)[0]]]), axis=0)
+        if len(genomes) == 0:
+            break
+
+        result,calls = _evaluate(mapStep, tasks, archive, space, goal, genomes, method)
+        solverCalls += calls
+        ok = ~np.isnan(result.flightTime)
+        error = np.sqrt(np.mean((surrogate.predict(designFeatures(catalog, space, genomes[ok]))-np.log(result.flightTime[ok]))**2)) if np.any(ok) else np.nan
+        history.append(Round(r, solverCalls, float(archive.results.flightTime[archive.best(1)][0]),
+                             float(np.max(result.flightTime[ok])) if np.any(ok) else 0.0, float(error)))
+        log(history[-1])
+
+    best = archive.best(count)
+    propInd,motorInd,battInd,numCells,escInd = gs.genomeRows(space, archive.genomes[best])
+    result = be.BatchResult(*[field[best] for field in archive.results])
+    records = dr.fromArrays(propInd, motorInd, escInd, battInd, numCells, result.flightTime, result.throttle, result.current, result.weight)
+    return records, SearchReport(len(history), solverCalls, float(result.flightTime[0]) if len(best) > 0 else 0.0, kind, history)
+
+#Runs a surrogate assisted search and compares it with a random search, which solves random designs passing
+#the screen until it finds as long a flight time or has solved 100 times as many designs
+if __name__ == "__main__":
+    import componentCatalog as cc
+
+    dbFile = sys.argv[1] if len(sys.argv) > 1 else "Database/components.db"
+    model = sys.argv[2] if len(sys.argv) > 2 else "auto"
+
+    catalog = cc.loadCatalog(dbFile)
+    goal = es.Goal(10, 0, None, 0.3, 1)
+    space = es.searchSpace(catalog, canonical=True)
+    be.evaluate(catalog, space.props[:1], space.motors[:1], space.batteries[:1], 1, space.escs[:1], 10, 0, T_req=1, screen=False) # Compile the solvers before timing them
+
+    start = time.time()
+    records,report = search(catalog, space, goal, model=model, rng=np.random.default_rng(0))
+    print("Surrogate assisted search ("+report.model+"):", round(time.time()-start, 1), "s,", report.solverCalls, "designs solved")
+    print("Optimum:", records[:1])
+
+    start = time.time()
+    rng = np.random.default_rng(1)
+    best = 0.0
+    solved = 0
+    while solved < 100*report.solverCalls and best < report.best:
+        result,calls = evaluateGenomes(catalog, space, goal, gs.randomPopulation(catalog, space, goal, rng, 10000))
+        best = max(best, np.nanmax(result.flightTime, initial=0))
+        solved += calls
+    print("Random search:", round(time.time()-start, 1), "s,", solved, "designs solved, longest flight time", best, "min")
@@ -0,0 +1,15 @@
+import os
+import sys
+import pytest
+
+#The modules of the package live at the top level of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DB_FILE = os.path.join(ROOT, "Database", "components.db")
+
+#Catalog of the component database, loaded through a snapshot built outside the repository
+@pytest.fixture(scope="session")
+def catalog(tmp_path_factory):
+    import componentCatalog as cc
+    return cc.loadCatalog(DB_FILE, str(tmp_path_factory.mktemp("snapshot")))
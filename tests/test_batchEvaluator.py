@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import batchEvaluator as be
+
+#The feasibility screen never drops a design which any solver finds feasible, over random designs, cruise
+#speeds, thrusts and altitudes
+@pytest.mark.parametrize("method", ["secant", "roots", "bracket", "direct"])
+def test_screenKeepsFeasibleDesigns(catalog, method):
+    rng = np.random.default_rng(0)
+    for altitude in [0.0, 5000.0]:
+        units = be.randomBatch(catalog, rng, 20000)
+        v = rng.uniform(0, 30, 20000)
+        T_req = rng.uniform(0.1, 4, 20000)
+        feasible = ~np.isnan(be.evaluate(catalog, *units, v, altitude, T_req=T_req, method=method, screen=False).flightTime)
+        passed = be.screenUnits(catalog, *units, v, altitude, T_req)
+        assert np.count_nonzero(feasible) > 0
+        assert not np.any(feasible & ~passed)
+
+#Screening only skips solving: the screened evaluation gives the same flight times as solving every design
+def test_screenedEvaluationMatches(catalog):
+    units = be.randomBatch(catalog, np.random.default_rng(1), 20000)
+    screened = be.evaluate(catalog, *units, 10, 0, T_req=1.0)
+    unscreened = be.evaluate(catalog, *units, 10, 0, T_req=1.0, screen=False)
+    np.testing.assert_array_equal(screened.flightTime, unscreened.flightTime)
+
+#Random units sharing few props and motors, at cruise speeds and thrusts a few percent apart, so that many of
+#them fall into groups
+def groupedBatch(catalog, seed, size=50000):
+    rng = np.random.default_rng(seed)
+    units = be.randomBatch(catalog, rng, size, (rng.choice(len(catalog.props), 3), rng.choice(len(catalog.motors), 3), None, None))
+    return units, 10*(1+0.02*rng.integers(0, 3, size)), 1+0.02*rng.integers(0, 3, size)
+
+#Grouping with no tolerance gives exactly the results of solving every unit
+@pytest.mark.parametrize("seed", [0, 1])
+def test_exactGroupingMatches(catalog, seed):
+    units,v,T_req = groupedBatch(catalog, seed)
+    representatives,groups = be.groupUnits(catalog, *units, v, T_req)
+    assert len(representatives) < len(groups)
+    ungrouped = be.evaluate(catalog, *units, v, 0, T_req=T_req)
+    grouped = be.evaluate(catalog, *units, v, 0, T_req=T_req, groupTol=0)
+    for a,b in zip(ungrouped, grouped):
+        np.testing.assert_array_equal(a, b)
+
+#Grouping with a tolerance keeps each unit within a factor 1+tol of its representative, and its results within
+#2*tol of its own; its feasibility may change only for a few units near their limits
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("tol", [0.01, 0.05])
+def test_toleranceGroupingBound(catalog, seed, tol):
+    units,v,T_req = groupedBatch(catalog, seed)
+    propInd,motorInd,battInd,numCells,escInd = units
+    representatives,groups = be.groupUnits(catalog, *units, v, T_req, tol)
+    values = np.column_stack([catalog.batteries["volt"][battInd]*numCells, catalog.batteries["ri"][battInd]*numCells,
+                              catalog.escs["ri"][escInd], v, T_req])
+    rep = representatives[groups]
+    np.testing.assert_array_equal(propInd[rep], propInd)
+    np.testing.assert_array_equal(motorInd[rep], motorInd)
+    with np.errstate(invalid="ignore"):
+        ratio = np.where(values == values[rep], 1.0, values/values[rep])
+    assert np.all((ratio > 0) & (ratio < 1+tol) & (ratio > 1/(1+tol)))
+
+    ungrouped = be.evaluate(catalog, *units, v, 0, T_req=T_req)
+    grouped = be.evaluate(catalog, *units, v, 0, T_req=T_req, groupTol=tol)
+    feasible = ~np.isnan(ungrouped.flightTime)
+    both = feasible & ~np.isnan(grouped.flightTime)
+    assert np.count_nonzero(feasible) > 100
+    assert np.count_nonzero(feasible != ~np.isnan(grouped.flightTime)) <= 0.01*np.count_nonzero(feasible)
+    for a,b in zip(ungrouped[:3], grouped[:3]):
+        np.testing.assert_allclose(b[both], a[both], rtol=2*tol)
@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import sqlite3 as sql
+import numpy as np
+import pytest
+import componentCatalog as cc
+from conftest import DB_FILE
+
+#Every column of a catalog read through a snapshot matches the catalog read from the database
+def test_snapshotRoundTrip(tmp_path):
+    snapshotDir = cc.buildSnapshot(DB_FILE, str(tmp_path/"snapshot"))
+    direct = cc.ComponentCatalog.fromDatabase(DB_FILE)
+    mapped = cc.ComponentCatalog.fromSnapshot(snapshotDir)
+    assert direct.tables.keys() == mapped.tables.keys()
+    for tableName,table in direct.tables.items():
+        assert table.columns.keys() == mapped.tables[tableName].columns.keys()
+        for colName,column in table.columns.items():
+            other = mapped.tables[tableName][colName]
+            assert column.dtype == other.dtype
+            if column.dtype.kind == "f":
+                np.testing.assert_array_equal(column, other)
+            else:
+                assert np.all(column == other)
+    np.testing.assert_array_equal(direct.props.thrustCoefs, mapped.props.thrustCoefs)
+    np.testing.assert_array_equal(direct.props.powerCoefs, mapped.props.powerCoefs)
+
+#The manifest records the hash of the database and the snapshot version, and a snapshot is only current
+#while both match
+def test_manifestHash(tmp_path):
+    dbFile = str(tmp_path/"components.db")
+    shutil.copyfile(DB_FILE, dbFile)
+    snapshotDir = cc.buildSnapshot(dbFile)
+    with open(os.path.join(snapshotDir, "manifest.json")) as f:
+        manifest = json.load(f)
+    assert manifest["sourceHash"] == cc.fileHash(dbFile)
+    assert manifest["version"] == cc.SNAPSHOT_VERSION
+    assert cc.snapshotIsCurrent(dbFile)
+
+    #A changed database makes the snapshot stale, and loading the catalog rebuilds it
+    db = sql.connect(dbFile)
+    with db:
+        db.execute("update Motors set kv = kv+1 where id = (select min(id) from Motors)")
+    db.close()
+    assert not cc.snapshotIsCurrent(dbFile)
+    catalog = cc.loadCatalog(dbFile)
+    assert cc.snapshotIsCurrent(dbFile)
+    assert catalog.motors["kv"][0] == cc.ComponentCatalog.fromDatabase(DB_FILE).motors["kv"][0]+1
+
+    #So does a snapshot written by another version of the code
+    manifest = dict(manifest, sourceHash=cc.fileHash(dbFile), version=cc.SNAPSHOT_VERSION+1)
+    with open(os.path.join(snapshotDir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    assert not cc.snapshotIsCurrent(dbFile)
+
+#Nearest neighbour queries of the indexes return the same distances as a brute force search over every row
+def test_nearestMatchesBruteForce(catalog):
+    rng = np.random.default_rng(0)
+    motors = catalog.motors
+    kv = motors["kv"]
+    resistance = motors["resistance"]
+    indexed = np.flatnonzero(~np.isnan(kv))
+    planar = np.flatnonzero(~(np.isnan(kv) | np.isnan(resistance)))
+    for value in rng.uniform(np.nanmin(kv), np.nanmax(kv), 50):
+        rows = motors.nearest({"kv":value}, k=5)
+        expected = np.sort(np.abs(kv[indexed]-value))[:5]
+        np.testing.assert_array_equal(np.abs(kv[rows]-value), expected)
+    for x,y in zip(rng.uniform(np.nanmin(kv), np.nanmax(kv), 50), rng.uniform(0, np.nanmax(resistance), 50)):
+        rows = motors.nearest({"kv":x, "resistance":y}, k=5)
+        expected = np.sort(np.hypot(kv[planar]-x, resistance[planar]-y))[:5]
+        np.testing.assert_allclose(np.hypot(kv[rows]-x, resistance[rows]-y), expected)
+
+#Queries with no value are rejected rather than answered with an arbitrary row
+def test_nearestRejectsNaN(catalog):
+    with pytest.raises(ValueError):
+        catalog.motors.nearest({"kv":np.nan})
+    with pytest.raises(ValueError):
+        catalog.motors.nearest({"kv":1000, "resistance":np.inf})
+
+#Selecting the component nearest a target ignores components with no value in the target columns, and fails
+#clearly if no candidate has one
+def test_selectNearestSkipsMissingValues(catalog):
+    escs = catalog.escs
+    ipeak = escs["ipeak"]
+    manufacturers = np.unique(escs["manufacturer"])
+    missing = [m for m in manufacturers if np.all(np.isnan(ipeak[escs["manufacturer"] == m]))]
+    mixed = [m for m in manufacturers if np.any(np.isnan(ipeak[escs["manufacturer"] == m])) and m not in missing]
+    assert missing and mixed
+
+    with pytest.raises(ValueError, match="ipeak"):
+        escs.select(manufacturer=missing[0], nearest={"ipeak":40})
+    rows = escs.indicesWhere(manufacturer=mixed[0])
+    row = escs.select(manufacturer=mixed[0], nearest={"ipeak":40})
+    assert row in rows
+    np.testing.assert_equal(abs(ipeak[row]-40), np.nanmin(np.abs(ipeak[rows]-40)))
+    with pytest.raises(ValueError):
+        escs.select(manufacturer=mixed[0], nearest={"ipeak":np.nan})
@@ -0,0 +1,32 @@
+import shutil
+import componentCatalog as cc
+import componentDatabase as cdb
+from conftest import DB_FILE
+
+#Opening the database leaves the file untouched, and the schema is only migrated when asked for
+def test_migrationIsExplicit(tmp_path):
+    dbFile = str(tmp_path/"components.db")
+    shutil.copyfile(DB_FILE, dbFile)
+    before = cc.fileHash(dbFile)
+    with cdb.ComponentDatabase(dbFile) as db:
+        db.idsWhere("Motors")
+    assert cc.fileHash(dbFile) == before
+
+    with cdb.ComponentDatabase(dbFile) as db:
+        db.migrate()
+        assert db.db.execute("pragma user_version").fetchone()[0] == cdb.SCHEMA_VERSION
+        indexes = {row[0] for row in db.db.execute("select name from sqlite_master where type = 'index'")}
+    assert {"idx_"+tableName+"_"+colName for tableName,colName in cdb.INDEXED_COLUMNS} <= indexes
+
+#Migrating a copy of the database adds the aliases of duplicate components, which the catalog then skips
+def test_migrateDatabase(tmp_path):
+    import migrateDatabase as md
+    dbFile = str(tmp_path/"components.db")
+    shutil.copyfile(DB_FILE, dbFile)
+    md.migrateDatabase(dbFile)
+    with cdb.ComponentDatabase(dbFile) as db:
+        assert db.db.execute("pragma user_version").fetchone()[0] == cdb.SCHEMA_VERSION
+        assert len(db.fetchAliases("Motors")) > 0
+    motors = cc.ComponentCatalog.fromDatabase(dbFile).motors
+    assert 0 < len(motors.uniqueRows) < len(motors)
+    assert cc.fileHash(DB_FILE) != cc.fileHash(dbFile)
@@ -0,0 +1,58 @@
+import numpy as np
+import batchEvaluator as be
+import evaluationCache as ec
+
+#Returns a batch of distinct random units
+def _batch(catalog, size=300):
+    units = np.column_stack(be.randomBatch(catalog, np.random.default_rng(0), size))
+    return [column for column in np.unique(units, axis=0).T]
+
+#Checks that two batch results are equal, with NaN where either is NaN
+def _assertSameResult(a, b):
+    for x,y in zip(a, b):
+        np.testing.assert_array_equal(x, y)
+
+#The first evaluation of a unit misses and later ones hit, with the same result as evaluating directly
+def test_hitsAndMisses(catalog):
+    units = _batch(catalog)
+    n = len(units[0])
+    cache = ec.EvaluationCache()
+    first = cache.evaluate(catalog, *units, 10, 0, T_req=1.0)
+    assert (cache.hits, cache.misses) == (0, n)
+    _assertSameResult(first, be.evaluate(catalog, *units, 10, 0, T_req=1.0))
+
+    again = cache.evaluate(catalog, *units, 10, 0, T_req=1.0)
+    assert (cache.hits, cache.misses) == (n, n)
+    _assertSameResult(first, again)
+
+    #A different requirement or solver is a different evaluation
+    cache.evaluate(catalog, *units, 10, 0, T_req=1.5)
+    cache.evaluate(catalog, *units, 10, 0, T_req=1.0, method="direct")
+    assert (cache.hits, cache.misses) == (n, 3*n)
+
+#Only the maxSize most recently used evaluations are kept in memory
+def test_leastRecentlyUsed(catalog):
+    units = _batch(catalog)
+    cache = ec.EvaluationCache(maxSize=50)
+    cache.evaluate(catalog, *units, 10, 0, T_req=1.0)
+    assert len(cache) == 50
+    cache.evaluate(catalog, *[ind[-50:] for ind in units], 10, 0, T_req=1.0)
+    assert cache.hits == 50
+    cache.evaluate(catalog, *[ind[:1] for ind in units], 10, 0, T_req=1.0)
+    assert cache.hits == 50
+
+#Evaluations stored in a cache file are reused while the tag matches, and cleared when it changes
+def test_fileTagInvalidation(catalog, tmp_path):
+    units = _batch(catalog)
+    n = len(units[0])
+    cacheFile = str(tmp_path/"cache.db")
+    with ec.EvaluationCache(cacheFile=cacheFile, tag="a") as cache:
+        first = cache.evaluate(catalog, *units, 10, 0, T_req=1.0)
+
+    with ec.EvaluationCache(cacheFile=cacheFile, tag="a") as cache:
+        _assertSameResult(first, cache.evaluate(catalog, *units, 10, 0, T_req=1.0))
+        assert (cache.hits, cache.misses) == (n, 0)
+
+    with ec.EvaluationCache(cacheFile=cacheFile, tag="b") as cache:
+        cache.evaluate(catalog, *units, 10, 0, T_req=1.0)
+        assert (cache.hits, cache.misses) == (0, n)
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+import batchEvaluator as be
+import exhaustiveSearch as es
+
+#The space searched holds every row of an unconstrained table, aliases included, unless only canonical rows
+#are asked for
+def test_searchSpaceRows(catalog):
+    space = es.searchSpace(catalog, (None, None, [3, 1], None))
+    assert len(space.motors) == len(catalog.motors)
+    np.testing.assert_array_equal(space.escs, [3, 1])
+    canonical = es.searchSpace(catalog, canonical=True)
+    np.testing.assert_array_equal(canonical.motors, catalog.motors.uniqueRows)
+
+#On a small space the branch and bound search finds the same optimum as solving every design in it
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_optimumMatchesBruteForce(catalog, seed):
+    rng = np.random.default_rng(seed)
+    tables = [catalog.props, catalog.motors, catalog.escs, catalog.batteries]
+    space = es.searchSpace(catalog, [rng.choice(len(table), n, replace=False) for table,n in zip(tables, [8, 30, 6, 6])])
+    goal = es.Goal(10, 0, None, 0.3, 1)
+    records,report = es.search(catalog, space, goal, count=10)
+
+    propInd,motorInd,escInd,battInd,numCells = [ind.ravel() for ind in np.meshgrid(*space, es.CELL_COUNTS, indexing="ij")]
+    flightTime = be.evaluate(catalog, propInd, motorInd, battInd, numCells, escInd, goal.v_cruise, goal.altitude,
+                             R_tw_req=goal.R_tw_req, W_frame=goal.W_frame).flightTime
+    if np.all(np.isnan(flightTime)):
+        assert len(records) == 0
+    else:
+        np.testing.assert_allclose(records["flightTime"][0], np.nanmax(flightTime), rtol=1e-6)
+        np.testing.assert_allclose(report.best, np.nanmax(flightTime), rtol=1e-9)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+import batchEvaluator as be
+import exhaustiveSearch as es
+import geneticSearch as gs
+
+#Small space drawn from the catalog
+def smallSpace(catalog, seed):
+    rng = np.random.default_rng(seed)
+    tables = [catalog.props, catalog.motors, catalog.escs, catalog.batteries]
+    return es.searchSpace(catalog, [rng.choice(len(table), n, replace=False) for table,n in zip(tables, [10, 40, 8, 8])])
+
+#The neighbours of each row are its nearest rows by the ranks of their parameters, found by brute force
+@pytest.mark.parametrize("k", [1, 4, 8])
+def test_neighbourTable(k):
+    rng = np.random.default_rng(k)
+    values = np.column_stack([rng.integers(0, 20, 300), rng.lognormal(size=300), rng.normal(size=300)])
+    table = gs.neighbourTable(values, k, chunk=64)
+    assert table.shape == (300, k)
+
+    ranks = np.array([[np.count_nonzero(col < v) for v in col] for col in values.T]).T/299
+    for i,row in enumerate(table):
+        assert i not in row
+        assert len(np.unique(row)) == k
+        d = np.sum((ranks-ranks[i])**2, axis=-1)
+        d[i] = np.inf
+        np.testing.assert_allclose(np.sort(d[row]), np.sort(d)[:k], rtol=1e-12)
+
+#A table of one row has no neighbours but the row itself
+def test_neighbourTableSingleRow():
+    np.testing.assert_array_equal(gs.neighbourTable(np.ones((1, 3))), [[0]])
+
+#Genomes added to the archive are found with their results; genomes already archived, or given twice, keep
+#their first result
+def test_archiveRoundTrip(catalog):
+    space = smallSpace(catalog, 0)
+    sizes = gs.geneSizes(space)
+    rng = np.random.default_rng(0)
+    genomes = np.unique(np.column_stack([rng.integers(0, n, 400) for n in sizes]), axis=0)
+    rng.shuffle(genomes)
+    results = be.BatchResult(*[rng.random(len(genomes)) for field in be.BatchResult._fields])
+
+    archive = gs.Archive(space)
+    found,_ = archive.find(genomes)
+    assert not np.any(found)
+
+    archive.add(genomes[:200], be.BatchResult(*[field[:200] for field in results]))
+    again = np.concatenate([genomes[100:], genomes[-50:]]) # Half of the first batch, then the rest twice
+    archive.add(again, be.BatchResult(*[np.concatenate([field[100:], -field[-50:]]) for field in results]))
+    assert len(archive) == len(genomes)
+    assert np.all(np.diff(archive.keys) > 0)
+
+    found,pos = archive.find(genomes)
+    assert np.all(found)
+    np.testing.assert_array_equal(archive.genomes[pos], genomes)
+    for stored,field in zip(archive.results, results):
+        np.testing.assert_array_equal(stored[pos], field)
+
+    others = np.column_stack([rng.integers(0, n, 400) for n in sizes])
+    found,pos = archive.find(others)
+    np.testing.assert_array_equal(found, np.isin(archive.keysOf(others), archive.keysOf(genomes)))
+    np.testing.assert_array_equal(archive.genomes[pos[found]], others[found])
+
+#A seeded search keeps the best design of its first population, and solves each design which passes the
+#screen exactly once
+@pytest.mark.parametrize("seed", [0, 1])
+def test_search(catalog, seed):
+    space = smallSpace(catalog, seed)
+    goal = es.Goal(10, 0, None, 0.3, 1)
+    population = gs.randomPopulation(catalog, space, goal, np.random.default_rng(seed), 200)
+    initialBest = np.nanmax(gs.evaluateGenomes(catalog, space, goal, population)[0].flightTime, initial=0)
+
+    solved = []
+    def mapStep(name, argsList):
+        for space_,goal_,genomes,method in argsList:
+            solved.append(genomes[gs.screenGenomes(catalog, space_, goal_, genomes)])
+        return gs.serialMap(catalog)(name, argsList)
+
+    records,report = gs.search(catalog, space, goal, count=10, mapStep=mapStep, populationSize=200, generations=4,
+                               rng=np.random.default_rng(seed), log=lambda gen: None)
+    assert report.generations == 4
+    assert report.best >= initialBest
+    assert np.all(np.diff([gen.best for gen in report.history]) >= 0)
+    assert records["flightTime"][0] == report.best
+    assert np.all(np.diff(records["flightTime"]) <= 0)
+
+    solved = np.concatenate(solved)
+    assert len(np.unique(solved, axis=0)) == len(solved)
+    assert report.solverCalls == len(solved)
+    assert report.evaluatedDesigns >= report.solverCalls
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+import batchEvaluator as be
+import operatingMap as om
+import unitSolver as us
+
+#Returns the parameters of the first few solvable units of a random batch
+def _units(catalog, count=3):
+    units = be.randomBatch(catalog, np.random.default_rng(0), 100)
+    ok = np.flatnonzero(be.solvable(catalog, units[1], units[2], units[4]))[:count]
+    return [be.gatherParams(catalog, *[np.array(ind[k]) for ind in units], 0) for k in ok]
+
+#Returns the largest error of a map over random points, relative to the magnitude of each field
+def _mapError(opMap, v, t):
+    exact = us.solveCruiseThrust(opMap.params, v, t)
+    approx = opMap.query(v, t)
+    return max(np.nanmax(np.abs(a-b))/np.nanmax(np.abs(opMap.grids[name])) for name,a,b in zip(om.FIELDS, exact, approx))
+
+#Maps over a range of speeds and of the static case alone both follow the solver: within errMax at the
+#centre of every grid cell, where the bound is measured, and within a few times errMax elsewhere
+@pytest.mark.parametrize("v_max", [0.0, 30.0])
+def test_mapMatchesSolver(catalog, v_max):
+    rng = np.random.default_rng(1)
+    for params in _units(catalog):
+        opMap = om.OperatingMap(params, v_max)
+        v = (opMap.v[1:]+opMap.v[:-1])/2 if len(opMap.v) > 1 else opMap.v
+        t = (opMap.throttle[1:]+opMap.throttle[:-1])/2
+        v,t = [x.ravel() for x in np.meshgrid(v, t, indexing="ij")]
+        assert _mapError(opMap, v, t) <= opMap.errMax
+        assert _mapError(opMap, rng.uniform(0, v_max, 200), rng.uniform(0, 1, 200)) < 5*opMap.errMax
+        thrust,rpm,current = opMap.query(0.0, 0.5)
+        assert np.ndim(thrust) == 0
+        np.testing.assert_allclose(thrust, us.solveCruiseThrust(params, 0.0, 0.5)[0], rtol=5*opMap.errMax)
+
+#Speed ranges which cannot be mapped are rejected
+@pytest.mark.parametrize("v_max", [-1.0, np.nan, np.inf])
+def test_invalidSpeedRange(catalog, v_max):
+    with pytest.raises(ValueError):
+        om.OperatingMap(_units(catalog, 1)[0], v_max)
@@ -0,0 +1,53 @@
+import csv
+import numpy as np
+import pytest
+import exhaustiveSearch as es
+import paretoSearch as ps
+
+#Returns a mask of the rows no other row dominates, comparing every pair of rows
+def _bruteForce(objectives):
+    better = np.all(objectives[np.newaxis,:,:] >= objectives[:,np.newaxis,:], axis=-1) & \
+             np.any(objectives[np.newaxis,:,:] > objectives[:,np.newaxis,:], axis=-1)
+    return ~np.any(better, axis=-1)
+
+#The non-dominated sort matches a comparison of every pair of rows, with ties, repeated rows and unsolved
+#objectives
+@pytest.mark.parametrize("m", [1, 2, 3, 4, 5])
+@pytest.mark.parametrize("decimals", [0, 1, 3])
+def test_nonDominatedMatchesBruteForce(m, decimals):
+    rng = np.random.default_rng(10*m+decimals)
+    objectives = np.round(rng.random((1500, m)), decimals)
+    objectives[rng.random(1500) < 0.05] = -np.inf
+    np.testing.assert_array_equal(ps.nonDominated(objectives), _bruteForce(objectives))
+
+#Fronts where every row is non-dominated are found as well
+def test_wholeFront():
+    objectives = np.random.default_rng(0).random((3000, 4))
+    objectives[:,3] = -np.sum(objectives[:,:3], axis=-1)
+    assert np.all(ps.nonDominated(objectives))
+    assert ps.nonDominated(np.empty((0, 4))).shape == (0,)
+
+#Replaying the changes appended to the front file after every round gives the front the search returns, and
+#no design on it is dominated by another design found
+def test_searchFrontFile(catalog, tmp_path):
+    frontFile = str(tmp_path/"front.csv")
+    goal = es.Goal(10, 0, None, 0.3, 1)
+    records,report = ps.search(catalog, es.searchSpace(catalog, canonical=True), goal, count=600, batchSize=200,
+                               frontFile=frontFile, rng=np.random.default_rng(0), log=lambda r: None)
+    assert report.rounds > 1
+    assert np.all(ps.nonDominated(ps.objectivesOf(records)))
+
+    front = {}
+    with open(frontFile, newline="") as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        key = (row["propId"], row["motorId"], row["escId"], row["batteryId"], row["numCells"])
+        if row["change"] == "added":
+            assert key not in front
+            front[key] = row
+        else:
+            del front[key]
+    ids = {(str(catalog.props["id"][r["prop"]]), str(catalog.motors["id"][r["motor"]]), str(catalog.escs["id"][r["esc"]]),
+            str(catalog.batteries["id"][r["battery"]]), str(r["numCells"])) for r in records}
+    assert set(front) == ids
+    assert {row["round"] for row in rows} <= {str(r) for r in range(1, report.rounds+1)}
@@ -0,0 +1,17 @@
+import json
+import os
+import numpy as np
+import exhaustiveSearch as es
+import plotDesignSpace as pds
+from conftest import ROOT
+
+#A search which finds no feasible design is reported without plotting
+def test_noFeasibleDesign(catalog, capsys):
+    space = es.searchSpace(catalog, (np.arange(5), np.arange(20), np.arange(5), np.arange(5)))
+    records,report = es.search(catalog, space, es.Goal(10, 0, 1000.0, None, 1), count=10)
+    assert len(records) == 0
+
+    with open(os.path.join(ROOT, "sampleSearch.json")) as settingsFile:
+        settings = json.load(settingsFile)
+    pds.plotResults(catalog, records, settings)
+    assert "No feasible design found" in capsys.readouterr().out
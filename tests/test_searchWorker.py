@@ -0,0 +1,15 @@
+import subprocess
+import sys
+from conftest import ROOT
+
+#Importing the worker module does not import the search modules or their optional dependencies
+def test_searchModulesImportedLazily():
+    modules = ["exhaustiveSearch", "geneticSearch", "surrogateSearch", "paretoSearch", "numba", "sklearn"]
+    code = "import sys, searchWorker; assert not [m for m in "+repr(modules)+" if m in sys.modules]"
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+#Neither does importing the main script, which processes started by spawn import again
+def test_mainScriptImportsSearchModulesLazily():
+    modules = ["exhaustiveSearch", "geneticSearch", "surrogateSearch", "paretoSearch", "numba", "sklearn"]
+    code = "import sys, plotDesignSpace; assert not [m for m in "+repr(modules)+" if m in sys.modules]"
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
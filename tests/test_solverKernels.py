@@ -0,0 +1,35 @@
+import subprocess
+import sys
+import numpy as np
+import pytest
+import batchEvaluator as be
+import solverKernels as sk
+import unitSolver as us
+from conftest import ROOT
+
+#Importing the solvers does not import numba; it is only imported when the kernels are compiled
+def test_numbaImportedLazily():
+    code = "import sys, unitSolver; assert 'numba' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+#The compiled kernels give the same thrust, throttle and current as the NumPy solvers
+def test_backendsAgree(catalog):
+    pytest.importorskip("numba")
+    rng = np.random.default_rng(0)
+    propInd,motorInd,battInd,numCells,escInd = be.randomBatch(catalog, rng, 2000)
+    ok = be.solvable(catalog, motorInd, battInd, escInd)
+    params = be.gatherParams(catalog, propInd[ok], motorInd[ok], battInd[ok], numCells[ok], escInd[ok], 0)
+    v = rng.uniform(0, 60, np.count_nonzero(ok))
+    throttle = rng.uniform(0, 1, v.size)
+    T_req = rng.uniform(0, 3, v.size)
+
+    results = {}
+    try:
+        for backend in ["numpy", "numba"]:
+            us.setBackend(backend)
+            results[backend] = us.solveCruiseThrust(params, v, throttle)+us.solveCruiseThrottle(params, v, T_req)
+    finally:
+        us.setBackend("numba" if sk.available else "numpy")
+    assert sk.compiled
+    for name,a,b in zip(["thrust", "rpm", "current", "throttle", "thrust", "rpm", "current"], results["numpy"], results["numba"]):
+        np.testing.assert_allclose(b, a, rtol=1e-6, atol=1e-9, err_msg=name)
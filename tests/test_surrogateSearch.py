@@ -0,0 +1,24 @@
+import subprocess
+import sys
+import numpy as np
+import pytest
+import surrogateSearch as ss
+from conftest import ROOT
+
+#Importing the search does not import scikit-learn; it is only imported when a boosted model is made
+def test_sklearnImportedLazily():
+    code = "import sys, surrogateSearch; assert 'sklearn' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+#The models follow a smooth function of the parameters, and boosted models are only made if available
+def test_makeModel():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 3))
+    y = 1+X[:,0]-0.5*X[:,1]*X[:,2]
+    assert np.sqrt(np.mean((ss.makeModel("ridge").fit(X, y).predict(X)-y)**2)) < 0.05
+    assert isinstance(ss.makeModel("auto"), ss.RidgeModel) != ss.available
+    if not ss.available:
+        with pytest.raises(RuntimeError):
+            ss.makeModel("boosting")
+    with pytest.raises(ValueError):
+        ss.makeModel("linear")
@@ -0,0 +1,38 @@
+import numpy as np
+import batchEvaluator as be
+
+METHODS = ["secant", "roots", "bracket", "direct"]
+
+#Solves random units with every solver method, without the feasibility screen. Returns the result of each method.
+def _solveAll(catalog, v_cruise, altitude, T_req, size=20000, seed=0):
+    units = be.randomBatch(catalog, np.random.default_rng(seed), size)
+    return {method: be.evaluate(catalog, *units, v_cruise, altitude, T_req=T_req, method=method, screen=False) for method in METHODS}
+
+#Checks that the feasible designs of two results agree in flight time, throttle and current
+def _assertSameSolutions(a, b, feasible):
+    for field in ["flightTime", "throttle", "current"]:
+        np.testing.assert_allclose(getattr(a, field)[feasible], getattr(b, field)[feasible], rtol=1e-6)
+
+#At the cruise conditions used by the searches every method finds the same feasible designs and flight times
+def test_methodsAgree(catalog):
+    results = _solveAll(catalog, 10.0, 0.0, 1.0)
+    feasible = ~np.isnan(results["secant"].flightTime)
+    assert np.count_nonzero(feasible) > 0
+    for method in METHODS[1:]:
+        np.testing.assert_array_equal(~np.isnan(results[method].flightTime), feasible, err_msg=method)
+        _assertSameSolutions(results["secant"], results[method], feasible)
+
+#Over a wide range of speeds and thrusts the bracketed and direct solvers find the same designs. The secant
+#iteration on throttle (used by the secant and roots methods, as in PropulsionUnit.CalcCruiseThrottle) may
+#fail to converge from its first guess at very low throttle settings, so it only finds a subset of them.
+def test_methodsAgreeOverWideConditions(catalog):
+    rng = np.random.default_rng(1)
+    results = _solveAll(catalog, rng.uniform(0, 25, 20000), 0.0, rng.uniform(0.2, 3, 20000))
+    feasible = ~np.isnan(results["bracket"].flightTime)
+    np.testing.assert_array_equal(~np.isnan(results["direct"].flightTime), feasible)
+    _assertSameSolutions(results["bracket"], results["direct"], feasible)
+    for method in ["secant", "roots"]:
+        found = ~np.isnan(results[method].flightTime)
+        assert not np.any(found & ~feasible), method
+        assert np.count_nonzero(found) >= 0.95*np.count_nonzero(feasible), method
+        _assertSameSolutions(results["bracket"], results[method], found)
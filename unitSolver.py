@@ -0,0 +1,686 @@
+import numpy as np
+from collections import namedtuple
+import propModel as pm
+import solverKernels as sk
+
+#Vectorized solvers for the operating point of propulsion units. The functions in this file take the
+#parameters of one or many units as a UnitParams tuple and solve whole arrays of flight conditions at once,
+#iterating only on the points which have not yet converged. They use the same models as the methods of
+#PropulsionUnit in supportClasses.py. All functions are pure: they keep no state between calls and never
+#change their arguments, so they may be called from several threads at once and their results cached.
+
+#Parameters of propulsion units needed by the solvers. Every field is a scalar or an array and all fields
+#are broadcast against each other, except that the coefficient fields have two extra trailing dimensions
+#(see Propeller.thrustCoefs).
+UnitParams = namedtuple("UnitParams", ["thrustCoefs", "thrustOrder", "powerCoefs", "powerOrder", "diameter",
+                                       "Kv", "Gr", "I0", "R_motor", "V0", "R_batt", "R_esc", "airDensity"])
+
+_coefFields = ("thrustCoefs", "powerCoefs")
+
+#Backend used by the secant solvers: "numba" for the compiled kernels in solverKernels.py, used by default
+#when numba is installed and compiled when first used, or "numpy"
+backend = "numba" if sk.available else "numpy"
+
+#Selects the backend used by the secant solvers
+def setBackend(name):
+    global backend
+    if name not in ("numba", "numpy"):
+        raise ValueError("Unknown solver backend: "+str(name))
+    if name == "numba" and not sk.available:
+        raise ValueError("The numba backend requires numba to be installed.")
+    backend = name
+
+#Operating point of propulsion units: throttle setting, thrust (lbf), prop speed (rpm) and motor current (A).
+#Fields are floats for a single point and read-only arrays otherwise. Points at which no valid operating
+#point exists are NaN.
+OperatingPoint = namedtuple("OperatingPoint", ["throttle", "thrust", "rpm", "current"])
+
+#Returns the parameters of a PropulsionUnit
+def paramsOfUnit(unit):
+    return UnitParams(unit.prop.thrustCoefs, unit.prop.thrustFitOrder, unit.prop.powerCoefs, unit.prop.powerFitOrder,
+                      unit.prop.diameter, unit.motor.Kv, unit.motor.Gr, unit.motor.I0, unit.motor.R,
+                      unit.batt.V0, unit.batt.R, unit.esc.R, unit.airDensity)
+
+#Broadcasts the parameters and the given arrays to a common shape and flattens them. Returns the common
+#shape, the flattened parameters and the flattened arrays.
+def _flatten(params, *arrays):
+    shapes = [np.shape(x) for x in arrays]
+    for name,field in zip(params._fields, params):
+        shapes.append(np.shape(field)[:-2] if name in _coefFields else np.shape(field))
+    shape = np.broadcast_shapes(*shapes)
+
+    fields = []
+    for name,field in zip(params._fields, params):
+        if name in _coefFields:
+            field = np.asarray(field)
+            fields.append(np.broadcast_to(field, shape+field.shape[-2:]).reshape((-1,)+field.shape[-2:]))
+        else:
+            fields.append(np.broadcast_to(field, shape).ravel())
+    flatArrays = [np.broadcast_to(np.asarray(x, dtype=np.float64), shape).ravel() for x in arrays]
+    return shape, UnitParams(*fields), flatArrays
+
+#Returns the parameters of a subset of (flattened) units
+def _take(params, ind):
+    return UnitParams(*[field[ind] for field in params])
+
+#Returns the parameters of flattened units and the given flat arrays as the arguments taken by the compiled
+#kernels. Every argument is copied to a new array, so that the kernels are only compiled for one layout.
+def _kernelArgs(params, *arrays):
+    args = []
+    for name,field in zip(params._fields, params):
+        args.append(np.array(field, dtype=np.int64 if name in ("thrustOrder", "powerOrder") else np.float64))
+    return args + [np.array(x, dtype=np.float64) for x in arrays]
+
+#Converts rads per second to rpms
+def toRPM(rads):
+    return rads*30/np.pi
+
+#Computes the current drawn by the motor (A) given throttle setting and revolutions (rpm)
+def motorCurrent(params, throttle, revs):
+    etaS = 1 - 0.078*(1 - throttle)
+    return (etaS*throttle*params.V0 - (params.Gr/params.Kv)*revs)/(etaS*throttle*params.R_batt + params.R_esc + params.R_motor)
+
+#Computes motor torque (ft*lbf) given throttle setting and revolutions (rpm)
+def motorTorque(params, throttle, revs):
+    # Note: the 7.0432 constant converts units [(Nm/ftlb)(min/s)(rad/rev)]^-1
+    return 7.0432*params.Gr/params.Kv * (motorCurrent(params, throttle, revs) - params.I0)
+
+#Computes prop torque (ft*lbf) given freestream velocity and prop angular velocity (rad/s)
+def propTorque(params, v_inf, angVel):
+    rpm = toRPM(angVel)
+    J = pm.advanceRatio(v_inf, rpm, params.diameter)
+    Cl = pm.evalFit(params.powerCoefs, params.powerOrder, rpm, J)/2*np.pi
+    return Cl*params.airDensity*(angVel/(2*np.pi))**2*(params.diameter/12)**5
+
+#Computes prop thrust (lbf) given freestream velocity and prop angular velocity (rad/s)
+def propThrust(params, v_inf, angVel):
+    rpm = toRPM(angVel)
+    J = pm.advanceRatio(v_inf, rpm, params.diameter)
+    Ct = pm.evalFit(params.thrustCoefs, params.thrustOrder, rpm, J)
+    return Ct*params.airDensity*(angVel/(2*np.pi))**2*(params.diameter/12)**4
+
+#Returns the coefficients, lowest power first, of n^2*P(v/(n*d)) as a polynomial in the prop speed n (rev/s),
+#where P is a fit polynomial in J whose coefficients are polynomials in rpm = 60*n and d is the diameter (ft).
+#This is the prop torque or thrust coefficient times n^2, so J orders up to 2 give a polynomial.
+def _fitPolynomial(coefs, v_inf, d):
+    nJ,nR = coefs.shape[-2:]
+    if nJ > 3:
+        raise ValueError("Fits of order "+str(nJ-1)+" in J cannot be written as a polynomial in prop speed.")
+    poly = np.zeros(coefs.shape[:-2]+(nR+2,))
+    for j in range(nJ):
+        for r in range(nR):
+            poly[...,r+2-j] += coefs[...,j,r]*60.0**r*(v_inf/d)**j
+    return poly
+
+#Evaluates polynomials (coefficients lowest power first) at x by Horner's rule
+def _polyVal(poly, x):
+    f = poly[...,-1]
+    for k in range(poly.shape[-1]-2, -1, -1):
+        f = f*x + poly[...,k]
+    return f
+
+#Finds the roots of many polynomials (coefficients lowest power first) at once as the eigenvalues of their
+#companion matrices. A vanishing leading coefficient is replaced by adding a root at -1, which is never a
+#physical prop speed.
+def _polyRoots(poly):
+    poly = np.array(poly, dtype=np.float64)
+    deg = poly.shape[-1]-1
+    scale = np.max(np.abs(poly), axis=-1)
+    for _ in range(deg):
+        flat = np.abs(poly[...,-1]) <= 1e-12*scale
+        if not np.any(flat):
+            break
+        lower = poly[flat,:-1]
+        poly[flat] = np.pad(lower, ((0,0),(1,0))) + np.pad(lower, ((0,0),(0,1))) # (n+1)*lower
+    poly[np.abs(poly[...,-1]) <= 1e-12*scale] = np.eye(1, deg+1, 0) + np.eye(1, deg+1, deg) # Only complex roots
+
+    #Linear and quadratic polynomials are solved in closed form, which is much faster than eigvals
+    if deg == 1:
+        return (-poly[...,:1]/poly[...,1:]).astype(np.complex128)
+    if deg == 2:
+        a,b,c = poly[...,2], poly[...,1], poly[...,0]
+        q = -(b + np.where(b < 0, -1, 1)*np.sqrt((b*b - 4*a*c).astype(np.complex128)))/2 # Avoids cancellation
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.stack([q/a, np.where(q == 0, 0, c/q)], axis=-1)
+
+    companion = np.zeros(poly.shape[:-1]+(deg,deg))
+    companion[...,np.arange(1,deg),np.arange(deg-1)] = 1
+    companion[...,:,-1] = -poly[...,:-1]/poly[...,-1:]
+    return np.linalg.eigvals(companion)
+
+#Returns the coefficient fit of flattened props as polynomials in the prop speed n (see _fitPolynomial). The
+#highest J coefficient of a fit is clamped to be non-positive, so the fit is piecewise: two polynomials are
+#returned, one with the coefficient as fitted and one with it clamped to zero. Also returns that coefficient
+#as a polynomial in n, which tells which of the two holds at a given n.
+def _fitPieces(coefs, order, v_inf, d):
+    order = order.astype(np.intp)[:,np.newaxis,np.newaxis]
+    clamped = np.where(np.arange(coefs.shape[-2])[:,np.newaxis] == order, 0.0, coefs)
+    highest = np.take_along_axis(coefs, order, axis=-2)[:,0,:]*60.0**np.arange(coefs.shape[-1])
+    return _fitPolynomial(coefs, v_inf, d), _fitPolynomial(clamped, v_inf, d), highest
+
+#Returns the lowest positive root of piecewise polynomials given as by _fitPieces, or inf if there is none
+def _lowestRoot(fitted, clamped, highest):
+    n = np.full(len(fitted), np.inf)
+    for poly,isClamped in [(fitted, False), (clamped, True)]:
+        roots = _polyRoots(poly)
+        a = _polyVal(highest[:,np.newaxis,:], roots.real)
+        valid = (np.abs(roots.imag) <= 1e-8*np.abs(roots)) & (roots.real > 0) & ((a > 0) if isClamped else (a <= 0))
+        n = np.minimum(n, np.min(np.where(valid, roots.real, np.inf), axis=-1))
+    return n
+
+#Returns the value at zero speed of piecewise polynomials given as by _fitPieces
+def _valueAtRest(fitted, clamped, highest):
+    return np.where(highest[:,0] <= 0, fitted[:,0], clamped[:,0])
+
+#Returns the torque balance (motor torque minus prop torque) of flattened units as a piecewise polynomial in
+#the prop speed n (rev/s), as by _fitPieces. Motor torque is affine in n.
+def _torqueBalance(params, v_inf, throttle):
+    etaS = 1 - 0.078*(1 - throttle)
+    R_total = etaS*throttle*params.R_batt + params.R_esc + params.R_motor
+    k = 7.0432*params.Gr/params.Kv
+    d = params.diameter/12
+
+    fitted,clamped,highest = _fitPieces(params.powerCoefs, params.powerOrder, v_inf, d)
+    motor = np.zeros(fitted.shape)
+    motor[:,0] = k*(etaS*throttle*params.V0/R_total - params.I0)
+    motor[:,1] = -k*params.Gr/params.Kv*60/R_total
+    scale = (np.pi/2*params.airDensity*d**5)[:,np.newaxis]
+    return motor - scale*fitted, motor - scale*clamped, highest
+
+#Finds the prop speed (rad/s) at which the motor and prop torques of flattened units balance from the roots
+#of the torque balance polynomial. If the motor torque exceeds the prop torque at zero speed, the prop
+#accelerates up to the lowest positive root. Otherwise the prop is stopped (or windmilling) and its speed is
+#taken as zero, as in the secant method. NaN is returned if the motor torque exceeds the prop torque at all
+#speeds, as then no balance exists.
+def _balanceSpeed(params, v_inf, throttle):
+    fitted,clamped,highest = _torqueBalance(params, v_inf, throttle)
+    w = np.full(len(v_inf), np.nan)
+    finite = np.all(np.isfinite(fitted), axis=-1) & np.all(np.isfinite(clamped), axis=-1)
+    w[finite] = 0.00001 # Prop angular velocity will never be negative even if windmilling
+    solve = finite & (_valueAtRest(fitted, clamped, highest) > 0)
+    n = _lowestRoot(fitted[solve], clamped[solve], highest[solve])
+    w[solve] = np.where(np.isfinite(n), 2*np.pi*n, np.nan)
+    return w
+
+#Computes thrust produced at arrays of cruise speeds and throttle settings, as solveCruiseThrust, but finds
+#the shaft angular velocity directly from the roots of the torque balance polynomial instead of iterating.
+#Returns arrays of thrust (lbf), prop speed (rpm) and motor current (A).
+def solveCruiseThrustRoots(params, v_cruise, throttle):
+    shape,params,(v,t) = _flatten(params, v_cruise, throttle)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        w = _balanceSpeed(params, v, t)
+        w[(v == 0) & (t == 0)] = 0.0 #Don't even bother
+        thrust = propThrust(params, v, w)
+        current = motorCurrent(params, t, toRPM(w))
+
+    return thrust.reshape(shape), toRPM(w).reshape(shape), current.reshape(shape)
+
+#Computes thrust produced at arrays of cruise speeds and throttle settings. Determines the shaft angular
+#velocity at which the motor torque and propeller torque are matched using a secant method, as in
+#PropulsionUnit.CalcCruiseThrust, with each point stopping once it has converged. If method is "roots", the
+#torque balance is solved directly by solveCruiseThrustRoots instead, and if it is "bracket", by
+#solveCruiseThrustBracketed.
+#Returns arrays of thrust (lbf), prop speed (rpm) and motor current (A).
+def solveCruiseThrust(params, v_cruise, throttle, maxIterations=1000, errMax=1e-6, method="secant"):
+    if method == "roots":
+        return solveCruiseThrustRoots(params, v_cruise, throttle)
+    elif method == "bracket":
+        return solveCruiseThrustBracketed(params, v_cruise, throttle)[:3]
+    elif method != "secant":
+        raise ValueError("Unknown solver method: "+str(method))
+    shape,params,(v,t) = _flatten(params, v_cruise, throttle)
+    if backend == "numba":
+        sk.compileKernels()
+        thrust,rpm,current = sk.cruiseThrust(*_kernelArgs(params, v, t), maxIterations, errMax)
+        return thrust.reshape(shape), rpm.reshape(shape), current.reshape(shape)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        w_0 = np.full(v.size, 950.0) #An initial guess of the prop's angular velocity
+        f_0 = motorTorque(params, t, toRPM(w_0)) - propTorque(params, v, w_0)
+        w_1 = w_0*1.1
+
+        active = np.flatnonzero(~((v == 0) & (t == 0))) #Don't even bother
+        iterations = 0
+        while active.size > 0 and iterations < maxIterations:
+            iterations += 1
+            sub = _take(params, active)
+            f_1 = motorTorque(sub, t[active], toRPM(w_1[active])) - propTorque(sub, v[active], w_1[active])
+
+            w_2 = w_1[active] - (f_1*(w_0[active] - w_1[active]))/(f_0[active] - f_1)
+            w_2[w_2 < 0] = 0.00001 # Prop angular velocity will never be negative even if windmilling
+
+            err_aprx = np.abs((w_2 - w_1[active])/w_2)
+
+            w_0[active] = w_1[active]
+            f_0[active] = f_1
+            w_1[active] = w_2
+            active = active[err_aprx >= errMax]
+
+        w = np.where((v == 0) & (t == 0), 0.0, w_1)
+        thrust = propThrust(params, v, w)
+        current = motorCurrent(params, t, toRPM(w))
+
+    return thrust.reshape(shape), toRPM(w).reshape(shape), current.reshape(shape)
+
+#Computes the throttle settings required for arrays of thrusts and cruise speeds. Uses a secant method on
+#throttle around solveCruiseThrust, as in PropulsionUnit.CalcCruiseThrottle, with each point stopping once
+#it has converged. Returns arrays of throttle, thrust (lbf), prop speed (rpm) and motor current (A). Points
+#at which the required throttle is outside [0,1] are returned as NaN. method selects the solver used for
+#the thrust at each throttle setting (see solveCruiseThrust). If method is "direct", the throttle is found
+#without iterating by solveRequiredThrottle instead, and if it is "bracket", by solveCruiseThrottleBracketed.
+def solveCruiseThrottle(params, v_cruise, T_req, maxIterations=1000, errMax=1e-6, method="secant"):
+    if method == "direct":
+        return solveRequiredThrottle(params, v_cruise, T_req)
+    elif method == "bracket":
+        return solveCruiseThrottleBracketed(params, v_cruise, T_req)[:4]
+    shape,params,(v,T) = _flatten(params, v_cruise, T_req)
+    if backend == "numba" and method == "secant":
+        sk.compileKernels()
+        results = sk.cruiseThrottle(*_kernelArgs(params, v, T), maxIterations, errMax)
+        return _meetingThrust(T, errMax, *results, shape=shape)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        t_0 = np.full(v.size, 0.5)
+        T_0,_,_ = solveCruiseThrust(params, v, t_0, method=method) # As in CalcCruiseThrottle, the first guess is not offset by T_req
+        t_1 = t_0*1.1
+
+        active = np.arange(v.size)
+        iterations = 0
+        while active.size > 0 and iterations < maxIterations:
+            iterations += 1
+            T_1 = solveCruiseThrust(_take(params, active), v[active], t_1[active], method=method)[0] - T[active]
+
+            t_2 = t_1[active] - (T_1*(t_0[active] - t_1[active]))/(T_0[active] - T_1)
+
+            err_aprx = np.abs((t_2 - t_1[active])/t_2)
+
+            t_2[t_2 > 10] = 1.1
+            t_2[t_2 < -10] = -0.1
+            t_0[active] = t_1[active]
+            T_0[active] = T_1
+            t_1[active] = t_2
+            active = active[err_aprx >= errMax]
+
+        throttle = np.where((t_1 > 1) | (t_1 < 0), np.nan, t_1)
+        thrust,rpm,current = solveCruiseThrust(params, v, throttle, method=method)
+
+    return _meetingThrust(T, errMax, throttle, thrust, rpm, current, shape=shape)
+
+#Returns solutions of flattened points for required thrusts T_req (lbf), reshaped to shape, with NaN at the
+#points whose thrust misses the requirement by more than errMax (relative, or absolute below 1 lbf). The
+#secant iteration on throttle can stop where its steps become small without meeting the requirement, and
+#the bracketed one can close in on a jump of the thrust between two balances of the prop.
+def _meetingThrust(T_req, errMax, throttle, thrust, *fields, shape):
+    with np.errstate(invalid="ignore"):
+        missed = ~(np.abs(thrust - T_req) <= errMax*np.fmax(np.abs(T_req), 1))
+    return tuple(np.where(missed, np.nan, field).reshape(shape) for field in (throttle, thrust)+fields)
+
+#Computes the throttle settings required for arrays of thrusts and cruise speeds directly, without nested
+#root finding. Thrust depends on the prop speed n alone, so the prop speed is found first as the lowest
+#root of the thrust polynomial (the speed at which the thrust first reaches the requirement). The motor
+#current follows from the prop torque at that speed and the throttle from the circuit equation
+#    etaS*t = (I*(R_esc+R_motor) + (Gr/Kv)*rpm)/(V0 - I*R_batt),  etaS = 1 - 0.078*(1 - t)
+#which is quadratic in t. Returns arrays of throttle, thrust (lbf), prop speed (rpm) and motor current (A),
+#as solveCruiseThrottle. Points at which the required throttle is outside [0,1], or at which the prop would
+#not settle at the found speed at that throttle (see _balanceSpeed), are returned as NaN.
+def solveRequiredThrottle(params, v_cruise, T_req):
+    shape,params,(v,T) = _flatten(params, v_cruise, T_req)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        d = params.diameter/12
+        fitted,clamped,highest = _fitPieces(params.thrustCoefs, params.thrustOrder, v, d)
+        scale = (params.airDensity*d**4)[:,np.newaxis]
+        fitted = scale*fitted
+        clamped = scale*clamped
+        fitted[:,0] -= T
+        clamped[:,0] -= T
+
+        w = np.full(v.size, np.nan)
+        solve = np.all(np.isfinite(fitted), axis=-1) & np.all(np.isfinite(clamped), axis=-1)
+        solve &= _valueAtRest(fitted, clamped, highest) < 0 # The thrust at rest must be below the requirement
+        w[solve] = 2*np.pi*_lowestRoot(fitted[solve], clamped[solve], highest[solve])
+        w[np.isinf(w)] = np.nan
+        rpm = toRPM(w)
+
+        current = propTorque(params, v, w)/(7.0432*params.Gr/params.Kv) + params.I0
+        s = (current*(params.R_esc + params.R_motor) + (params.Gr/params.Kv)*rpm)/(params.V0 - current*params.R_batt)
+        throttle = (np.sqrt(0.922**2 + 4*0.078*s) - 0.922)/(2*0.078)
+        throttle[(throttle > 1) | (throttle < 0) | (params.V0 <= current*params.R_batt)] = np.nan
+
+        #The thrust may only be reached at a speed which is not the stable operating point at that throttle
+        check = np.flatnonzero(~np.isnan(throttle))
+        w_check = _balanceSpeed(_take(params, check), v[check], throttle[check])
+        throttle[check[~(np.abs(w_check - w[check]) <= 1e-6*w[check])]] = np.nan
+
+        feasible = ~np.isnan(throttle)
+        thrust = np.where(feasible, T, np.nan)
+        rpm[~feasible] = np.nan
+        current[~feasible] = np.nan
+
+    return throttle.reshape(shape), thrust.reshape(shape), rpm.reshape(shape), current.reshape(shape)
+
+#Finds roots of functions on brackets [a,b] over which they change sign, using the Illinois variant of the
+#false position method. The root always stays bracketed, so convergence is guaranteed, and halving the
+#function value at an end which is retained twice in a row keeps convergence superlinear. func(ind, x)
+#evaluates the functions of the points ind at x. Each point stops once its estimate changes by less than
+#errMax relative to itself. Returns the roots and the number of iterations taken by each point.
+def _illinois(func, a, b, f_a, f_b, maxIterations, errMax):
+    a = a.copy()
+    b = b.copy()
+    f_a = f_a.copy()
+    f_b = f_b.copy()
+    x = np.full(a.size, np.nan)
+    side = np.zeros(a.size, dtype=np.int8) # End replaced in the last iteration, -1 for a and 1 for b
+    iterations = np.zeros(a.size, dtype=np.int64)
+
+    active = np.arange(a.size)
+    while active.size > 0 and iterations[active[0]] < maxIterations:
+        iterations[active] += 1
+        x_0 = x[active]
+        x_1 = (a[active]*f_b[active] - b[active]*f_a[active])/(f_b[active] - f_a[active])
+        f_1 = func(active, x_1)
+
+        replaceA = np.sign(f_1) == np.sign(f_a[active])
+        scale = 1 - f_1/np.where(replaceA, f_a[active], f_b[active])
+        scale[~(scale > 0)] = 0.5
+        ind = active[replaceA]
+        retained = side[ind] == -1
+        f_b[ind[retained]] *= scale[replaceA][retained]
+        a[ind] = x_1[replaceA]
+        f_a[ind] = f_1[replaceA]
+        side[ind] = -1
+        ind = active[~replaceA]
+        retained = side[ind] == 1
+        f_a[ind[retained]] *= scale[~replaceA][retained]
+        b[ind] = x_1[~replaceA]
+        f_b[ind] = f_1[~replaceA]
+        side[ind] = 1
+
+        x[active] = x_1
+        converged = (np.abs(x_1 - x_0) <= errMax*np.abs(x_1)) | (f_1 == 0) | np.isnan(f_1)
+        active = active[~converged]
+    return x, iterations
+
+#Multiples of the initial upper bound tried in turn when bracketing the torque balance: 1, then 1/16, 2/16, ...,
+#15/16 (so that a balance crossed only briefly below the bound is still found, lowest speed first), then 2,
+#1/32, 4, 1/64, ...
+_bracketFactors = [1.0] + [k/16 for k in range(1, 16)] + [factor for k in range(1, 32) for factor in (2.0**k, 0.5**(k+4))]
+
+#Computes thrust produced at arrays of cruise speeds and throttle settings, as solveCruiseThrust, but finds
+#the shaft angular velocity with a bracketed solver which cannot diverge. The bracket runs from rest up to
+#the speed at which the motor draws no current (Kv*V0*throttle, the theoretical upper limit) and is moved
+#(see _bracketFactors) if the prop still drives the motor at that speed. If the prop torque already exceeds
+#the motor torque at rest, the prop speed is taken as zero, as in the other solvers. rpmGuess optionally gives an
+#estimate of the prop speed (rpm) of each point, e.g. the solution at a neighbouring throttle setting or
+#speed; where the balance is bracketed within 5% of the guess, that bracket is used instead.
+#Returns arrays of thrust (lbf), prop speed (rpm), motor current (A) and the number of torque balance
+#evaluations taken by each point, which never exceeds maxIterations plus the bracketing evaluations.
+def solveCruiseThrustBracketed(params, v_cruise, throttle, rpmGuess=None, maxIterations=100, errMax=1e-6):
+    shape,params,(v,t,guess) = _flatten(params, v_cruise, throttle, np.nan if rpmGuess is None else rpmGuess)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        def balance(ind, w):
+            sub = _take(params, ind)
+            return motorTorque(sub, t[ind], toRPM(w)) - propTorque(sub, v[ind], w)
+        allPoints = np.arange(v.size)
+
+        w = np.full(v.size, 0.00001) # Prop angular velocity will never be negative even if windmilling
+        w_lo = w.copy()
+        f_lo = balance(allPoints, w_lo)
+        evaluations = np.ones(v.size, dtype=np.int64)
+        solve = np.flatnonzero(f_lo > 0)
+        w[np.isnan(f_lo)] = np.nan
+
+        #Use the guess where it brackets the balance
+        w_guess = guess[solve]*np.pi/30
+        hasGuess = np.flatnonzero(w_guess > 0)
+        w_hi = np.full(solve.size, np.nan)
+        f_hi = np.full(solve.size, np.nan)
+        if hasGuess.size > 0:
+            lo = w_guess[hasGuess]*0.95
+            hi = w_guess[hasGuess]*1.05
+            f_0 = balance(solve[hasGuess], lo)
+            f_1 = balance(solve[hasGuess], hi)
+            evaluations[solve[hasGuess]] += 2
+            bracketed = (f_0 > 0) & (f_1 <= 0)
+            ind = hasGuess[bracketed]
+            w_lo[solve[ind]] = lo[bracketed]
+            f_lo[solve[ind]] = f_0[bracketed]
+            w_hi[ind] = hi[bracketed]
+            f_hi[ind] = f_1[bracketed]
+
+        #Otherwise bracket up to the speed at which the motor current vanishes. If the prop still drives the
+        #motor at that speed, lower and higher speeds are tried in turn.
+        etaS = 1 - 0.078*(1 - t[solve])
+        w_zero = np.maximum(params.Kv[solve]*etaS*t[solve]*params.V0[solve]/params.Gr[solve]*(2*np.pi/60), 2*w_lo[solve])
+        extend = np.flatnonzero(np.isnan(w_hi))
+        for factor in _bracketFactors:
+            w_try = w_zero[extend]*factor
+            tryPoints = extend[w_try > w_lo[solve[extend]]]
+            if tryPoints.size == 0:
+                continue
+            w_hi[tryPoints] = w_zero[tryPoints]*factor
+            f_hi[tryPoints] = balance(solve[tryPoints], w_hi[tryPoints])
+            evaluations[solve[tryPoints]] += 1
+            extend = extend[~(f_hi[extend] <= 0)]
+            if extend.size == 0:
+                break
+        bracketed = f_hi <= 0
+        w[solve[~bracketed]] = np.nan # No balance found
+        solve = solve[bracketed]
+        w_hi = w_hi[bracketed]
+        f_hi = f_hi[bracketed]
+
+        def balanceOf(ind, w):
+            return balance(solve[ind], w)
+        w[solve],iterations = _illinois(balanceOf, w_lo[solve], w_hi, f_lo[solve], f_hi, maxIterations, errMax)
+        evaluations[solve] += iterations
+
+        w[(v == 0) & (t == 0)] = 0.0 #Don't even bother
+        thrust = propThrust(params, v, w)
+        current = motorCurrent(params, t, toRPM(w))
+
+    return thrust.reshape(shape), toRPM(w).reshape(shape), current.reshape(shape), evaluations.reshape(shape)
+
+#Computes the throttle settings required for arrays of thrusts and cruise speeds, as solveCruiseThrottle,
+#but with a bracketed solver on throttle over [0,1] around solveCruiseThrustBracketed. Each thrust solution
+#is warm started from the prop speed found at the previous throttle setting of the same point. Where the prop
+#has no balance at full throttle, the bracket is cut down to a throttle at which it has one. Points at which
+#the thrust at full throttle is below the requirement, or the thrust at zero throttle above it, are returned
+#as NaN, as are points at which the thrust jumps past the requirement (see _meetingThrust). Returns arrays of throttle, thrust (lbf), prop speed (rpm), motor current (A) and the
+#total number of torque balance evaluations taken by each point.
+def solveCruiseThrottleBracketed(params, v_cruise, T_req, maxIterations=100, errMax=1e-6):
+    shape,params,(v,T) = _flatten(params, v_cruise, T_req)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        rpm = np.full(v.size, np.nan)
+        evaluations = np.zeros(v.size, dtype=np.int64)
+        def thrustError(ind, t):
+            sub = _take(params, ind)
+            thrust,rpm[ind],_,n = solveCruiseThrustBracketed(sub, v[ind], t, rpm[ind], maxIterations, errMax)
+            evaluations[ind] += n
+            return thrust - T[ind]
+
+        allPoints = np.arange(v.size)
+        g_0 = thrustError(allPoints, np.zeros(v.size))
+        t_1 = np.ones(v.size)
+        g_1 = thrustError(allPoints, t_1)
+        throttle = np.full(v.size, np.nan)
+        throttle[g_0 == 0] = 0.0
+        throttle[g_1 == 0] = 1.0
+
+        #Where the prop has no balance at full throttle, bisect for the highest throttle with a balance,
+        #stopping at the first throttle above the requirement
+        t_lo = np.zeros(v.size)
+        search = np.flatnonzero((g_0 < 0) & np.isnan(g_1))
+        for i in range(maxIterations):
+            if search.size == 0:
+                break
+            t_mid = (t_lo[search]+t_1[search])/2
+            g_mid = thrustError(search, t_mid)
+            valid = ~np.isnan(g_mid)
+            t_lo[search[valid]] = t_mid[valid]
+            t_1[search[~valid | (g_mid > 0)]] = t_mid[~valid | (g_mid > 0)]
+            g_1[search[valid & (g_mid > 0)]] = g_mid[valid & (g_mid > 0)]
+            search = search[~(valid & (g_mid > 0)) & (t_1[search]-t_lo[search] > errMax)]
+        solve = np.flatnonzero((g_0 < 0) & (g_1 > 0))
+
+        def thrustErrorOf(ind, t):
+            return thrustError(solve[ind], t)
+        throttle[solve],_ = _illinois(thrustErrorOf, np.zeros(solve.size), t_1[solve], g_0[solve], g_1[solve], maxIterations, errMax)
+
+        thrust,rpm,current,n = solveCruiseThrustBracketed(params, v, throttle, rpm, maxIterations, errMax)
+        evaluations += n
+
+    return _meetingThrust(T, errMax, throttle, thrust, rpm, current, shape=shape) + (evaluations.reshape(shape),)
+
+#Freezes solver results into an OperatingPoint
+def _operatingPoint(*fields):
+    frozen = []
+    for field in fields:
+        field = np.array(field, dtype=np.float64)
+        if field.ndim == 0:
+            frozen.append(float(field))
+        else:
+            field.setflags(write=False)
+            frozen.append(field)
+    return OperatingPoint(*frozen)
+
+#Returns the operating point of units at the given cruise speeds (ft/s) and throttle settings. method
+#selects the solver (see solveCruiseThrust).
+def operatingPoint(params, v_cruise, throttle, method="secant"):
+    thrust,rpm,current = solveCruiseThrust(params, v_cruise, throttle, method=method)
+    return _operatingPoint(np.broadcast_to(throttle, np.shape(thrust)), thrust, rpm, current)
+
+#Returns the operating point of units at which they produce the required thrusts (lbf) at the given cruise
+#speeds (ft/s). method selects the solver (see solveCruiseThrottle).
+def requiredThrottle(params, v_cruise, T_req, method="secant"):
+    return _operatingPoint(*solveCruiseThrottle(params, v_cruise, T_req, method=method))
+
+#Returns the flight time (min) of units at an operating point, given the cell capacity (mAh) of their batteries
+#and the current limits (A) of their ESCs and batteries. Assumes nominal cell capacity and constant battery
+#voltage. The flight time is NaN where the operating point is invalid or exceeds a current limit.
+def flightTime(point, cellCap, escIMax, battIMax):
+    current = np.asarray(point.current)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        runTime = (cellCap/1000)/current*60
+        feasible = ~np.isnan(point.throttle) & (current <= escIMax) & (current <= battIMax) & (runTime >= 0)
+    runTime = np.where(feasible, runTime, np.nan)
+    return float(runTime) if runTime.ndim == 0 else runTime
+
+#Returns the values at prop speeds n (rev/s) of piecewise polynomials given as by _fitPieces. n has one more
+#dimension than the pieces, along which several speeds of each unit are evaluated.
+def _pieceVal(fitted, clamped, highest, n):
+    a = _polyVal(highest[:,np.newaxis,:], n)
+    return np.where(a <= 0, _polyVal(fitted[:,np.newaxis,:], n), _polyVal(clamped[:,np.newaxis,:], n))
+
+#Returns the speeds at which piecewise polynomials given as by _fitPieces may have an extremum in [0, n_max]:
+#both ends, the stationary points of either piece and the breakpoints between the pieces, in ascending order
+def _criticalSpeeds(fitted, clamped, highest, n_max):
+    degrees = np.arange(1, fitted.shape[-1])
+    n = np.concatenate([_polyRoots(fitted[:,1:]*degrees), _polyRoots(clamped[:,1:]*degrees), _polyRoots(highest)], axis=-1)
+    n = np.where(np.abs(n.imag) <= 1e-8*np.abs(n), n.real, 0)
+    n = np.clip(np.nan_to_num(n), 0, n_max[:,np.newaxis])
+    return np.sort(np.concatenate([np.zeros((len(n),1)), n, n_max[:,np.newaxis]], axis=-1), axis=-1)
+
+#Returns a bracket, within a relative 1e-9, of the lowest speed in [0, n_max] at which piecewise polynomials
+#given as by _fitPieces are non-negative, or inf if there is none. Between consecutive critical speeds the
+#polynomials are monotone, so the speed is bracketed and found by bisection.
+def _firstCrossing(fitted, clamped, highest, n_max):
+    n = _criticalSpeeds(fitted, clamped, highest, n_max)
+    above = _pieceVal(fitted, clamped, highest, n) >= 0
+    first = np.argmax(above, axis=-1)
+    lo = np.take_along_axis(n, np.maximum(first-1, 0)[:,np.newaxis], axis=-1)
+    hi = np.take_along_axis(n, first[:,np.newaxis], axis=-1)
+    for _ in range(30):
+        mid = (lo + hi)/2
+        midAbove = _pieceVal(fitted, clamped, highest, mid) >= 0
+        hi = np.where(midAbove, mid, hi)
+        lo = np.where(midAbove, lo, mid)
+    none = ~np.any(above, axis=-1)
+    return np.where(none, np.inf, np.where(first == 0, 0, lo[:,0])), np.where(none, np.inf, hi[:,0])
+
+#Returns, for flattened units producing a thrust (lbf) between T_lo and T_hi at cruise speeds v (ft/s), lower
+#and upper bounds on the motor current (A) from the least and greatest prop torque over the speeds at which
+#those thrusts are first reached, and the lowest of those speeds (rev/s) (see currentBounds). All are NaN where
+#the thrust cannot be reached.
+def _thrustBandBounds(params, v, T_lo, T_hi, margin):
+    k = 7.0432*params.Gr/params.Kv
+    d = params.diameter/12
+    n_max = (1+margin)*params.Kv*params.V0/(60*params.Gr)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        fitted,clamped,highest = _fitPieces(params.thrustCoefs, params.thrustOrder, v, d)
+        scale = (params.airDensity*d**4)[:,np.newaxis]
+        fitted = scale*fitted
+        clamped = scale*clamped
+        n_lo = []
+        for T in [(1-margin)*T_lo, (1+margin)*T_hi]:
+            f,c = fitted.copy(),clamped.copy()
+            f[:,0] -= T
+            c[:,0] -= T
+            n_lo.append(_firstCrossing(f, c, highest, n_max))
+        start = n_lo[0][0]
+        end = np.fmin(n_lo[1][1], n_max)
+        reachable = np.isfinite(start)
+        start = np.where(reachable, start, 0)
+        end = np.where(reachable, end, 0)
+
+        #The extremes of the torque over those speeds are at their ends or at critical speeds of the torque
+        fitted,clamped,highest = _fitPieces(params.powerCoefs, params.powerOrder, v, d)
+        n = _criticalSpeeds(fitted, clamped, highest, n_max)
+        n = np.concatenate([np.clip(n, start[:,np.newaxis], end[:,np.newaxis]), start[:,np.newaxis], end[:,np.newaxis]], axis=-1)
+        Q = _pieceVal(fitted, clamped, highest, n)*np.pi/2*(params.airDensity*d**5)[:,np.newaxis]
+    I_min = np.where(reachable, np.min(Q, axis=-1)/k + params.I0, np.nan)
+    I_max = np.where(reachable, np.max(Q, axis=-1)/k + params.I0, np.nan)
+    return I_min, I_max, np.where(reachable, start, np.nan)
+
+#Returns bounds on the motor current (A) of units at any valid operating point at which they produce the
+#required thrusts (lbf) at the given cruise speeds (ft/s):
+#  - The motor draws no negative current, so the prop turns no faster than the no-load speed Kv*V0/Gr, and
+#    the thrust must be reached below it.
+#  - The prop turns at the lowest speed at which the thrust is met, as found by the solvers, so the current
+#    lies between the ones needed for the least and the greatest prop torque around that speed, I_min and
+#    I_max.
+#  - The current is also at most the one the supply can drive at full throttle at that speed, which is
+#    folded into I_max.
+#Both are NaN where the thrust cannot be reached. margin is the relative slack given to the thrust and the
+#bounds, covering the tolerance of the iterative solvers. The bounds only take closed form roots, bisections
+#and polynomial evaluations, cheaper than solving.
+def currentBounds(params, v_cruise, T_req, margin=1e-3):
+    shape,params,(v,T) = _flatten(params, v_cruise, T_req)
+    I_min,I_max,n_T = _thrustBandBounds(params, v, T, T, margin)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        I_supply = (params.V0 - params.Gr/params.Kv*60*n_T)/(params.R_batt + params.R_esc + params.R_motor)
+    return I_min.reshape(shape), np.fmin(I_max, I_supply).reshape(shape)
+
+#Returns bounds on the motor current (A) and a lower bound on the supply voltage (V) of units at any valid
+#operating point at which they produce a thrust (lbf) between T_lo and T_hi at the given cruise speeds (ft/s),
+#whatever their battery, as currentBounds. The supply must drive at least the least current against the back
+#EMF of the motor at the lowest speed reaching the thrust and the ESC and motor resistances. The supply voltage
+#of the units only limits the prop speed. All are NaN where the thrust cannot be reached.
+def supplyBounds(params, v_cruise, T_lo, T_hi, margin=1e-3):
+    shape,params,(v,T_lo,T_hi) = _flatten(params, v_cruise, T_lo, T_hi)
+    I_min,I_max,n_T = _thrustBandBounds(params, v, T_lo, T_hi, margin)
+    V_min = params.Gr/params.Kv*60*n_T + np.fmax(I_min, 0)*(params.R_esc + params.R_motor)
+    return I_min.reshape(shape), I_max.reshape(shape), ((1-margin)*V_min).reshape(shape)
+
+#Returns True where current bounds (see currentBounds) allow a non-negative current within the given current
+#limits (A)
+def currentMayFit(I_min, I_max, escIMax, battIMax, margin=1e-3):
+    with np.errstate(invalid="ignore"):
+        return (I_min <= (1+margin)*np.minimum(escIMax, battIMax)) & (I_min <= I_max + margin*np.abs(I_max)) & (I_max >= 0)
+
+#Screens units before solving. Returns a mask of the units which may be able to produce the required thrusts
+#(lbf) at the given cruise speeds (ft/s) within the current limits (A) of their ESCs and batteries (see
+#currentBounds), so that no unit with a flight time is screened out.
+def mayBeFeasible(params, v_cruise, T_req, escIMax, battIMax, margin=1e-3):
+    I_min,I_max = currentBounds(params, v_cruise, T_req, margin)
+    return currentMayFit(I_min, I_max, escIMax, battIMax, margin)
+
+#Returns upper bounds on the flight time (min) of batteries of the given capacity (mAh), as flightTime, from a
+#lower bound on the current (A). The bounds are inf where the current may be arbitrarily small.
+def flightTimeBound(cellCap, I_min, margin=1e-3):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(I_min > 0, (cellCap/1000)/((1-margin)*I_min)*60, np.inf)